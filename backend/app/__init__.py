@@ -1,5 +1,5 @@
 import os
-from flask import Flask, jsonify, redirect, url_for, request
+from flask import Flask, jsonify, redirect, url_for
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
 from app.config import config
@@ -8,15 +8,44 @@ from app.extensions import jwt
 def create_app(config_name=os.getenv('FLASK_ENV', 'default')):
     app = Flask(__name__)
     CORS(app, resources={r"/*": {"origins": "*"}}, supports_credentials=True)
-    @app.before_request
-    def log_request_info():
-        print(f"Received {request.method} request to {request.path}")
-        print(f"Headers: {dict(request.headers)}")
     app.config.from_object(config[config_name])
+
+    # Encodes ObjectId and datetime itself (see app.json_provider)
+    from app import json_provider
+    json_provider.init_app(app)
+
+    # Queue-backed logging and the access log (see app.log_pipeline)
+    from app import log_pipeline
+    log_pipeline.init_app(app)
     
     # Initialize direct MongoDB connection
     from app import database
     database.init_app(app)
+
+    from app import indexes
+    indexes.init_app(app)
+    
+    from app import user_cache
+    user_cache.init_app(app)
+    
+    from app import passwords
+    passwords.init_app(app)
+    
+    from app import importer
+    importer.init_app(app)
+    
+    from app import metrics
+    metrics.init_app(app)
+    
+    from app import stats
+    stats.init_app(app)
+    
+    from app import response_cache
+    response_cache.init_app(app)
+    
+    # gzip/brotli Content-Encoding (see app.compression)
+    from app import compression
+    compression.init_app(app)
     
     jwt.init_app(app)
     
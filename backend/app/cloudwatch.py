@@ -0,0 +1,125 @@
+"""
+Batched CloudWatch metric publishing.
+
+Requests only add their values to an in-process StatisticSet (sample count,
+sum, minimum, maximum) per metric name and dimension set. A background
+thread sends everything gathered every CLOUDWATCH_FLUSH_INTERVAL seconds in
+put_metric_data calls of up to 1000 metrics each, so no request waits on
+AWS and the API call rate no longer grows with traffic.
+
+Memory is bounded by CLOUDWATCH_MAX_SERIES distinct series per interval;
+values for new series beyond that are dropped and counted. stop() sends what
+is pending, so a worker's last interval is not lost on shutdown.
+"""
+
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+# put_metric_data accepts at most 1000 metrics per call
+PUT_METRIC_DATA_LIMIT = 1000
+
+logger = logging.getLogger('dagri_talk.cloudwatch')
+
+
+class MetricAggregator:
+    """Thread-safe StatisticSet accumulator with a periodic background flush"""
+
+    def __init__(self, client, namespace, interval=60, max_series=1000, clock=time.time):
+        self.client = client
+        self.namespace = namespace
+        self.interval = interval
+        self.max_series = max_series
+        self.clock = clock
+        self.dropped = 0
+        self._series = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def record(self, name, value, unit='None', dimensions=()):
+        """Add one value; `dimensions` is a sequence of (name, value) pairs"""
+        key = (name, unit, tuple(dimensions))
+        with self._lock:
+            stats = self._series.get(key)
+            if stats is None:
+                if len(self._series) >= self.max_series:
+                    self.dropped += 1
+                    return
+                self._series[key] = [1, value, value, value]
+                return
+            stats[0] += 1
+            stats[1] += value
+            if value < stats[2]:
+                stats[2] = value
+            if value > stats[3]:
+                stats[3] = value
+
+    def drain(self):
+        """Take the pending series, leaving an empty set for the next interval"""
+        with self._lock:
+            series, self._series = self._series, {}
+        return series
+
+    def metric_data(self, series):
+        """put_metric_data entries for drained series"""
+        timestamp = datetime.fromtimestamp(self.clock(), timezone.utc)
+        return [
+            {
+                'MetricName': name,
+                'Dimensions': [{'Name': dim_name, 'Value': dim_value} for dim_name, dim_value in dimensions],
+                'Timestamp': timestamp,
+                'StatisticValues': {'SampleCount': count, 'Sum': total, 'Minimum': minimum, 'Maximum': maximum},
+                'Unit': unit,
+            }
+            for (name, unit, dimensions), (count, total, minimum, maximum) in series.items()
+        ]
+
+    def flush(self):
+        """Send everything pending; returns the number of put_metric_data calls made"""
+        data = self.metric_data(self.drain())
+        calls = 0
+        for start in range(0, len(data), PUT_METRIC_DATA_LIMIT):
+            try:
+                self.client.put_metric_data(Namespace=self.namespace,
+                                            MetricData=data[start:start + PUT_METRIC_DATA_LIMIT])
+                calls += 1
+            except Exception as e:
+                logger.warning(f"Failed to send CloudWatch metrics: {str(e)}")
+        return calls
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.flush()
+
+    def start(self):
+        """Start the flush thread (no-op if it is running)"""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='cloudwatch-flush', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop the flush thread and send what is pending"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def after_fork(self):
+        """A forked child starts empty (the parent reports its own values) with its own thread"""
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._series = {}
+        self.dropped = 0
+        if self._thread is not None:
+            self._thread = None
+            self.start()
+
+    def register_at_fork(self):
+        os.register_at_fork(after_in_child=self.after_fork)
+        return self
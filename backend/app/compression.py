@@ -0,0 +1,171 @@
+"""
+Content-Encoding negotiation for API responses.
+
+An after_request hook compresses responses whose mimetype is in
+COMPRESS_MIMETYPES with the client's preferred encoding from
+Accept-Encoding: brotli ('br', when the Brotli package is installed) or
+gzip. Buffered bodies under COMPRESS_MIN_SIZE bytes are sent as they are.
+Streamed responses (?stream=, exports) are compressed chunk by chunk with a
+flush after each one, so clients still receive every batch as it is read.
+
+Responses served from app.response_cache keep their compressed bodies in
+the cache as variants of the entry, so a hot list is compressed once per
+cache entry instead of once per request.
+
+A compressed response's ETag is made weak: the bytes differ from the
+identity encoding, and If-None-Match uses weak comparison, so conditional
+GETs still get their 304.
+"""
+
+import zlib
+
+from flask import current_app, request
+from prometheus_client import Counter
+from werkzeug.http import parse_accept_header
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - Brotli is optional
+    brotli = None
+
+COMPRESSION_BYTES = Counter(
+    'dagri_talk_response_compression_bytes_total',
+    'Response body bytes before (in) and after (out) compression',
+    ['encoding', 'direction']
+)
+
+COMPRESSION_REUSED = Counter(
+    'dagri_talk_response_compression_reused_total',
+    'Compressed bodies served from the response cache instead of recompressed',
+    ['encoding']
+)
+
+DEFAULT_MIMETYPES = (
+    'application/json',
+    'application/x-ndjson',
+    'text/csv',
+    'text/plain',
+    'text/html',
+)
+
+
+def available_encodings():
+    """Supported encodings in order of preference"""
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def negotiate(accept_encoding, encodings=None):
+    """The best encoding the client accepts, or None for identity"""
+    if not accept_encoding:
+        return None
+    if encodings is None:
+        encodings = available_encodings()
+    return parse_accept_header(accept_encoding).best_match(encodings)
+
+
+def compress(body, encoding, level):
+    if encoding == 'br':
+        data = brotli.compress(body, quality=level)
+    else:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        data = compressor.compress(body) + compressor.flush()
+    COMPRESSION_BYTES.labels(encoding=encoding, direction='in').inc(len(body))
+    COMPRESSION_BYTES.labels(encoding=encoding, direction='out').inc(len(data))
+    return data
+
+
+def compress_chunks(chunks, encoding, level):
+    """Compress an iterable of bytes, flushing after every chunk"""
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=level)
+        finish = compressor.finish
+
+        def process(chunk):
+            return compressor.process(chunk) + compressor.flush()
+    else:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        finish = compressor.flush
+
+        def process(chunk):
+            return compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    for chunk in chunks:
+        if chunk:
+            data = process(chunk)
+            COMPRESSION_BYTES.labels(encoding=encoding, direction='in').inc(len(chunk))
+            COMPRESSION_BYTES.labels(encoding=encoding, direction='out').inc(len(data))
+            yield data
+    data = finish()
+    COMPRESSION_BYTES.labels(encoding=encoding, direction='out').inc(len(data))
+    yield data
+
+
+def compressible(status, mimetype, headers, config):
+    """Whether a response may be compressed at all (size aside)"""
+    if status < 200 or status in (204, 304) or 'Content-Encoding' in headers:
+        return False
+    if mimetype not in config['COMPRESS_MIMETYPES']:
+        return False
+    return 'no-transform' not in headers.get('Cache-Control', '')
+
+
+def compressed_body(body, encoding, level, cache_entry=None):
+    """
+    A buffered body compressed, reusing (or filling) the response cache's
+    copy when the response came from or went into the cache; cache_entry
+    is (cache, namespace, key, entry id)
+    """
+    if cache_entry is not None:
+        cache, namespace, key, entry_id = cache_entry
+        data = cache.get_variant(namespace, key, entry_id, encoding)
+        if data is not None:
+            COMPRESSION_REUSED.labels(encoding=encoding).inc()
+            return data
+
+    data = compress(body, encoding, level)
+    if cache_entry is not None:
+        cache.set_variant(namespace, key, entry_id, encoding, data)
+    return data
+
+
+def compress_response(response):
+    """after_request hook: encode the response for the client, if worthwhile"""
+    config = current_app.config
+    if response.direct_passthrough or not compressible(
+            response.status_code, response.mimetype, response.headers, config):
+        return response
+    response.vary.add('Accept-Encoding')
+
+    encoding = negotiate(request.headers.get('Accept-Encoding'), config['COMPRESS_ENCODINGS'])
+    if encoding is None:
+        return response
+    level = config['COMPRESS_BROTLI_LEVEL'] if encoding == 'br' else config['COMPRESS_GZIP_LEVEL']
+
+    if response.is_streamed:
+        response.response = compress_chunks(response.iter_encoded(), encoding, level)
+        response.headers.pop('Content-Length', None)
+    else:
+        if len(response.get_data()) < config['COMPRESS_MIN_SIZE']:
+            return response
+        response.set_data(compressed_body(response.get_data(), encoding, level, getattr(response, 'cache_entry', None)))
+
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def init_app(app):
+    """Register the compression hook"""
+    app.config.setdefault('COMPRESS_ENABLED', True)
+    app.config.setdefault('COMPRESS_MIN_SIZE', 1024)
+    app.config.setdefault('COMPRESS_MIMETYPES', DEFAULT_MIMETYPES)
+    app.config.setdefault('COMPRESS_GZIP_LEVEL', 6)
+    app.config.setdefault('COMPRESS_BROTLI_LEVEL', 5)
+    app.config.setdefault('COMPRESS_ENCODINGS', available_encodings())
+    app.config['COMPRESS_ENCODINGS'] = tuple(
+        encoding for encoding in app.config['COMPRESS_ENCODINGS'] if encoding in available_encodings()
+    )
+    if app.config['COMPRESS_ENABLED'] and app.config['COMPRESS_ENCODINGS']:
+        app.after_request(compress_response)
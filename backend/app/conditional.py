@@ -0,0 +1,110 @@
+"""
+Conditional GET for the market and knowledge read endpoints.
+
+Every write through the API or the import CLI bumps its collection's version
+document (app.stats). A response's ETag is derived from that version plus
+the request path and normalized query string, and Last-Modified is the time
+of the collection's last write rounded up to a whole second (see
+last_modified()). A refresh that sends If-None-Match (or, for
+clients without ETag support, If-Modified-Since) costs one find_one by _id
+on the stats collection and an empty 304.
+
+The version is read before the documents, so a write that lands in between
+yields a body newer than its ETag; the next refresh then sees a new version
+and fetches again, never the other way round.
+
+The ETag is also left in g.etag (None when the version could not be read)
+for app.response_cache, which keys its entries by it.
+"""
+
+import hashlib
+from datetime import timedelta
+from functools import wraps
+from urllib.parse import urlencode
+
+from flask import current_app, g, make_response, request
+from werkzeug.http import http_date, is_resource_modified, quote_etag
+
+from app.database import get_db, utcnow
+from app.stats import collection_version
+
+
+def make_etag(collection, version, path, query_items):
+    """
+    Strong ETag for one representation of a collection at `version`;
+    query_items are the (name, value) pairs of the query string, in any order.
+    They are URL-encoded, so a value containing '&' or '=' cannot pass for
+    extra parameters.
+    """
+    query = urlencode(sorted(query_items))
+    digest = hashlib.sha1(f'{collection}|{path}?{query}'.encode('utf-8')).hexdigest()[:16]
+    return f'{version}-{digest}'
+
+
+def last_modified(updated_at):
+    """
+    Last-Modified for a collection last written at `updated_at`, or None.
+
+    HTTP dates have one-second resolution, so the time is rounded up to the
+    next whole second, and nothing is sent until that second is over: until
+    then another write could land in it, get the same Last-Modified, and a
+    client sending only If-Modified-Since would get a false 304.
+    """
+    if updated_at is None:
+        return None
+    if updated_at.microsecond:
+        updated_at = updated_at.replace(microsecond=0) + timedelta(seconds=1)
+    return updated_at if updated_at <= utcnow() else None
+
+
+def conditional(collection):
+    """
+    Answer 304 when the client's copy is current; otherwise add ETag,
+    Last-Modified and Cache-Control: no-cache to successful responses.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            try:
+                version, updated_at = collection_version(get_db(), collection)
+            except Exception as e:
+                # Without a version, just serve the request unconditionally
+                current_app.logger.error(f"Error reading {collection} version: {str(e)}")
+                g.etag = None
+                return view(*args, **kwargs)
+
+            etag = g.etag = make_etag(collection, version, request.path, request.args.items(multi=True))
+            modified_at = last_modified(updated_at)
+            if not is_resource_modified(request.environ, etag=etag, last_modified=modified_at):
+                response = current_app.response_class(status=304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+            response.set_etag(etag)
+            if modified_at is not None:
+                response.last_modified = modified_at
+            response.cache_control.no_cache = True
+            return response
+        return wrapper
+    return decorator
+
+
+def not_modified(if_none_match, if_modified_since, etag, updated_at):
+    """is_resource_modified() for raw header values (the ASGI entry point)"""
+    environ = {'REQUEST_METHOD': 'GET'}
+    if if_none_match:
+        environ['HTTP_IF_NONE_MATCH'] = if_none_match
+    if if_modified_since:
+        environ['HTTP_IF_MODIFIED_SINCE'] = if_modified_since
+    return not is_resource_modified(environ, etag=etag, last_modified=last_modified(updated_at))
+
+
+def conditional_headers(etag, updated_at):
+    """The validator headers conditional() sets, as a dict"""
+    headers = {'ETag': quote_etag(etag), 'Cache-Control': 'no-cache'}
+    modified_at = last_modified(updated_at)
+    if modified_at is not None:
+        headers['Last-Modified'] = http_date(modified_at)
+    return headers
@@ -3,11 +3,90 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+
+def _optional_int(name):
+    value = os.environ.get(name)
+    return int(value) if value else None
+
+
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-secret-key-dagri-talk'
     MONGO_URI = os.environ.get('MONGO_URI') or 'mongodb://localhost:27017/dagri_talk'
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY') or 'jwt-secret-dagri-talk'
 
+    # MongoDB connection pool (one client per worker process)
+    MONGO_MAX_POOL_SIZE = int(os.environ.get('MONGO_MAX_POOL_SIZE', 100))
+    MONGO_MIN_POOL_SIZE = int(os.environ.get('MONGO_MIN_POOL_SIZE', 0))
+    MONGO_WAIT_QUEUE_TIMEOUT_MS = _optional_int('MONGO_WAIT_QUEUE_TIMEOUT_MS')
+    MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.environ.get('MONGO_SERVER_SELECTION_TIMEOUT_MS', 30000))
+    # Apply app.indexes.INDEXES when a worker boots (also: `flask indexes apply`)
+    MONGO_ENSURE_INDEXES = os.environ.get('MONGO_ENSURE_INDEXES', 'true').lower() == 'true'
+
+    # Documents per cursor batch / response chunk for ?stream= list responses
+    STREAM_BATCH_SIZE = int(os.environ.get('STREAM_BATCH_SIZE', 500))
+    # The same for /export; larger, since exports are read start to finish
+    EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', 5000))
+
+    # In-process user_id -> username cache (app.user_cache)
+    USERNAME_CACHE_SIZE = int(os.environ.get('USERNAME_CACHE_SIZE', 10000))
+    USERNAME_CACHE_TTL = int(os.environ.get('USERNAME_CACHE_TTL', 300))
+    # Redis for the profile-changed markers every worker must see
+    # (app.user_cache); falls back to RESPONSE_CACHE_URL, else per process
+    PROFILE_CHANGES_URL = os.environ.get('PROFILE_CHANGES_URL') or None
+
+    # Password hashing (app.passwords): 'scrypt' or 'pbkdf2'; the cost is
+    # scrypt's N or the pbkdf2 iteration count (default: werkzeug's)
+    PASSWORD_HASH_ALGORITHM = os.environ.get('PASSWORD_HASH_ALGORITHM', 'scrypt')
+    PASSWORD_HASH_COST = _optional_int('PASSWORD_HASH_COST')
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))
+    PASSWORD_HASH_MAX_PENDING = int(os.environ.get('PASSWORD_HASH_MAX_PENDING', 32))
+    PASSWORD_HASH_TIMEOUT = float(os.environ.get('PASSWORD_HASH_TIMEOUT', 10))
+
+    # Largest batch accepted by POST /api/market/bulk
+    MARKET_BULK_MAX_LISTINGS = int(os.environ.get('MARKET_BULK_MAX_LISTINGS', 500))
+
+    # Logging (app.log_pipeline): records go through a bounded queue to a
+    # listener thread; LOG_DIR adds the rotating log files to stdout
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+    LOG_DIR = os.environ.get('LOG_DIR') or None
+    LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', 10000))
+    LOG_EXCLUDE_PATHS = os.environ.get('LOG_EXCLUDE_PATHS', '/api/health,/metrics')
+    LOG_ACCESS = os.environ.get('LOG_ACCESS', 'true').lower() == 'true'
+
+    # CloudWatch request metrics (app.cloudwatch): aggregated per process and
+    # published every CLOUDWATCH_FLUSH_INTERVAL seconds. The endpoint URL
+    # points boto3 at a local stub (e.g. localstack) when set.
+    CLOUDWATCH_REGION = os.environ.get('CLOUDWATCH_REGION', 'us-east-1')
+    CLOUDWATCH_ENDPOINT_URL = os.environ.get('CLOUDWATCH_ENDPOINT_URL') or None
+    CLOUDWATCH_NAMESPACE = os.environ.get('CLOUDWATCH_NAMESPACE', 'DAgriTalk/Application')
+    CLOUDWATCH_FLUSH_INTERVAL = float(os.environ.get('CLOUDWATCH_FLUSH_INTERVAL', 60))
+    CLOUDWATCH_MAX_SERIES = int(os.environ.get('CLOUDWATCH_MAX_SERIES', 1000))
+
+    # Collection gauges on /metrics (app.stats): seconds a scrape result is
+    # reused, and breakdown values shown before the rest become "other"
+    STATS_SCRAPE_TTL = float(os.environ.get('STATS_SCRAPE_TTL', 30))
+    STATS_MAX_LABELS = int(os.environ.get('STATS_MAX_LABELS', 50))
+
+    # Response cache for the public GET endpoints (app.response_cache):
+    # 'memory' (per process), 'redis' (shared; RESPONSE_CACHE_URL) or 'none'
+    RESPONSE_CACHE_BACKEND = os.environ.get('RESPONSE_CACHE_BACKEND', 'memory')
+    RESPONSE_CACHE_URL = os.environ.get('RESPONSE_CACHE_URL') or None
+    RESPONSE_CACHE_TTL = int(os.environ.get('RESPONSE_CACHE_TTL', 30))
+    RESPONSE_CACHE_MAX_ENTRIES = int(os.environ.get('RESPONSE_CACHE_MAX_ENTRIES', 1000))
+    RESPONSE_CACHE_MAX_BYTES = int(os.environ.get('RESPONSE_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+    RESPONSE_CACHE_MAX_ENTRY_BYTES = int(os.environ.get('RESPONSE_CACHE_MAX_ENTRY_BYTES', 1024 * 1024))
+    RESPONSE_CACHE_WAIT = float(os.environ.get('RESPONSE_CACHE_WAIT', 5))
+
+    # Response compression (app.compression); brotli needs the Brotli package
+    COMPRESS_ENABLED = os.environ.get('COMPRESS_ENABLED', 'true').lower() == 'true'
+    COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))
+    COMPRESS_MIMETYPES = tuple(os.environ.get(
+        'COMPRESS_MIMETYPES', 'application/json,application/x-ndjson,text/csv,text/plain,text/html'
+    ).split(','))
+    COMPRESS_ENCODINGS = tuple(os.environ.get('COMPRESS_ENCODINGS', 'br,gzip').split(','))
+    COMPRESS_GZIP_LEVEL = int(os.environ.get('COMPRESS_GZIP_LEVEL', 6))
+    COMPRESS_BROTLI_LEVEL = int(os.environ.get('COMPRESS_BROTLI_LEVEL', 5))
+
 class DevelopmentConfig(Config):
     DEBUG = True
 
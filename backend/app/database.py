@@ -1,57 +1,128 @@
+import os
+import threading
+from datetime import datetime
+
 import pymongo
 import certifi
-import os
-from flask import g
+from flask import current_app
+
+DEFAULT_DB_NAME = "dagri_talk"
+
+# One client per process. The pid is remembered so that a client inherited
+# across fork() (gunicorn preload, multiprocessing) is never reused in the
+# child; pymongo clients are not fork-safe.
+_lock = threading.Lock()
+
+
+def _state(app):
+    return app.extensions.setdefault('mongo', {'client': None, 'pid': None, 'db_name': None})
+
+
+def get_mongo_uri(app):
+    """
+    Returns the configured MongoDB URI
+    """
+    return app.config.get('MONGO_URI') or os.environ.get('MONGO_URI')
+
+
+def client_options(app):
+    """
+    Builds the MongoClient keyword arguments from the app config
+    """
+    mongo_uri = get_mongo_uri(app)
+
+    # Determine if we need SSL based on the URI or environment
+    lowered = mongo_uri.lower() if mongo_uri else ''
+    use_ssl = 'ssl=true' in lowered or 'tls=true' in lowered or lowered.startswith('mongodb+srv://')
+
+    options = {
+        'maxPoolSize': app.config['MONGO_MAX_POOL_SIZE'],
+        'minPoolSize': app.config['MONGO_MIN_POOL_SIZE'],
+        'waitQueueTimeoutMS': app.config['MONGO_WAIT_QUEUE_TIMEOUT_MS'],
+        'serverSelectionTimeoutMS': app.config['MONGO_SERVER_SELECTION_TIMEOUT_MS'],
+    }
+    if use_ssl:
+        options['tlsCAFile'] = certifi.where()
+    return options
+
+
+def _connect(app):
+    state = _state(app)
+    pid = os.getpid()
+    if state['client'] is None or state['pid'] != pid:
+        with _lock:
+            if state['client'] is None or state['pid'] != pid:
+                mongo_uri = get_mongo_uri(app)
+                client = pymongo.MongoClient(mongo_uri, connect=False, **client_options(app))
+                # The URI is parsed once here instead of on every get_db() call
+                state['db_name'] = client.get_default_database(DEFAULT_DB_NAME).name
+                state['client'] = client
+                state['pid'] = pid
+    return state
+
+
+def utcnow():
+    """
+    Current UTC time truncated to BSON's millisecond precision, so a
+    document built in memory matches what a read would return
+    """
+    now = datetime.utcnow()
+    return now.replace(microsecond=now.microsecond // 1000 * 1000)
+
 
 def get_db_client():
     """
-    Returns a MongoDB client, reusing existing connection if available
-    """
-    if 'mongo_client' not in g:
-        mongo_uri = os.environ.get('MONGO_URI')
-        
-        # Determine if we need SSL based on the URI or environment
-        use_ssl = 'ssl=true' in mongo_uri.lower() if mongo_uri else False
-        
-        # Configure client options based on SSL requirement
-        client_options = {}
-        if use_ssl:
-            client_options['tlsCAFile'] = certifi.where()
-        
-        g.mongo_client = pymongo.MongoClient(mongo_uri, **client_options)
-    return g.mongo_client
+    Returns the process-wide MongoDB client, creating it on first use
+    """
+    return _connect(current_app._get_current_object())['client']
+
 
 def get_db():
     """
-    Returns the database object, extracting DB name from the URI
-    """
-    client = get_db_client()
-    
-    # Extract database name from URI or use default
-    mongo_uri = os.environ.get('MONGO_URI')
-    db_name = "dagri_talk"  # default name
-    
-    # Try to extract database name from URI
-    if mongo_uri and '/' in mongo_uri:
-        parts = mongo_uri.split('/')
-        if len(parts) >= 4:
-            potential_db = parts[3].split('?')[0]
-            if potential_db:
-                db_name = potential_db
-    
-    return client[db_name]
-
-def close_db(e=None):
-    """
-    Close the MongoDB connection when the request is finished
-    """
-    mongo_client = g.pop('mongo_client', None)
-    
-    if mongo_client is not None:
-        mongo_client.close()
+    Returns the database object named in MONGO_URI
+    """
+    state = _connect(current_app._get_current_object())
+    return state['client'][state['db_name']]
+
+
+def warm_up(app):
+    """
+    Opens the pool and waits for server discovery so the first request
+    does not pay for the TCP/TLS handshake, then applies the index registry
+    when MONGO_ENSURE_INDEXES is set. Called from gunicorn's
+    post_worker_init hook; errors are logged, not raised, so a slow
+    database does not stop the worker from booting.
+    """
+    with app.app_context():
+        try:
+            db = get_db()
+            db.command('ping')
+            if app.config.get('MONGO_ENSURE_INDEXES'):
+                from app.indexes import ensure_indexes
+                ensure_indexes(db)
+        except Exception as e:
+            app.logger.warning(f"MongoDB warm-up failed: {str(e)}")
+
+
+def reset_client(app):
+    """
+    Drops the client reference for this process. The next get_db() call
+    builds a fresh pool; used after fork and on shutdown.
+    """
+    state = _state(app)
+    client = state['client']
+    owned = state['pid'] == os.getpid()
+    state.update(client=None, pid=None)
+    if client is not None and owned:
+        client.close()
+
 
 def init_app(app):
     """
-    Register database functions with the Flask app
+    Register database settings with the Flask app
     """
-    app.teardown_appcontext(close_db)
\ No newline at end of file
+    app.config.setdefault('MONGO_MAX_POOL_SIZE', 100)
+    app.config.setdefault('MONGO_MIN_POOL_SIZE', 0)
+    app.config.setdefault('MONGO_WAIT_QUEUE_TIMEOUT_MS', None)
+    app.config.setdefault('MONGO_SERVER_SELECTION_TIMEOUT_MS', 30000)
+    _state(app)
@@ -0,0 +1,95 @@
+"""
+Sparse fieldsets (?fields=) for the list and detail endpoints.
+
+Requested fields are checked against a per-collection whitelist and turned
+into a $project stage, so unrequested fields are never read off disk or
+sent over the wire. ?fields=summary selects the collection's summary preset.
+"""
+
+
+class FieldsError(ValueError):
+    """Raised for a ?fields= value naming fields outside the whitelist"""
+
+
+class FieldSet:
+    """The whitelist and presets for one collection"""
+
+    def __init__(self, allowed, summary, username_field, user_id_field, hidden=()):
+        self.columns = tuple(allowed)
+        self.allowed = frozenset(allowed)
+        self.presets = {'summary': frozenset(summary)}
+        self.username_field = username_field
+        self.user_id_field = user_id_field
+        # Stored for internal use only, never sent
+        self.hidden = tuple(hidden)
+
+    def parse(self, value):
+        """
+        Parse a ?fields= value into a set of field names, or None when every
+        field is wanted. _id is always included.
+        """
+        if value is None or value.strip() == '':
+            return None
+        fields = set()
+        for name in (part.strip() for part in value.split(',')):
+            if not name:
+                continue
+            if name in self.presets:
+                fields |= self.presets[name]
+            elif name in self.allowed:
+                fields.add(name)
+            else:
+                raise FieldsError(f"Unknown field: {name}")
+        fields.add('_id')
+        return fields
+
+    def wants_username(self, fields):
+        return fields is None or self.username_field in fields
+
+    def projection(self, fields, required=()):
+        """
+        $project inclusion spec for the stored fields in `fields`, plus
+        `required` (sort keys needed to build the next cursor). The user id
+        is kept whenever the username has to be looked up from it.
+        """
+        if fields is None:
+            return None
+        stored = (set(fields) | set(required)) - {self.username_field}
+        if self.username_field in fields:
+            stored.add(self.user_id_field)
+        return {name: 1 for name in sorted(stored)}
+
+    def column_names(self, fields):
+        """Requested fields in declaration order, for tabular (CSV) output"""
+        return [name for name in self.columns if fields is None or name in fields]
+
+    def trim(self, doc, fields):
+        """Drop keys that were only fetched internally"""
+        if fields is None:
+            for name in self.hidden:
+                doc.pop(name, None)
+            return doc
+        for key in [key for key in doc if key not in fields]:
+            del doc[key]
+        return doc
+
+
+KNOWLEDGE_FIELDS = FieldSet(
+    allowed=['_id', 'title', 'content', 'language', 'crop_type', 'season', 'region',
+             'author_id', 'author_username', 'created_at', 'updated_at'],
+    summary=['_id', 'title', 'language', 'crop_type', 'season', 'region',
+             'author_id', 'author_username', 'created_at', 'updated_at'],
+    username_field='author_username',
+    user_id_field='author_id',
+    # Only there to steer the text index's stemming
+    hidden=['text_language'],
+)
+
+MARKET_FIELDS = FieldSet(
+    allowed=['_id', 'crop_name', 'quantity', 'unit', 'price_per_unit', 'location', 'description',
+             'farmer_id', 'farmer_username', 'is_available', 'created_at', 'updated_at'],
+    summary=['_id', 'crop_name', 'quantity', 'unit', 'price_per_unit', 'location',
+             'farmer_id', 'farmer_username', 'is_available', 'created_at'],
+    username_field='farmer_username',
+    user_id_field='farmer_id',
+)
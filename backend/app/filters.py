@@ -0,0 +1,120 @@
+"""
+Query-string filters and sort orders for the list endpoints, compiled into
+validated Mongo queries. Every combination produced here is backed by an
+index in app.indexes.
+"""
+
+from datetime import datetime, timezone
+
+from pymongo import ASCENDING, DESCENDING
+
+from app.indexes import NEWEST_FIRST
+from app.models.knowledge import text_search_language
+
+MARKET_SORTS = {
+    'newest': NEWEST_FIRST,
+    'price': [('price_per_unit', ASCENDING), ('_id', ASCENDING)],
+    'price_desc': [('price_per_unit', DESCENDING), ('_id', DESCENDING)],
+}
+
+
+class FilterError(ValueError):
+    """Raised for an invalid filter or sort parameter"""
+
+
+def _price(args, name):
+    value = args.get(name)
+    if value is None or value == '':
+        return None
+    try:
+        price = float(value)
+    except ValueError:
+        raise FilterError(f"{name} must be a number")
+    if price < 0:
+        raise FilterError(f"{name} must not be negative")
+    return price
+
+
+def _text(args, name, max_length=100):
+    value = args.get(name)
+    if value is None:
+        return None
+    value = value.strip()
+    if not value:
+        return None
+    if len(value) > max_length:
+        raise FilterError(f"{name} is too long")
+    return value
+
+
+def parse_market_filters(args):
+    """
+    Build (query, sort) for GET /api/market/ from available_only, crop_name,
+    location, unit, min_price, max_price and sort (newest, price, price_desc).
+    """
+    query = {}
+    if args.get('available_only', 'true').lower() == 'true':
+        query['is_available'] = True
+
+    for name in ('crop_name', 'location', 'unit'):
+        value = _text(args, name)
+        if value is not None:
+            query[name] = value
+
+    min_price, max_price = _price(args, 'min_price'), _price(args, 'max_price')
+    if min_price is not None and max_price is not None and min_price > max_price:
+        raise FilterError('min_price must not be greater than max_price')
+    price = {}
+    if min_price is not None:
+        price['$gte'] = min_price
+    if max_price is not None:
+        price['$lte'] = max_price
+    if price:
+        query['price_per_unit'] = price
+
+    sort_name = args.get('sort', 'newest').lower()
+    if sort_name not in MARKET_SORTS:
+        raise FilterError(f"sort must be one of: {', '.join(MARKET_SORTS)}")
+    return query, MARKET_SORTS[sort_name]
+
+
+def parse_knowledge_search(args):
+    """
+    Build the $text query for GET /api/knowledge/search from q plus the
+    optional crop_type, season, region and language filters. A language
+    filter also selects the stemming language for q.
+    """
+    q = _text(args, 'q', max_length=200)
+    if q is None:
+        raise FilterError('q is required')
+
+    text = {'$search': q}
+    query = {}
+    for name in ('crop_type', 'season', 'region'):
+        value = _text(args, name)
+        if value is not None:
+            query[name] = value
+
+    language = _text(args, 'language')
+    if language is not None:
+        query['language'] = language
+        text['$language'] = text_search_language(language)
+
+    return {'$text': text, **query}
+
+
+def parse_updated_since(args):
+    """
+    Query for ?updated_since= (ISO 8601; naive values are taken as UTC).
+    Stored timestamps are naive UTC, so aware values are converted.
+    """
+    value = _text(args, 'updated_since')
+    if value is None:
+        return {}
+    try:
+        since = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        raise FilterError('updated_since must be an ISO 8601 date or datetime')
+    if since.tzinfo is not None:
+        since = since.astimezone(timezone.utc).replace(tzinfo=None)
+    return {'updated_at': {'$gte': since}}
@@ -0,0 +1,222 @@
+"""
+Bulk import of market listings, knowledge entries and users from CSV or
+NDJSON files:
+
+    flask import market listings.csv --owner farmer1
+    flask import knowledge entries.ndjson --owner elder1 --resume
+    flask import users users.csv
+
+Records are read one line at a time and written in batches with unordered
+insert_many, so memory use depends on --batch-size, not on the file size.
+Every record goes through the same builder as the matching POST endpoint.
+
+After each batch the number of records consumed is saved to a checkpoint
+file next to the input; --resume skips that many records. A crash between
+insert_many and the checkpoint write re-sends at most that one batch.
+"""
+
+import csv
+import json
+import os
+import time
+from itertools import islice
+
+import click
+from bson.objectid import ObjectId
+from flask.cli import with_appcontext
+from pymongo.errors import BulkWriteError
+
+from app.database import get_db, utcnow
+from app.models.knowledge import build_knowledge_entry
+from app.models.market import build_market_listing
+from app.models.user import build_user
+from app.response_cache import invalidate
+from app.stats import BREAKDOWNS, record_inserts
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+def _build_user(record, owner_id, now):
+    return build_user(record, now)
+
+
+# kind -> (collection, owner field, builder(record, owner_id, now))
+IMPORT_KINDS = {
+    'market': ('market_listings', 'farmer_id', build_market_listing),
+    'knowledge': ('knowledge_entries', 'author_id', build_knowledge_entry),
+    'users': ('users', None, _build_user),
+}
+
+
+class InvalidRecord(ValueError):
+    """A line that could not be parsed into a record"""
+
+
+def detect_format(path):
+    return 'csv' if path.lower().endswith('.csv') else 'ndjson'
+
+
+def iter_records(path, fmt):
+    """
+    Yield (record_number, record) for each record in the file, starting at 1.
+    Unparseable NDJSON lines are yielded as InvalidRecord instances; empty
+    CSV cells are dropped so they count as missing.
+    """
+    with open(path, newline='', encoding='utf-8') as f:
+        if fmt == 'csv':
+            for number, row in enumerate(csv.DictReader(f), 1):
+                yield number, {key: value for key, value in row.items() if key and value not in ('', None)}
+            return
+        number = 0
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            number += 1
+            try:
+                yield number, json.loads(line)
+            except ValueError:
+                yield number, InvalidRecord('Invalid JSON')
+
+
+def load_checkpoint(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_checkpoint(path, state):
+    """Write the checkpoint atomically so a crash never leaves a partial file"""
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
+
+
+def build_documents(kind, records, owner_id, now):
+    """Validate a batch of (number, record); returns ([(number, doc)], [(number, message)])"""
+    _, owner_field, build = IMPORT_KINDS[kind]
+    docs, errors = [], []
+    for number, record in records:
+        try:
+            if isinstance(record, InvalidRecord):
+                raise record
+            record_owner = owner_id
+            if owner_field and isinstance(record, dict) and record.get(owner_field):
+                if not ObjectId.is_valid(record[owner_field]):
+                    raise ValueError(f"Invalid {owner_field}")
+                record_owner = record[owner_field]
+            docs.append((number, build(record, record_owner, now)))
+        except ValueError as e:
+            errors.append((number, str(e)))
+    return docs, errors
+
+
+def insert_batch(collection, docs):
+    """Unordered insert_many of [(number, doc)]; returns (inserted, [(number, message)])"""
+    if not docs:
+        return 0, []
+    try:
+        result = collection.insert_many([doc for _, doc in docs], ordered=False)
+        return len(result.inserted_ids), []
+    except BulkWriteError as e:
+        errors = [(docs[error['index']][0], error.get('errmsg', 'Write failed'))
+                  for error in e.details.get('writeErrors', [])]
+        return e.details.get('nInserted', len(docs) - len(errors)), errors
+
+
+def import_file(db, kind, path, fmt=None, owner_id=None, batch_size=DEFAULT_BATCH_SIZE,
+                skip=0, on_batch=None):
+    """
+    Import every record after the first `skip`. on_batch(stats, errors) is
+    called after each batch is written; stats is the running total of
+    records, inserted, failed and elapsed seconds.
+    """
+    collection = db[IMPORT_KINDS[kind][0]]
+    records = islice(iter_records(path, fmt or detect_format(path)), skip, None)
+    stats = {'records': skip, 'inserted': 0, 'failed': 0, 'elapsed': 0.0}
+    started = time.perf_counter()
+
+    while True:
+        batch = list(islice(records, batch_size))
+        if not batch:
+            break
+        docs, errors = build_documents(kind, batch, owner_id, utcnow())
+        inserted, write_errors = insert_batch(collection, docs)
+        if collection.name in BREAKDOWNS:
+            failed_numbers = {number for number, _ in write_errors}
+            record_inserts(db, collection.name, [doc for number, doc in docs if number not in failed_numbers])
+        errors.extend(write_errors)
+
+        stats['records'] = batch[-1][0]
+        stats['inserted'] += inserted
+        stats['failed'] += len(errors)
+        stats['elapsed'] = time.perf_counter() - started
+        if on_batch:
+            on_batch(stats, sorted(errors))
+    stats['elapsed'] = time.perf_counter() - started
+    return stats
+
+
+def _rate(stats):
+    return stats['inserted'] / stats['elapsed'] if stats['elapsed'] else 0.0
+
+
+def _resolve_owner(db, owner):
+    if owner is None:
+        return None
+    if ObjectId.is_valid(owner):
+        user = db.users.find_one({'_id': ObjectId(owner)}, {'_id': 1})
+    else:
+        user = db.users.find_one({'username': owner}, {'_id': 1})
+    if not user:
+        raise click.BadParameter(f"No user {owner}", param_hint='--owner')
+    return str(user['_id'])
+
+
+@click.command('import')
+@click.argument('kind', type=click.Choice(sorted(IMPORT_KINDS)))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'ndjson']),
+              help='Input format (default: from the file extension).')
+@click.option('--owner', help='Username or id recorded as farmer/author when a record has none.')
+@click.option('--batch-size', default=DEFAULT_BATCH_SIZE, show_default=True, type=click.IntRange(1))
+@click.option('--checkpoint', 'checkpoint_path', type=click.Path(dir_okay=False),
+              help='Checkpoint file (default: PATH.checkpoint.json).')
+@click.option('--resume', is_flag=True, help='Skip the records recorded in the checkpoint.')
+@with_appcontext
+def import_command(kind, path, fmt, owner, batch_size, checkpoint_path, resume):
+    """Import market listings, knowledge entries or users from a CSV/NDJSON file."""
+    db = get_db()
+    owner_id = _resolve_owner(db, owner)
+    checkpoint_path = checkpoint_path or f"{path}.checkpoint.json"
+    source = os.path.abspath(path)
+
+    skip = 0
+    if resume:
+        state = load_checkpoint(checkpoint_path)
+        if state:
+            if state.get('source') != source or state.get('kind') != kind:
+                raise click.ClickException(f"{checkpoint_path} belongs to a different import")
+            skip = state['records']
+            click.echo(f"Resuming after record {skip}")
+
+    def on_batch(stats, errors):
+        for number, message in errors:
+            click.echo(f"record {number}: {message}", err=True)
+        save_checkpoint(checkpoint_path, {'source': source, 'kind': kind, 'records': stats['records']})
+        click.echo(f"{stats['records']} records read, {stats['inserted']} inserted, "
+                   f"{stats['failed']} failed ({_rate(stats):.0f} docs/sec)")
+
+    stats = import_file(db, kind, path, fmt, owner_id, batch_size, skip, on_batch)
+    if stats['inserted'] and kind in ('market', 'knowledge'):
+        # Reaches a shared (redis) response cache; the memory one is per process
+        invalidate(kind)
+    click.echo(f"Done: {stats['inserted']} inserted, {stats['failed']} failed in "
+               f"{stats['elapsed']:.1f}s ({_rate(stats):.0f} docs/sec)")
+
+
+def init_app(app):
+    """Register the import CLI with the Flask app"""
+    app.cli.add_command(import_command)
@@ -0,0 +1,284 @@
+"""
+MongoDB index registry.
+
+INDEXES declares every index the routes rely on; ensure_indexes() applies
+them (idempotently) and check_query_plans() explains every query shape in
+QUERY_SHAPES and reports the ones that fall back to a collection scan.
+
+    flask indexes apply
+    flask indexes check
+"""
+
+from datetime import datetime
+
+import click
+from bson.objectid import ObjectId
+from flask import current_app
+from flask.cli import with_appcontext
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel
+from pymongo.collation import Collation, CollationStrength
+from pymongo.errors import OperationFailure
+
+from app.database import get_db
+from app.pagination import DEFAULT_LIMIT, keyset_filter
+
+# Emails compare case-insensitively. Queries on email must pass this
+# collation or they cannot use the index.
+EMAIL_COLLATION = Collation(locale='en', strength=CollationStrength.SECONDARY)
+
+INDEXES = {
+    'users': [
+        IndexModel([('email', ASCENDING)], name='email_unique_ci', unique=True, collation=EMAIL_COLLATION),
+        IndexModel([('username', ASCENDING)], name='username_unique', unique=True),
+    ],
+    'market_listings': [
+        # Default list view: available listings, newest first
+        IndexModel(
+            [('created_at', DESCENDING), ('_id', DESCENDING)],
+            name='available_created_at',
+            partialFilterExpression={'is_available': True},
+        ),
+        # available_only=false; walked backwards for newest first
+        IndexModel([('created_at', ASCENDING), ('_id', ASCENDING)], name='created_at'),
+        # Filters and sorts from app.filters (equality, then sort, then range)
+        IndexModel(
+            [('crop_name', ASCENDING), ('created_at', DESCENDING), ('_id', DESCENDING)],
+            name='available_crop_name_created_at',
+            partialFilterExpression={'is_available': True},
+        ),
+        IndexModel(
+            [('crop_name', ASCENDING), ('price_per_unit', ASCENDING), ('_id', ASCENDING)],
+            name='available_crop_name_price',
+            partialFilterExpression={'is_available': True},
+        ),
+        IndexModel(
+            [('location', ASCENDING), ('created_at', DESCENDING), ('_id', DESCENDING)],
+            name='available_location_created_at',
+            partialFilterExpression={'is_available': True},
+        ),
+        IndexModel(
+            [('price_per_unit', ASCENDING), ('_id', ASCENDING)],
+            name='available_price',
+            partialFilterExpression={'is_available': True},
+        ),
+        # GET /api/market/export?updated_since=
+        IndexModel([('updated_at', ASCENDING), ('_id', ASCENDING)], name='updated_at'),
+    ],
+    'knowledge_entries': [
+        IndexModel([('created_at', DESCENDING), ('_id', DESCENDING)], name='created_at'),
+        IndexModel(
+            [('crop_type', ASCENDING), ('region', ASCENDING), ('created_at', DESCENDING)],
+            name='crop_type_region_created_at',
+        ),
+        IndexModel([('region', ASCENDING), ('created_at', DESCENDING)], name='region_created_at'),
+        # GET /api/knowledge/export?updated_since=
+        IndexModel([('updated_at', ASCENDING), ('_id', ASCENDING)], name='updated_at'),
+        # GET /api/knowledge/search; stemming follows each entry's text_language
+        IndexModel(
+            [('title', TEXT), ('content', TEXT)],
+            name='title_content_text',
+            weights={'title': 10, 'content': 1},
+            default_language='english',
+            language_override='text_language',
+        ),
+    ],
+    'stats': [
+        # app.stats: the largest values of a breakdown, and its sum
+        IndexModel([('tally', ASCENDING), ('count', DESCENDING), ('value', ASCENDING)], name='tally_count'),
+    ],
+}
+
+# Superseded indexes, dropped by ensure_indexes() once everything in
+# INDEXES for that collection has been created
+RETIRED_INDEXES = {
+    'users': ['email_unique'],
+}
+
+NEWEST_FIRST = [('created_at', DESCENDING), ('_id', DESCENDING)]
+# Export order: stable across writes, so an interrupted export can be
+# restarted from the last updated_at it received
+BY_UPDATED_AT = [('updated_at', ASCENDING), ('_id', ASCENDING)]
+
+# Keyset filter for "the page after" a placeholder document
+_NEXT_PAGE = keyset_filter(NEWEST_FIRST, [datetime(2024, 1, 1), ObjectId('0' * 24)])
+
+# Every query the routes issue, with placeholder values
+QUERY_SHAPES = [
+    {
+        'name': 'auth.get_user_by_email',
+        'collection': 'users',
+        'filter': {'email': 'User@Example.com'},
+        'collation': EMAIL_COLLATION,
+    },
+    {'name': 'auth.get_user_by_username', 'collection': 'users', 'filter': {'username': 'user'}},
+    {
+        'name': 'market.list_available',
+        'collection': 'market_listings',
+        'filter': {'is_available': True},
+        'sort': NEWEST_FIRST,
+    },
+    {
+        'name': 'market.list_available_next_page',
+        'collection': 'market_listings',
+        'filter': {'$and': [{'is_available': True}, _NEXT_PAGE]},
+        'sort': NEWEST_FIRST,
+        'limit': DEFAULT_LIMIT + 1,
+    },
+    {'name': 'market.list_all', 'collection': 'market_listings', 'filter': {}, 'sort': NEWEST_FIRST},
+    {
+        'name': 'market.filter_crop_name',
+        'collection': 'market_listings',
+        'filter': {'is_available': True, 'crop_name': 'Cassava'},
+        'sort': NEWEST_FIRST,
+    },
+    {
+        'name': 'market.filter_crop_name_price_range_by_price',
+        'collection': 'market_listings',
+        'filter': {'is_available': True, 'crop_name': 'Cassava', 'price_per_unit': {'$gte': 10, '$lte': 50}},
+        'sort': [('price_per_unit', ASCENDING), ('_id', ASCENDING)],
+    },
+    {
+        'name': 'market.filter_location',
+        'collection': 'market_listings',
+        'filter': {'is_available': True, 'location': 'Bong County', 'unit': 'kg'},
+        'sort': NEWEST_FIRST,
+    },
+    {
+        'name': 'market.sort_price_desc',
+        'collection': 'market_listings',
+        'filter': {'is_available': True, 'price_per_unit': {'$lte': 100}},
+        'sort': [('price_per_unit', DESCENDING), ('_id', DESCENDING)],
+    },
+    {
+        'name': 'market.export_updated_since',
+        'collection': 'market_listings',
+        'filter': {'updated_at': {'$gte': datetime(2024, 1, 1)}},
+        'sort': BY_UPDATED_AT,
+    },
+    {'name': 'knowledge.list', 'collection': 'knowledge_entries', 'filter': {}, 'sort': NEWEST_FIRST},
+    {
+        'name': 'knowledge.list_next_page',
+        'collection': 'knowledge_entries',
+        'filter': _NEXT_PAGE,
+        'sort': NEWEST_FIRST,
+        'limit': DEFAULT_LIMIT + 1,
+    },
+    {
+        'name': 'knowledge.by_crop_type_region',
+        'collection': 'knowledge_entries',
+        'filter': {'crop_type': 'Cassava', 'region': 'Bong County'},
+        'sort': [('created_at', DESCENDING)],
+    },
+    {
+        'name': 'knowledge.export_updated_since',
+        'collection': 'knowledge_entries',
+        'filter': {'updated_at': {'$gte': datetime(2024, 1, 1)}},
+        'sort': BY_UPDATED_AT,
+    },
+    {
+        'name': 'knowledge.search',
+        'collection': 'knowledge_entries',
+        'filter': {'$text': {'$search': 'cassava harvest'}, 'region': 'Bong County'},
+    },
+    {
+        'name': 'stats.top_values',
+        'collection': 'stats',
+        'filter': {'tally': 'market_listings.crop'},
+        'sort': [('count', DESCENDING), ('value', ASCENDING)],
+        'limit': 50,  # STATS_MAX_LABELS
+    },
+]
+
+
+def ensure_indexes(db):
+    """
+    Create every registered index, then drop the retired ones;
+    returns {collection: [index names]}
+    """
+    created = {}
+    for collection, models in INDEXES.items():
+        try:
+            created[collection] = db[collection].create_indexes(models)
+        except OperationFailure as e:
+            # An index with the same name but different options already
+            # exists, or existing data violates a new unique index; leave
+            # it (and the retired indexes) for an operator rather than guess.
+            current_app.logger.error(f"Failed to create indexes on {collection}: {str(e)}")
+            created[collection] = []
+            continue
+        _drop_retired(db, collection)
+    return created
+
+
+def _drop_retired(db, collection):
+    retired = RETIRED_INDEXES.get(collection)
+    if not retired:
+        return
+    existing = set(db[collection].index_information())
+    for name in retired:
+        if name in existing:
+            db[collection].drop_index(name)
+            current_app.logger.info(f"Dropped retired index {collection}.{name}")
+
+
+def _plan_stages(plan):
+    """Yield every stage name in an explain() plan tree"""
+    if isinstance(plan, dict):
+        if 'stage' in plan:
+            yield plan['stage']
+        for value in plan.values():
+            yield from _plan_stages(value)
+    elif isinstance(plan, list):
+        for item in plan:
+            yield from _plan_stages(item)
+
+
+def explain_shape(db, shape):
+    """Explain a query shape and return the winning plan's stage names"""
+    cursor = db[shape['collection']].find(shape['filter'], collation=shape.get('collation'))
+    if shape.get('sort'):
+        cursor = cursor.sort(shape['sort'])
+    explanation = cursor.limit(shape.get('limit', 0)).explain()
+    return list(_plan_stages(explanation['queryPlanner']['winningPlan']))
+
+
+def check_query_plans(db):
+    """Return [(shape name, stages)] for every shape whose plan has a COLLSCAN"""
+    failures = []
+    for shape in QUERY_SHAPES:
+        stages = explain_shape(db, shape)
+        if 'COLLSCAN' in stages:
+            failures.append((shape['name'], stages))
+    return failures
+
+
+@click.group('indexes')
+def indexes_cli():
+    """Manage MongoDB indexes."""
+
+
+@indexes_cli.command('apply')
+@with_appcontext
+def apply_command():
+    """Create all registered indexes."""
+    for collection, names in ensure_indexes(get_db()).items():
+        click.echo(f"{collection}: {', '.join(names) if names else 'failed'}")
+
+
+@indexes_cli.command('check')
+@with_appcontext
+def check_command():
+    """Explain every route query shape and fail on collection scans."""
+    db = get_db()
+    failures = check_query_plans(db)
+    for shape in QUERY_SHAPES:
+        status = 'COLLSCAN' if any(name == shape['name'] for name, _ in failures) else 'ok'
+        click.echo(f"{shape['name']}: {status}")
+    if failures:
+        raise click.ClickException(f"{len(failures)} query shape(s) use a collection scan")
+
+
+def init_app(app):
+    """Register the indexes CLI with the Flask app"""
+    app.config.setdefault('MONGO_ENSURE_INDEXES', False)
+    app.cli.add_command(indexes_cli)
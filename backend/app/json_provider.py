@@ -0,0 +1,76 @@
+"""
+JSON encoding for API responses.
+
+Documents go to jsonify() as they come out of MongoDB: the provider writes
+ObjectId as its hex string and datetime as ISO 8601, so the routes no
+longer copy every document to convert those fields by hand. With orjson
+installed (requirements.txt) encoding runs in C and handles datetime
+natively; without it the stdlib encoder is used with the same output
+apart from key order and non-ASCII escaping.
+
+Both providers keep Flask's interface, so current_app.json.dumps(obj,
+separators=...) in app.streaming and the ASGI entry point (encode()) use
+the same encoder as jsonify().
+"""
+
+from datetime import date, datetime
+
+from bson.objectid import ObjectId
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+
+
+def _default(o):
+    if isinstance(o, ObjectId):
+        return str(o)
+    if isinstance(o, (datetime, date)):
+        return o.isoformat()
+    return DefaultJSONProvider.default(o)
+
+
+class MongoJSONProvider(DefaultJSONProvider):
+    """Flask's stdlib provider, writing ObjectId and datetime as strings"""
+
+    default = staticmethod(_default)
+
+    def encode(self, obj):
+        """obj as compact UTF-8 JSON bytes"""
+        return self.dumps(obj, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+class OrjsonProvider(MongoJSONProvider):
+    """
+    The same output encoded by orjson. Compact separators and UTF-8 are
+    orjson's only format, so separators/ensure_ascii arguments are ignored.
+    """
+
+    def _option(self, sort_keys=None, indent=None):
+        option = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys if sort_keys is None else sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def encode(self, obj, sort_keys=None, indent=None):
+        return orjson.dumps(obj, default=_default, option=self._option(sort_keys, indent))
+
+    def dumps(self, obj, **kwargs):
+        return self.encode(obj, kwargs.get('sort_keys'), kwargs.get('indent')).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = self.compact is False or (self.compact is None and self._app.debug)
+        return self._app.response_class(self.encode(obj, indent=indent) + b'\n', mimetype=self.mimetype)
+
+
+def init_app(app):
+    """Install the fastest available provider as app.json"""
+    app.json = (OrjsonProvider if orjson is not None else MongoJSONProvider)(app)
@@ -0,0 +1,276 @@
+"""
+Non-blocking logging.
+
+Loggers only put records on a bounded in-memory queue (QueueHandler); one
+QueueListener thread per process formats them and does the stdout and file
+I/O. A request thread therefore never waits on a disk or a slow pipe.
+
+- Levels: LOG_LEVEL is set on the root logger, so records below it are
+  dropped before they are built; each sink has its own level on top of that.
+- Paths: records carrying a `path` (the access log) under one of
+  LOG_EXCLUDE_PATHS are dropped before they are queued.
+- Back pressure: the queue holds at most LOG_QUEUE_SIZE records. When it is
+  full new records are dropped, not waited for; drops are counted per level
+  and the listener logs a warning with the running total.
+
+Logging is per process, so the first app created in a process configures it.
+The listener is restarted in forked children (gunicorn preload_app) and
+flushed on exit.
+"""
+
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+
+from flask import g, request
+from flask.logging import default_handler
+from prometheus_client import Counter
+
+LOG_RECORDS_DROPPED = Counter(
+    'dagri_talk_log_records_dropped_total',
+    'Log records dropped because the log queue was full',
+    ['level']
+)
+
+ACCESS_LOGGER = 'dagri_talk.access'
+
+FORMATTERS = {
+    'detailed': '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    'json': '{"timestamp": "%(asctime)s", "logger": "%(name)s", "level": "%(levelname)s", "message": "%(message)s", "module": "%(module)s", "function": "%(funcName)s", "line": %(lineno)d}',
+}
+
+# The sinks behind the queue; file sinks are skipped when LOG_DIR is unset.
+# `only` / `exclude` restrict a sink to (or away from) logger name prefixes.
+SINKS = {
+    'console': {'level': 'INFO', 'formatter': 'json', 'exclude': ['werkzeug']},
+    'file': {'level': 'DEBUG', 'formatter': 'detailed', 'filename': 'dagri_talk.log', 'backupCount': 5},
+    'error_file': {'level': 'ERROR', 'formatter': 'detailed', 'filename': 'dagri_talk_errors.log', 'backupCount': 5},
+    'security_file': {'level': 'WARNING', 'formatter': 'json', 'filename': 'dagri_talk_security.log',
+                      'backupCount': 10, 'only': ['dagri_talk.security']},
+}
+
+SINK_MAX_BYTES = 10485760  # 10MB
+
+
+class PathFilter(logging.Filter):
+    """Drops records whose `path` attribute starts with an excluded prefix"""
+
+    def __init__(self, exclude=()):
+        super().__init__()
+        self.exclude = tuple(exclude)
+
+    def filter(self, record):
+        path = getattr(record, 'path', None)
+        return not (path and self.exclude and path.startswith(self.exclude))
+
+
+class LoggerNameFilter(logging.Filter):
+    """Passes records from the `only` logger prefixes and not from `exclude`"""
+
+    def __init__(self, only=(), exclude=()):
+        super().__init__()
+        self.only = tuple(only)
+        self.exclude = tuple(exclude)
+
+    def filter(self, record):
+        if self.only and not any(_under(record.name, name) for name in self.only):
+            return False
+        return not any(_under(record.name, name) for name in self.exclude)
+
+
+def _under(name, prefix):
+    return name == prefix or name.startswith(prefix + '.')
+
+
+class BoundedQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops (and counts) records instead of blocking"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self._dropped_lock = threading.Lock()
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._dropped_lock:
+                self.dropped += 1
+            LOG_RECORDS_DROPPED.labels(level=record.levelname).inc()
+
+
+class ReportingQueueListener(logging.handlers.QueueListener):
+    """QueueListener that logs a warning when the handler has dropped records"""
+
+    def __init__(self, log_queue, queue_handler, *handlers):
+        super().__init__(log_queue, *handlers, respect_handler_level=True)
+        self.queue_handler = queue_handler
+        self.reported = queue_handler.dropped
+
+    def enqueue_sentinel(self):
+        # Blocking: stop() must get through even when the queue is full
+        self.queue.put(self._sentinel)
+
+    def handle(self, record):
+        super().handle(record)
+        dropped = self.queue_handler.dropped
+        if dropped != self.reported:
+            self.reported = dropped
+            super().handle(logging.LogRecord(
+                'dagri_talk', logging.WARNING, __file__, 0,
+                'Log queue full: %d records dropped so far', (dropped,), None
+            ))
+
+
+def build_sinks(log_dir=None):
+    """The handlers the listener writes to, built from SINKS"""
+    sinks = []
+    for name, spec in SINKS.items():
+        if 'filename' in spec:
+            if not log_dir:
+                continue
+            os.makedirs(log_dir, exist_ok=True)
+            handler = logging.handlers.RotatingFileHandler(
+                os.path.join(log_dir, spec['filename']), maxBytes=SINK_MAX_BYTES, backupCount=spec['backupCount']
+            )
+        else:
+            handler = logging.StreamHandler(_Stdout())
+        handler.name = name
+        handler.setLevel(spec['level'])
+        handler.setFormatter(logging.Formatter(FORMATTERS[spec['formatter']]))
+        if spec.get('only') or spec.get('exclude'):
+            handler.addFilter(LoggerNameFilter(spec.get('only', ()), spec.get('exclude', ())))
+        sinks.append(handler)
+    return sinks
+
+
+class _Stdout:
+    """Resolves sys.stdout on every write, so a replaced stdout is honoured"""
+
+    def write(self, data):
+        return sys.stdout.write(data)
+
+    def flush(self):
+        sys.stdout.flush()
+
+
+class LogPipeline:
+    """The process's queue, its QueueHandler and the listener thread"""
+
+    def __init__(self):
+        self.handler = None
+        self.listener = None
+        self.sinks = []
+        self.queue_size = 0
+        self._lock = threading.Lock()
+
+    @property
+    def started(self):
+        return self.handler is not None
+
+    @property
+    def dropped(self):
+        return self.handler.dropped if self.handler else 0
+
+    def start(self, sinks, queue_size=10000, level=logging.INFO, exclude_paths=()):
+        """Route the root logger through the queue to `sinks` (no-op if already started)"""
+        with self._lock:
+            if self.handler is not None:
+                return False
+            self.sinks = list(sinks)
+            self.queue_size = queue_size
+            self.handler = BoundedQueueHandler(queue.Queue(queue_size))
+            self.handler.addFilter(PathFilter(exclude_paths))
+            root = logging.getLogger()
+            root.addHandler(self.handler)
+            root.setLevel(level)
+            self._start_listener()
+            return True
+
+    def _start_listener(self):
+        self.listener = ReportingQueueListener(self.handler.queue, self.handler, *self.sinks)
+        self.listener.start()
+
+    def after_fork(self):
+        """The parent's listener thread does not survive fork: start a fresh one"""
+        if self.handler is None:
+            return
+        # The inherited queue may hold records (and a lock) of the parent's
+        self._lock = threading.Lock()
+        self.handler.queue = queue.Queue(self.queue_size)
+        self._start_listener()
+
+    def stop(self):
+        """Flush what is queued, stop the listener and detach the handler"""
+        with self._lock:
+            if self.handler is None:
+                return
+            if self.listener is not None and self.listener._thread is not None:
+                self.listener.stop()
+            for handler in self.sinks:
+                handler.close()
+            logging.getLogger().removeHandler(self.handler)
+            self.handler = None
+            self.listener = None
+            self.sinks = []
+
+
+pipeline = LogPipeline()
+
+os.register_at_fork(after_in_child=pipeline.after_fork)
+atexit.register(pipeline.stop)
+
+
+def log_access(method, path, status_code, duration_ms):
+    """One access log line; also used by the ASGI read endpoints"""
+    access_logger = logging.getLogger(ACCESS_LOGGER)
+    if access_logger.isEnabledFor(logging.INFO):
+        access_logger.info(
+            '%s %s %s %.1fms', method, path, status_code, duration_ms,
+            extra={'path': path, 'method': method, 'status_code': status_code, 'duration_ms': duration_ms}
+        )
+
+
+def _exclude_paths(value):
+    if isinstance(value, str):
+        return [path.strip() for path in value.split(',') if path.strip()]
+    return list(value or [])
+
+
+def init_app(app):
+    """Start the process's log pipeline and log one access line per request"""
+    app.config.setdefault('LOG_PIPELINE', True)
+    app.config.setdefault('LOG_LEVEL', 'INFO')
+    app.config.setdefault('LOG_DIR', None)
+    app.config.setdefault('LOG_QUEUE_SIZE', 10000)
+    app.config.setdefault('LOG_EXCLUDE_PATHS', '/api/health,/metrics')
+    app.config.setdefault('LOG_ACCESS', True)
+
+    if app.config['LOG_PIPELINE']:
+        pipeline.start(
+            build_sinks(app.config['LOG_DIR']),
+            queue_size=app.config['LOG_QUEUE_SIZE'],
+            level=app.config['LOG_LEVEL'],
+            exclude_paths=_exclude_paths(app.config['LOG_EXCLUDE_PATHS']),
+        )
+        # Flask's own stderr handler would write on the request thread
+        app.logger.removeHandler(default_handler)
+    app.extensions['log_pipeline'] = pipeline
+
+    if not app.config['LOG_ACCESS']:
+        return
+
+    @app.before_request
+    def start_access_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def log_request(response):
+        duration_ms = (time.perf_counter() - g.get('request_started', time.perf_counter())) * 1000
+        log_access(request.method, request.path, response.status_code, duration_ms)
+        return response
@@ -0,0 +1,82 @@
+"""
+Prometheus exposition at /metrics.
+
+Under gunicorn every worker process has its own metric values. When
+PROMETHEUS_MULTIPROC_DIR is set (gunicorn_conf.py sets it) prometheus_client
+writes them to per-process files in that directory, and /metrics merges the
+files of all workers with a MultiProcessCollector, so any worker answers for
+the whole server. Gauges declare how their per-process values combine
+(multiprocess_mode); gunicorn_conf.child_exit drops the files of dead
+workers' live* gauges.
+
+Host metrics (CPU, memory) are read by SystemCollector when /metrics is
+scraped, once per scrape, instead of by a polling thread in every worker.
+"""
+
+import os
+
+from flask import Response
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, generate_latest
+from prometheus_client.core import GaugeMetricFamily
+
+try:
+    import psutil
+except ImportError:  # pragma: no cover - psutil is optional
+    psutil = None
+
+
+class SystemCollector:
+    """Host CPU and memory usage, read at scrape time"""
+
+    def __init__(self):
+        if psutil is not None:
+            # cpu_percent(None) reports usage since the previous call; prime it
+            psutil.cpu_percent(interval=None)
+
+    def collect(self):
+        if psutil is None:
+            return
+        yield GaugeMetricFamily('dagri_talk_system_cpu_percent', 'System CPU usage percentage',
+                                value=psutil.cpu_percent(interval=None))
+        yield GaugeMetricFamily('dagri_talk_system_memory_percent', 'System memory usage percentage',
+                                value=psutil.virtual_memory().percent)
+
+
+system_collector = SystemCollector()
+REGISTRY.register(system_collector)
+
+# Scrape-time collectors; also added to the merged multiprocess registry
+scrape_collectors = [system_collector]
+
+
+def multiprocess_dir():
+    return os.environ.get('PROMETHEUS_MULTIPROC_DIR') or os.environ.get('prometheus_multiproc_dir')
+
+
+def scrape_registry():
+    """The registry /metrics renders: merged worker files in multiprocess mode"""
+    if not multiprocess_dir():
+        return REGISTRY
+    from prometheus_client import multiprocess
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    for collector in scrape_collectors:
+        registry.register(collector)
+    return registry
+
+
+def register_scrape_collector(collector):
+    """Add a scrape-time collector to /metrics in both modes"""
+    scrape_collectors.append(collector)
+    REGISTRY.register(collector)
+
+
+def metrics_endpoint():
+    """Prometheus metrics endpoint"""
+    return Response(generate_latest(scrape_registry()), mimetype=CONTENT_TYPE_LATEST)
+
+
+def init_app(app):
+    """Serve /metrics"""
+    if 'metrics' not in app.view_functions:
+        app.add_url_rule('/metrics', 'metrics', metrics_endpoint)
@@ -1,5 +1,6 @@
 from datetime import datetime
 from bson.objectid import ObjectId
+from app.database import utcnow
 
 """
 Knowledge Entry document structure:
@@ -11,12 +12,66 @@ Knowledge Entry document structure:
     crop_type: String,
     season: String,
     region: String,
+    text_language: String,  # language normalized for the text index, see text_search_language()
     author_id: ObjectId,
     created_at: DateTime,
     updated_at: DateTime
 }
 """
 
+# Languages the MongoDB text index can stem, keyed by lower-case name and ISO code
+TEXT_SEARCH_LANGUAGES = {
+    'danish': 'danish', 'da': 'danish',
+    'dutch': 'dutch', 'nl': 'dutch',
+    'english': 'english', 'en': 'english', 'liberian english': 'english',
+    'finnish': 'finnish', 'fi': 'finnish',
+    'french': 'french', 'fr': 'french',
+    'german': 'german', 'de': 'german',
+    'hungarian': 'hungarian', 'hu': 'hungarian',
+    'italian': 'italian', 'it': 'italian',
+    'norwegian': 'norwegian', 'nb': 'norwegian',
+    'portuguese': 'portuguese', 'pt': 'portuguese',
+    'romanian': 'romanian', 'ro': 'romanian',
+    'russian': 'russian', 'ru': 'russian',
+    'spanish': 'spanish', 'es': 'spanish',
+    'swedish': 'swedish', 'sv': 'swedish',
+    'turkish': 'turkish', 'tr': 'turkish',
+}
+
+def text_search_language(language):
+    """
+    Map an entry's free-form language to the text index's stemming language.
+    The index reads text_language rather than language itself because MongoDB
+    rejects writes whose language override is not a supported language;
+    local languages such as Kpelle or Bassa are indexed without stemming.
+    """
+    if not language:
+        return 'english'
+    return TEXT_SEARCH_LANGUAGES.get(language.strip().lower(), 'none')
+
+def build_knowledge_entry(data, author_id, now=None):
+    """
+    Validate request data for a new knowledge entry and build its document.
+    Raises ValueError with the API error message. Shared by POST
+    /api/knowledge and the import CLI.
+    """
+    if not isinstance(data, dict) or not data.get('title') or not data.get('content'):
+        raise ValueError('Missing required fields')
+    
+    now = now or utcnow()
+    return {
+        'title': data['title'],
+        'content': data['content'],
+        'author_id': ObjectId(author_id) if author_id else None,
+        'language': data.get('language'),
+        'crop_type': data.get('crop_type'),
+        'season': data.get('season'),
+        'region': data.get('region'),
+        'text_language': text_search_language(data.get('language')),
+        'created_at': now,
+        'updated_at': now
+    }
+
 def create_knowledge_entry(mongo, title, content, author_id, language=None, 
                          crop_type=None, season=None, region=None):
     """Create a new knowledge entry document"""
@@ -28,6 +83,7 @@ def create_knowledge_entry(mongo, title, content, author_id, language=None,
         'crop_type': crop_type,
         'season': season,
         'region': region,
+        'text_language': text_search_language(language),
         'author_id': ObjectId(author_id),
         'created_at': now,
         'updated_at': now
@@ -44,21 +100,31 @@ def get_all_knowledge_entries(mongo):
     """Get all knowledge entries"""
     return list(mongo.db.knowledge_entries.find())
 
-def knowledge_entry_to_dict(mongo, entry):
-    """Convert knowledge entry to dictionary for API responses"""
-    author = mongo.db.users.find_one({'_id': entry['author_id']})
-    author_username = author['username'] if author else None
-    
-    return {
-        'id': str(entry['_id']),
-        'title': entry['title'],
-        'content': entry['content'],
-        'language': entry.get('language'),
-        'crop_type': entry.get('crop_type'),
-        'season': entry.get('season'),
-        'region': entry.get('region'),
-        'author_id': str(entry['author_id']),
-        'author_username': author_username,
-        'created_at': entry['created_at'].isoformat(),
-        'updated_at': entry['updated_at'].isoformat()
-    }
\ No newline at end of file
+def knowledge_list_pipeline(query, sort, limit=None, projection=None):
+    """
+    Aggregation pipeline for a page of knowledge entries. projection is a $project
+    inclusion spec (see app.fields); author_username is filled in afterwards
+    by app.user_cache.attach_usernames.
+    """
+    pipeline = [{'$match': query}, {'$sort': dict(sort)}]
+    if limit:
+        pipeline.append({'$limit': limit})
+    if projection:
+        pipeline.append({'$project': projection})
+    return pipeline
+
+def knowledge_search_pipeline(query, skip, limit, projection=None):
+    """
+    Aggregation pipeline for a $text query ranked by text score. Each
+    result carries its relevance as `score`.
+    """
+    pipeline = [
+        {'$match': query},
+        {'$sort': {'score': {'$meta': 'textScore'}, '_id': -1}},
+        {'$skip': skip},
+        {'$limit': limit}
+    ]
+    if projection:
+        pipeline.append({'$project': projection})
+    pipeline.append({'$addFields': {'score': {'$meta': 'textScore'}}})
+    return pipeline
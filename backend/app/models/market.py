@@ -1,5 +1,36 @@
 from datetime import datetime
 from bson.objectid import ObjectId
+from app.database import utcnow
+
+MARKET_LISTING_REQUIRED_FIELDS = ('crop_name', 'quantity', 'unit', 'price_per_unit', 'location')
+
+def build_market_listing(data, farmer_id, now=None):
+    """
+    Validate request data for a new listing and build its document.
+    Raises ValueError with the API error message. Shared by POST /api/market,
+    POST /api/market/bulk and the import CLI.
+    """
+    if not isinstance(data, dict) or not all(k in data for k in MARKET_LISTING_REQUIRED_FIELDS):
+        raise ValueError('Missing required fields')
+    try:
+        quantity = float(data['quantity'])
+        price_per_unit = float(data['price_per_unit'])
+    except (TypeError, ValueError):
+        raise ValueError('Invalid data type for quantity or price_per_unit. Must be a number.')
+    
+    now = now or utcnow()
+    return {
+        'crop_name': data['crop_name'],
+        'quantity': quantity,
+        'unit': data['unit'],
+        'price_per_unit': price_per_unit,
+        'location': data['location'],
+        'description': data.get('description', ''),
+        'farmer_id': ObjectId(farmer_id) if farmer_id else None,
+        'is_available': True,
+        'created_at': now,
+        'updated_at': now
+    }
 
 def create_market_listing(mongo, crop_name, quantity, unit, price_per_unit, 
                         location, farmer_id, description=None):
@@ -30,22 +61,15 @@ def get_all_market_listings(mongo, available_only=True):
     query = {'is_available': True} if available_only else {}
     return list(mongo.db.market_listings.find(query))
 
-def market_listing_to_dict(mongo, listing):
-    """Convert market listing to dictionary for API responses"""
-    farmer = mongo.db.users.find_one({'_id': listing['farmer_id']})
-    farmer_username = farmer['username'] if farmer else None
-    
-    return {
-        'id': str(listing['_id']),
-        'crop_name': listing['crop_name'],
-        'quantity': listing['quantity'],
-        'unit': listing['unit'],
-        'price_per_unit': listing['price_per_unit'],
-        'location': listing['location'],
-        'description': listing.get('description', ''),
-        'farmer_id': str(listing['farmer_id']),
-        'farmer_username': farmer_username,
-        'is_available': listing['is_available'],
-        'created_at': listing['created_at'].isoformat(),
-        'updated_at': listing['updated_at'].isoformat()
-    }
\ No newline at end of file
+def market_list_pipeline(query, sort, limit=None, projection=None):
+    """
+    Aggregation pipeline for a page of market listings. projection is a $project
+    inclusion spec (see app.fields); farmer_username is filled in afterwards
+    by app.user_cache.attach_usernames.
+    """
+    pipeline = [{'$match': query}, {'$sort': dict(sort)}]
+    if limit:
+        pipeline.append({'$limit': limit})
+    if projection:
+        pipeline.append({'$project': projection})
+    return pipeline
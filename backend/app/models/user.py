@@ -1,6 +1,9 @@
-from werkzeug.security import generate_password_hash, check_password_hash
 from bson.objectid import ObjectId
 from datetime import datetime
+from app.database import utcnow
+from app.indexes import EMAIL_COLLATION
+from app.passwords import hash_password, verify_password
+from werkzeug.http import http_date
 
 """
 User document structure:
@@ -15,12 +18,32 @@ User document structure:
 }
 """
 
+def build_user(data, now=None):
+    """
+    Validate registration data and build a user document with a hashed
+    password. Raises ValueError with the API error message. Shared by
+    POST /api/auth/register and the import CLI.
+    """
+    if not isinstance(data, dict) or not data.get('email') or not data.get('password') or not data.get('username'):
+        raise ValueError('Missing required fields')
+    if not isinstance(data['email'], str) or not isinstance(data['username'], str):
+        raise ValueError('Invalid email or username')
+    
+    return {
+        'username': data['username'],
+        'email': data['email'].strip(),
+        'password_hash': hash_password(data['password']),
+        'user_type': data.get('user_type', 'farmer'),
+        'location': data.get('location'),
+        'created_at': now or utcnow()
+    }
+
 def create_user(mongo, username, email, password, user_type, location=None):
     """Create a new user document"""
     user = {
         'username': username,
         'email': email,
-        'password_hash': generate_password_hash(password),
+        'password_hash': hash_password(password),
         'user_type': user_type,
         'location': location,
         'created_at': datetime.utcnow()
@@ -29,7 +52,7 @@ def create_user(mongo, username, email, password, user_type, location=None):
 
 def get_user_by_email(mongo, email):
     """Get user by email"""
-    return mongo.db.users.find_one({'email': email})
+    return mongo.db.users.find_one({'email': email}, collation=EMAIL_COLLATION)
 
 def get_user_by_username(mongo, username):
     """Get user by username"""
@@ -43,15 +66,30 @@ def get_user_by_id(mongo, user_id):
 
 def check_password(user, password):
     """Check password against stored hash"""
-    return check_password_hash(user['password_hash'], password)
+    return verify_password(user['password_hash'], password)
 
-def user_to_dict(user):
-    """Convert user document to dictionary for API responses"""
+# Everything GET /api/auth/profile?fresh=true returns
+PROFILE_PROJECTION = {'username': 1, 'email': 1, 'user_type': 1, 'location': 1, 'created_at': 1}
+
+# The non-sensitive part embedded in access tokens (readable by anyone holding one)
+PROFILE_CLAIMS_PROJECTION = {'username': 1, 'user_type': 1, 'location': 1}
+
+def user_profile(user):
+    """Public profile fields; created_at keeps the HTTP-date format clients already parse"""
     return {
         'id': str(user['_id']),
         'username': user['username'],
         'email': user['email'],
-        'user_type': user['user_type'],
-        'location': user['location'],
-        'created_at': user['created_at'].isoformat()
-    }
\ No newline at end of file
+        'user_type': user.get('user_type', 'user'),
+        'location': user.get('location'),
+        'created_at': http_date(user['created_at']) if user.get('created_at') else None
+    }
+
+def profile_claims(user):
+    """The access token's profile claim: no email or other private fields"""
+    return {
+        'id': str(user['_id']),
+        'username': user['username'],
+        'user_type': user.get('user_type', 'user'),
+        'location': user.get('location')
+    }
@@ -3,6 +3,7 @@ D'Agri Talk Application Monitoring
 Comprehensive monitoring and metrics collection
 """
 
+import atexit
 import time
 import logging
 import json
@@ -11,9 +12,12 @@ from functools import wraps
 from flask import request, g, current_app
 import psutil
 import boto3
-from prometheus_client import Counter, Histogram, Gauge, generate_latest
+from prometheus_client import Counter, Histogram, Gauge
 import structlog
 
+from app import metrics
+from app.cloudwatch import MetricAggregator
+
 # Configure structured logging
 structlog.configure(
     processors=[
@@ -48,35 +52,21 @@ REQUEST_DURATION = Histogram(
     ['method', 'endpoint']
 )
 
+# Gauges say how the values of gunicorn workers are combined (app.metrics)
 ACTIVE_USERS = Gauge(
     'dagri_talk_active_users',
-    'Number of active users'
+    'Number of active users',
+    multiprocess_mode='livesum'
 )
 
 DATABASE_CONNECTIONS = Gauge(
     'dagri_talk_database_connections',
-    'Number of active database connections'
+    'Number of active database connections',
+    multiprocess_mode='livesum'
 )
 
-KNOWLEDGE_ENTRIES = Gauge(
-    'dagri_talk_knowledge_entries_total',
-    'Total number of knowledge entries'
-)
-
-MARKET_LISTINGS = Gauge(
-    'dagri_talk_market_listings_total',
-    'Total number of market listings'
-)
-
-SYSTEM_CPU = Gauge(
-    'dagri_talk_system_cpu_percent',
-    'System CPU usage percentage'
-)
-
-SYSTEM_MEMORY = Gauge(
-    'dagri_talk_system_memory_percent',
-    'System memory usage percentage'
-)
+# dagri_talk_knowledge_entries_total and dagri_talk_market_listings_total
+# (with per-crop and per-region breakdowns) are collected by app.stats
 
 ERROR_COUNT = Counter(
     'dagri_talk_errors_total',
@@ -88,6 +78,8 @@ class ApplicationMonitor:
     def __init__(self, app=None):
         self.app = app
         self.cloudwatch = None
+        self.cloudwatch_metrics = None
+        self.environment = 'development'
         
         if app is not None:
             self.init_app(app)
@@ -95,23 +87,36 @@ class ApplicationMonitor:
     def init_app(self, app):
         """Initialize monitoring for Flask app"""
         self.app = app
+        self.environment = app.config.get('ENV', 'development')
         
-        # Initialize CloudWatch client
+        # Initialize CloudWatch client; request metrics are aggregated in
+        # process and published every CLOUDWATCH_FLUSH_INTERVAL seconds
         try:
-            self.cloudwatch = boto3.client('cloudwatch', region_name='us-east-1')
+            self.cloudwatch = boto3.client(
+                'cloudwatch',
+                region_name=app.config.get('CLOUDWATCH_REGION', 'us-east-1'),
+                endpoint_url=app.config.get('CLOUDWATCH_ENDPOINT_URL'),
+            )
         except Exception as e:
             logger.warning("CloudWatch client initialization failed", error=str(e))
         
+        if self.cloudwatch:
+            self.cloudwatch_metrics = MetricAggregator(
+                self.cloudwatch,
+                app.config.get('CLOUDWATCH_NAMESPACE', 'DAgriTalk/Application'),
+                interval=app.config.get('CLOUDWATCH_FLUSH_INTERVAL', 60),
+                max_series=app.config.get('CLOUDWATCH_MAX_SERIES', 1000),
+            ).register_at_fork().start()
+            app.extensions['cloudwatch_metrics'] = self.cloudwatch_metrics
+            atexit.register(self.cloudwatch_metrics.stop)
+        
         # Register monitoring hooks
         app.before_request(self.before_request)
         app.after_request(self.after_request)
         app.teardown_appcontext(self.teardown_request)
         
-        # Register metrics endpoint
-        app.add_url_rule('/metrics', 'metrics', self.metrics_endpoint)
-        
-        # Start background monitoring
-        self.start_background_monitoring()
+        # Register metrics endpoint (system metrics are read per scrape there)
+        metrics.init_app(app)
     
     def before_request(self):
         """Record request start time"""
@@ -178,81 +183,17 @@ class ApplicationMonitor:
             )
     
     def send_cloudwatch_metrics(self, duration, status_code):
-        """Send custom metrics to CloudWatch"""
-        if not self.cloudwatch:
+        """Add the request to the CloudWatch aggregates (no I/O here)"""
+        if not self.cloudwatch_metrics:
             return
         
-        try:
-            self.cloudwatch.put_metric_data(
-                Namespace='DAgriTalk/Application',
-                MetricData=[
-                    {
-                        'MetricName': 'RequestDuration',
-                        'Value': duration,
-                        'Unit': 'Seconds',
-                        'Dimensions': [
-                            {
-                                'Name': 'Environment',
-                                'Value': current_app.config.get('ENV', 'development')
-                            }
-                        ]
-                    },
-                    {
-                        'MetricName': 'RequestCount',
-                        'Value': 1,
-                        'Unit': 'Count',
-                        'Dimensions': [
-                            {
-                                'Name': 'StatusCode',
-                                'Value': str(status_code)
-                            },
-                            {
-                                'Name': 'Environment',
-                                'Value': current_app.config.get('ENV', 'development')
-                            }
-                        ]
-                    }
-                ]
-            )
-        except Exception as e:
-            logger.warning("Failed to send CloudWatch metrics", error=str(e))
-    
-    def start_background_monitoring(self):
-        """Start background system monitoring"""
-        import threading
-        
-        def monitor_system():
-            while True:
-                try:
-                    # System metrics
-                    cpu_percent = psutil.cpu_percent(interval=1)
-                    memory_percent = psutil.virtual_memory().percent
-                    
-                    SYSTEM_CPU.set(cpu_percent)
-                    SYSTEM_MEMORY.set(memory_percent)
-                    
-                    # Application metrics (would require database connection)
-                    # KNOWLEDGE_ENTRIES.set(get_knowledge_count())
-                    # MARKET_LISTINGS.set(get_market_listings_count())
-                    
-                    logger.debug(
-                        "System metrics updated",
-                        cpu_percent=cpu_percent,
-                        memory_percent=memory_percent
-                    )
-                    
-                    time.sleep(30)  # Update every 30 seconds
-                    
-                except Exception as e:
-                    logger.error("Background monitoring error", error=str(e))
-                    time.sleep(60)  # Wait longer on error
-        
-        thread = threading.Thread(target=monitor_system, daemon=True)
-        thread.start()
+        environment = (('Environment', self.environment),)
+        self.cloudwatch_metrics.record('RequestDuration', duration, 'Seconds', environment)
+        self.cloudwatch_metrics.record('RequestCount', 1, 'Count', (('StatusCode', str(status_code)),) + environment)
     
     def metrics_endpoint(self):
         """Prometheus metrics endpoint"""
-        return generate_latest(), 200, {'Content-Type': 'text/plain'}
+        return metrics.metrics_endpoint()
     
     def get_health_status(self):
         """Get comprehensive health status"""
@@ -0,0 +1,124 @@
+"""
+Keyset (cursor) pagination for the list endpoints.
+
+A page is sorted on (field, _id) and the cursor is the sort order plus the
+last document's values for those two keys, base64-encoded so clients treat
+it as opaque. A cursor used with a different sort is rejected rather than
+silently ranging on the wrong field.
+The next page is fetched with a range on the sort index, so page 1000
+costs the same as page 1.
+
+Results ranked by a computed score (text search) cannot be ranged on, so
+they use an offset carried in the same opaque cursor format, capped at
+MAX_OFFSET.
+"""
+
+import base64
+import binascii
+
+from bson import json_util
+from bson.errors import BSONError
+from pymongo import ASCENDING
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+MAX_OFFSET = 1000
+
+
+class PaginationError(ValueError):
+    """Raised for a malformed cursor or limit"""
+
+
+def encode_cursor(values):
+    raw = json_util.dumps(values).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode('ascii')
+
+
+def decode_cursor(token, length=2):
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json_util.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (binascii.Error, ValueError, UnicodeError, TypeError, BSONError):
+        raise PaginationError('Invalid cursor')
+    if not isinstance(values, list) or len(values) != length:
+        raise PaginationError('Invalid cursor')
+    return values
+
+
+def sort_id(sort):
+    """A sort spec as text, e.g. 'price_per_unit:1,_id:1'"""
+    return ','.join(f'{field}:{direction}' for field, direction in sort)
+
+
+def parse_limit(value, default=DEFAULT_LIMIT, maximum=MAX_LIMIT):
+    """Parse ?limit=, clamping it to maximum"""
+    if value is None or value == '':
+        return default
+    try:
+        limit = int(value)
+    except ValueError:
+        raise PaginationError('limit must be an integer')
+    if limit < 1:
+        raise PaginationError('limit must be at least 1')
+    return min(limit, maximum)
+
+
+def wants_pagination(args):
+    """The unpaginated response is kept behind ?paginate=false for old clients"""
+    return args.get('paginate', 'true').lower() != 'false'
+
+
+def keyset_filter(sort, values):
+    """
+    Filter for documents after `values` in a [(field, direction), ('_id', direction)] sort.
+    The bare range on the leading field bounds the index scan; the $or breaks ties on _id.
+    """
+    (field, direction), (tie_field, tie_direction) = sort
+    value, tie_value = values
+    inclusive, strict = ('$gte', '$gt') if direction == ASCENDING else ('$lte', '$lt')
+    tie_op = '$gt' if tie_direction == ASCENDING else '$lt'
+    return {
+        field: {inclusive: value},
+        '$or': [{field: {strict: value}}, {tie_field: {tie_op: tie_value}}]
+    }
+
+
+def apply_cursor(query, sort, cursor):
+    """Narrow query to the page after cursor (if any)"""
+    if not cursor:
+        return query
+    cursor_sort, *values = decode_cursor(cursor, length=3)
+    if cursor_sort != sort_id(sort):
+        raise PaginationError('Cursor does not match the sort order')
+    after = keyset_filter(sort, values)
+    return {'$and': [query, after]} if query else after
+
+
+def split_page(docs, limit, sort):
+    """
+    Given up to limit + 1 documents, return (page, next_cursor). Must run
+    before the documents are serialized, while the sort keys are still
+    native datetime/ObjectId values.
+    """
+    if len(docs) <= limit:
+        return docs, None
+    page = docs[:limit]
+    last = page[-1]
+    return page, encode_cursor([sort_id(sort)] + [last.get(field) for field, _ in sort])
+
+
+def decode_offset_cursor(token):
+    """Offset encoded by split_offset_page; 0 when there is no cursor"""
+    if not token:
+        return 0
+    kind, offset = decode_cursor(token)
+    if kind != 'offset' or not isinstance(offset, int) or not 0 <= offset <= MAX_OFFSET:
+        raise PaginationError('Invalid cursor')
+    return offset
+
+
+def split_offset_page(docs, limit, offset):
+    """Like split_page for offset-paginated results; stops at MAX_OFFSET"""
+    if len(docs) <= limit or offset + limit > MAX_OFFSET:
+        return docs[:limit], None
+    return docs[:limit], encode_cursor(['offset', offset + limit])
@@ -0,0 +1,128 @@
+"""
+Password hashing off the request thread.
+
+The algorithm and cost come from the config (PASSWORD_HASH_ALGORITHM,
+PASSWORD_HASH_COST). hashlib's scrypt and pbkdf2_hmac release the GIL, so
+hashes run on a small per-process thread pool and a gthread or gevent
+worker keeps serving other requests meanwhile. At most
+PASSWORD_HASH_WORKERS + PASSWORD_HASH_MAX_PENDING hashes are in flight per
+process; beyond that callers wait up to PASSWORD_HASH_TIMEOUT seconds and
+then get PasswordHasherBusy (503) rather than queueing without bound.
+
+Hashes made with other parameters still verify; needs_rehash() tells the
+login route to store a fresh hash with the current ones.
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+from werkzeug.security import check_password_hash, generate_password_hash
+
+DEFAULT_COSTS = {
+    'scrypt': 2 ** 15,
+    'pbkdf2': 600000,
+}
+
+
+class PasswordHasherBusy(RuntimeError):
+    """Raised when the hash pool stays full for PASSWORD_HASH_TIMEOUT seconds"""
+
+
+def hash_method(algorithm, cost=None):
+    """werkzeug method string, e.g. 'scrypt:32768:8:1' or 'pbkdf2:sha256:600000'"""
+    if algorithm not in DEFAULT_COSTS:
+        raise ValueError(f"PASSWORD_HASH_ALGORITHM must be one of: {', '.join(DEFAULT_COSTS)}")
+    cost = cost or DEFAULT_COSTS[algorithm]
+    if algorithm == 'scrypt':
+        return f'scrypt:{cost}:8:1'
+    return f'pbkdf2:sha256:{cost}'
+
+
+def _gevent_threadpool():
+    """gevent's native thread pool when threading is monkey-patched, else None"""
+    try:
+        from gevent import get_hub, monkey
+    except ImportError:
+        return None
+    if not monkey.is_module_patched('threading'):
+        return None
+    return get_hub().threadpool
+
+
+class PasswordHasher:
+    def __init__(self, method, workers=2, max_pending=32, timeout=10):
+        self.method = method
+        self.workers = workers
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(workers + max_pending)
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _run(self, func, *args):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PasswordHasherBusy('Too many password checks in progress')
+        try:
+            # Patched threads are greenlets and would run the hash on the hub
+            pool = _gevent_threadpool()
+            if pool is not None:
+                return pool.apply(func, args)
+            return self._pool().submit(func, *args).result()
+        finally:
+            self._slots.release()
+
+    def _pool(self):
+        # Threads do not survive fork; start a fresh pool in each worker
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix='password-hash')
+                self._pid = os.getpid()
+            return self._executor
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, password_hash, password):
+        return self._run(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        return password_hash.split('$', 1)[0] != self.method
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None and self._pid == os.getpid():
+                self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+def _hasher():
+    return current_app.extensions['password_hasher']
+
+
+def hash_password(password):
+    return _hasher().hash(password)
+
+
+def verify_password(password_hash, password):
+    return _hasher().verify(password_hash, password)
+
+
+def needs_rehash(password_hash):
+    return _hasher().needs_rehash(password_hash)
+
+
+def init_app(app):
+    """Build the app's PasswordHasher from its config"""
+    app.config.setdefault('PASSWORD_HASH_ALGORITHM', 'scrypt')
+    app.config.setdefault('PASSWORD_HASH_COST', None)
+    app.config.setdefault('PASSWORD_HASH_WORKERS', 2)
+    app.config.setdefault('PASSWORD_HASH_MAX_PENDING', 32)
+    app.config.setdefault('PASSWORD_HASH_TIMEOUT', 10)
+    app.extensions['password_hasher'] = PasswordHasher(
+        hash_method(app.config['PASSWORD_HASH_ALGORITHM'], app.config['PASSWORD_HASH_COST']),
+        workers=app.config['PASSWORD_HASH_WORKERS'],
+        max_pending=app.config['PASSWORD_HASH_MAX_PENDING'],
+        timeout=app.config['PASSWORD_HASH_TIMEOUT'],
+    )
@@ -0,0 +1,354 @@
+"""
+Response cache for the hot public GET endpoints.
+
+A @cached(namespace) view is looked up before it runs; 200 responses are
+stored for RESPONSE_CACHE_TTL seconds. Under @conditional the entry key is
+the request's ETag, which covers the collection version, the path and the
+normalized query string: every write bumps the version (app.stats), so
+every process and host moves to new keys at once and a body is never
+served under a validator newer than itself. Other views (static content)
+are keyed by path plus normalized query string.
+
+The POST handlers also call invalidate(namespace) after a successful
+write, which drops the namespace's entries right away.
+
+Backends (RESPONSE_CACHE_BACKEND):
+
+    memory  per-process LRU of at most RESPONSE_CACHE_MAX_ENTRIES entries
+            and RESPONSE_CACHE_MAX_BYTES bytes.
+            Invalidation only frees the memory of the worker that handled
+            the write; elsewhere the old-version entries age out.
+    redis   shared by all workers and hosts (RESPONSE_CACHE_URL, any server
+            speaking the Redis protocol). Every entry is its own key with
+            a TTL, so Redis expires it; the key carries the namespace's
+            generation, so invalidation is one INCR and the old entries
+            are never read again.
+    none    no caching.
+
+Responses larger than RESPONSE_CACHE_MAX_ENTRY_BYTES are not stored, and
+neither are the unpaginated (?paginate=false) lists, whose size grows
+with the collection.
+
+Every stored response gets an entry id. app.compression keeps the gzip and
+brotli bodies of a response next to it (variants keyed by that id), so a
+cached list is compressed once per entry rather than on every hit.
+
+Concurrent misses for the same key are coalesced: one request runs the
+view and the others wait up to RESPONSE_CACHE_WAIT seconds for its result
+(single-flight, per process). Lookups are counted in
+dagri_talk_response_cache_requests_total{namespace, result}; the hit ratio
+is hit / (hit + miss + coalesced).
+"""
+
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from functools import wraps
+from urllib.parse import urlencode
+
+from flask import current_app, g, make_response, request
+from prometheus_client import Counter
+
+from app.pagination import wants_pagination
+
+CACHE_REQUESTS = Counter(
+    'dagri_talk_response_cache_requests_total',
+    'Response cache lookups by result (hit, miss, coalesced)',
+    ['namespace', 'result']
+)
+
+CACHE_INVALIDATIONS = Counter(
+    'dagri_talk_response_cache_invalidations_total',
+    'Response cache namespaces dropped after a write',
+    ['namespace']
+)
+
+
+def cache_key(path, query_items):
+    """
+    path?query with the query pairs sorted, so parameter order does not
+    matter, and URL-encoded, so '&' or '=' inside a value cannot pass for
+    another parameter.
+    """
+    return path + '?' + urlencode(sorted(query_items))
+
+
+def encode_entry(status, headers, body, entry_id):
+    """One bytes value: a JSON header line, then the body"""
+    meta = {'status': status, 'headers': headers, 'id': entry_id}
+    return json.dumps(meta).encode('utf-8') + b'\n' + body
+
+
+def decode_entry(raw):
+    meta, _, body = raw.partition(b'\n')
+    meta = json.loads(meta)
+    return meta['status'], meta['headers'], body, meta['id']
+
+
+def variant_key(key, entry_id, name):
+    # '#' never occurs in a request path, so variants cannot collide with entries
+    return f'{key}#{entry_id}#{name}'
+
+
+class MemoryBackend:
+    """Thread-safe LRU with per-entry expiry, bounded by entry count and total bytes"""
+
+    def __init__(self, maxsize=1000, max_bytes=32 * 1024 * 1024, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.clock = clock
+        self.size_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _remove(self, full_key):
+        value, _ = self._entries.pop(full_key)
+        self.size_bytes -= len(value)
+
+    def get(self, namespace, key):
+        with self._lock:
+            full_key = (namespace, key)
+            entry = self._entries.get(full_key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= self.clock():
+                self._remove(full_key)
+                return None
+            self._entries.move_to_end(full_key)
+            return value
+
+    def set(self, namespace, key, value, ttl):
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            full_key = (namespace, key)
+            if full_key in self._entries:
+                self._remove(full_key)
+            self._entries[full_key] = (value, self.clock() + ttl)
+            self.size_bytes += len(value)
+            while len(self._entries) > self.maxsize or self.size_bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, namespace):
+        with self._lock:
+            for full_key in [full_key for full_key in self._entries if full_key[0] == namespace]:
+                self._remove(full_key)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class RedisBackend:
+    """
+    One Redis key per entry, set with its TTL (SET PX), under the
+    namespace's current generation; invalidation increments the generation.
+    """
+
+    def __init__(self, url=None, client=None, prefix='dagri_talk:response_cache:'):
+        if client is None:
+            import redis
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.prefix = prefix
+
+    def _generation_key(self, namespace):
+        return f'{self.prefix}{namespace}:generation'
+
+    def _key(self, namespace, key):
+        generation = int(self.client.get(self._generation_key(namespace)) or 0)
+        return f'{self.prefix}{namespace}:{generation}:{key}'
+
+    def get(self, namespace, key):
+        return self.client.get(self._key(namespace, key))
+
+    def set(self, namespace, key, value, ttl):
+        # Written under a generation invalidated in between, it is never read again
+        self.client.set(self._key(namespace, key), value, px=max(1, int(ttl * 1000)))
+
+    def invalidate(self, namespace):
+        self.client.incr(self._generation_key(namespace))
+
+
+class ResponseCache:
+    """A backend plus TTL, single-flight and metrics"""
+
+    def __init__(self, backend, ttl=30, wait=5.0, max_entry_bytes=1024 * 1024):
+        self.backend = backend
+        self.ttl = ttl
+        self.wait = wait
+        self.max_entry_bytes = max_entry_bytes
+        self._inflight = {}
+        # Invalidations seen by this process, so a response computed while a
+        # write landed is not stored (other processes: bounded by the TTL)
+        self._invalidations = {}
+        self._lock = threading.Lock()
+
+    def _lookup(self, namespace, key):
+        try:
+            raw = self.backend.get(namespace, key)
+        except Exception as e:
+            current_app.logger.error(f"Response cache read failed: {str(e)}")
+            return None
+        return decode_entry(raw) if raw is not None else None
+
+    def _store(self, namespace, key, response):
+        entry_id = self.store(namespace, key, response.status_code, response.headers.items(), response.get_data())
+        if entry_id is not None:
+            response.cache_entry = (self, namespace, key, entry_id)
+
+    def lookup(self, namespace, key):
+        """The stored (status, headers, body, entry id) for key, or None; counted as a hit or a miss"""
+        entry = self._lookup(namespace, key)
+        CACHE_REQUESTS.labels(namespace=namespace, result='miss' if entry is None else 'hit').inc()
+        return entry
+
+    def store(self, namespace, key, status, headers, body):
+        """Store a response given by its parts; its entry id, or None if it was not stored"""
+        if len(body) > self.max_entry_bytes:
+            return None
+        headers = [[name, value] for name, value in headers
+                   if name.lower() not in ('content-length', 'set-cookie')]
+        entry_id = uuid.uuid4().hex
+        value = encode_entry(status, headers, body, entry_id)
+        try:
+            self.backend.set(namespace, key, value, self.ttl)
+        except Exception as e:
+            current_app.logger.error(f"Response cache write failed: {str(e)}")
+            return None
+        return entry_id
+
+    def get_variant(self, namespace, key, entry_id, name):
+        """A derived body (e.g. 'gzip') of a stored entry, or None"""
+        try:
+            return self.backend.get(namespace, variant_key(key, entry_id, name))
+        except Exception as e:
+            current_app.logger.error(f"Response cache read failed: {str(e)}")
+            return None
+
+    def set_variant(self, namespace, key, entry_id, name, body):
+        """Store a derived body; it is invalidated and expires with its namespace"""
+        if len(body) > self.max_entry_bytes:
+            return
+        try:
+            self.backend.set(namespace, variant_key(key, entry_id, name), body, self.ttl)
+        except Exception as e:
+            current_app.logger.error(f"Response cache write failed: {str(e)}")
+
+    def get_or_compute(self, namespace, key, compute):
+        """
+        The cached response for key, or compute() (a Flask response); only
+        one caller per key and process computes at a time.
+        """
+        entry = self._lookup(namespace, key)
+        if entry is not None:
+            CACHE_REQUESTS.labels(namespace=namespace, result='hit').inc()
+            return self._response(namespace, key, entry)
+
+        with self._lock:
+            flight = self._inflight.get((namespace, key))
+            leader = flight is None
+            if leader:
+                flight = self._inflight[(namespace, key)] = threading.Event()
+
+        if not leader:
+            if flight.wait(self.wait):
+                entry = self._lookup(namespace, key)
+                if entry is not None:
+                    CACHE_REQUESTS.labels(namespace=namespace, result='coalesced').inc()
+                    return self._response(namespace, key, entry)
+            # The leader's response was not cacheable (or took too long)
+            CACHE_REQUESTS.labels(namespace=namespace, result='miss').inc()
+            return compute()
+
+        CACHE_REQUESTS.labels(namespace=namespace, result='miss').inc()
+        invalidations = self._invalidations.get(namespace, 0)
+        try:
+            response = compute()
+            if (response.status_code == 200 and not response.is_streamed
+                    and self._invalidations.get(namespace, 0) == invalidations):
+                self._store(namespace, key, response)
+            return response
+        finally:
+            with self._lock:
+                del self._inflight[(namespace, key)]
+            flight.set()
+
+    def invalidate(self, namespace):
+        CACHE_INVALIDATIONS.labels(namespace=namespace).inc()
+        with self._lock:
+            self._invalidations[namespace] = self._invalidations.get(namespace, 0) + 1
+        try:
+            self.backend.invalidate(namespace)
+        except Exception as e:
+            current_app.logger.error(f"Response cache invalidation failed: {str(e)}")
+
+    def _response(self, namespace, key, entry):
+        status, headers, body, entry_id = entry
+        response = current_app.response_class(body, status=status, headers=headers)
+        # (cache, namespace, key, entry id), for get_variant/set_variant
+        response.cache_entry = (self, namespace, key, entry_id)
+        return response
+
+
+def request_key():
+    """
+    The current request's entry key: the ETag set by an enclosing
+    @conditional, else path and query. None when the response must not be
+    cached: a stream or unpaginated list, or @conditional could not read
+    the collection version.
+    """
+    if 'stream' in request.args or not wants_pagination(request.args):
+        return None
+    if 'etag' in g:
+        return g.etag
+    return cache_key(request.path, request.args.items(multi=True))
+
+
+def cached(namespace):
+    """Serve a GET view from the app's response cache (see request_key for what bypasses it)"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            cache = current_app.extensions.get('response_cache')
+            key = request_key() if cache is not None else None
+            if key is None:
+                return view(*args, **kwargs)
+            return cache.get_or_compute(namespace, key, lambda: make_response(view(*args, **kwargs)))
+        return wrapper
+    return decorator
+
+
+def invalidate(namespace):
+    """Drop a namespace after a write (no-op when caching is off)"""
+    cache = current_app.extensions.get('response_cache')
+    if cache is not None:
+        cache.invalidate(namespace)
+
+
+def init_app(app):
+    """Build the app's ResponseCache from its config"""
+    app.config.setdefault('RESPONSE_CACHE_BACKEND', 'memory')
+    app.config.setdefault('RESPONSE_CACHE_URL', None)
+    app.config.setdefault('RESPONSE_CACHE_TTL', 30)
+    app.config.setdefault('RESPONSE_CACHE_MAX_ENTRIES', 1000)
+    app.config.setdefault('RESPONSE_CACHE_MAX_BYTES', 32 * 1024 * 1024)
+    app.config.setdefault('RESPONSE_CACHE_MAX_ENTRY_BYTES', 1024 * 1024)
+    app.config.setdefault('RESPONSE_CACHE_WAIT', 5.0)
+
+    backend_name = app.config['RESPONSE_CACHE_BACKEND']
+    if backend_name == 'none':
+        app.extensions.pop('response_cache', None)
+        return
+    if backend_name == 'memory':
+        backend = MemoryBackend(app.config['RESPONSE_CACHE_MAX_ENTRIES'], app.config['RESPONSE_CACHE_MAX_BYTES'])
+    elif backend_name == 'redis':
+        backend = RedisBackend(app.config['RESPONSE_CACHE_URL'])
+    else:
+        raise ValueError("RESPONSE_CACHE_BACKEND must be one of: memory, redis, none")
+    app.extensions['response_cache'] = ResponseCache(
+        backend, ttl=app.config['RESPONSE_CACHE_TTL'], wait=app.config['RESPONSE_CACHE_WAIT'],
+        max_entry_bytes=app.config['RESPONSE_CACHE_MAX_ENTRY_BYTES']
+    )
@@ -1,8 +1,10 @@
 from flask import Blueprint, jsonify
+from app.response_cache import cached
 
 api_root_bp = Blueprint('api_root', __name__)
 
 @api_root_bp.route('/', methods=['GET'])
+@cached('api_root')
 def index():
     return jsonify({
         'message': 'Welcome to D\'Agri Talk API',
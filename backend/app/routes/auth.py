@@ -1,55 +1,73 @@
-from flask import Blueprint, request, jsonify, g
-from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
-from werkzeug.security import generate_password_hash, check_password_hash
+from flask import Blueprint, request, jsonify, g, current_app
+from flask_jwt_extended import create_access_token, jwt_required, get_jwt, get_jwt_identity
 from bson.objectid import ObjectId
 from app.database import get_db
-from datetime import datetime
+from app.indexes import EMAIL_COLLATION
+from app.models.user import PROFILE_CLAIMS_PROJECTION, PROFILE_PROJECTION, build_user, profile_claims, user_profile
+from app.user_cache import profile_changes
+from pymongo.errors import DuplicateKeyError
+from app.passwords import PasswordHasherBusy, hash_password, needs_rehash, verify_password
 
 auth_bp = Blueprint('auth', __name__)
 
 # Helper functions for user operations
 def get_user_by_email(email):
     db = get_db()
-    return db.users.find_one({'email': email})
+    return db.users.find_one({'email': email}, collation=EMAIL_COLLATION)
 
 def get_user_by_username(username):
     db = get_db()
     return db.users.find_one({'username': username})
 
-def get_user_by_id(user_id):
+def get_user_by_id(user_id, projection=None):
     db = get_db()
     if isinstance(user_id, str):
         user_id = ObjectId(user_id)
-    return db.users.find_one({'_id': user_id})
+    return db.users.find_one({'_id': user_id}, projection)
+
+def _duplicate_field(error):
+    """'email' or 'username', from the unique index a DuplicateKeyError hit"""
+    details = error.details or {}
+    fields = details.get('keyPattern') or details.get('keyValue') or {}
+    if 'email' in fields or 'email_unique' in str(details.get('errmsg', error)):
+        return 'email'
+    return 'username'
+
+def _rehash_password(user, password):
+    """
+    Store a hash made with the current PASSWORD_HASH_* settings. Matching on
+    the old hash keeps a concurrent password change from being overwritten.
+    """
+    try:
+        get_db().users.update_one(
+            {'_id': user['_id'], 'password_hash': user['password_hash']},
+            {'$set': {'password_hash': hash_password(password)}}
+        )
+    except PasswordHasherBusy:
+        # Not worth failing the login over; try again next time
+        pass
+    except Exception as e:
+        current_app.logger.error(f"Error upgrading password hash: {str(e)}")
 
 @auth_bp.route('/register', methods=['POST'])
 def register():
     data = request.get_json()
     
-    if not data or not data.get('email') or not data.get('password') or not data.get('username'):
-        return jsonify({'message': 'Missing required fields'}), 400
-    
-    # Check if user already exists
-    if get_user_by_email(data['email']):
-        return jsonify({'message': 'Email already exists'}), 409
+    try:
+        user = build_user(data)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    except PasswordHasherBusy:
+        return jsonify({'message': 'Server busy, please try again'}), 503
     
-    if get_user_by_username(data['username']):
+    # The unique indexes on email and username do the duplicate checks
+    try:
+        result = get_db().users.insert_one(user)
+    except DuplicateKeyError as e:
+        if _duplicate_field(e) == 'email':
+            return jsonify({'message': 'Email already exists'}), 409
         return jsonify({'message': 'Username already exists'}), 409
     
-    # Create new user
-    hashed_password = generate_password_hash(data['password'])
-    user = {
-        'username': data['username'],
-        'email': data['email'],
-        'password_hash': hashed_password,
-        'user_type': data.get('user_type', 'farmer'),
-        'location': data.get('location'),
-        'created_at': datetime.utcnow()
-    }
-    
-    db = get_db()
-    result = db.users.insert_one(user)
-    
     return jsonify({'message': 'User registered successfully', 'user_id': str(result.inserted_id)}), 201
 
 @auth_bp.route('/login', methods=['POST'])
@@ -68,36 +86,49 @@ def login():
     else:
         return jsonify({'message': 'Missing username or email'}), 400
     
-    # Verify password
-    if not user or not check_password_hash(user['password_hash'], data['password']):
-        return jsonify({'message': 'Invalid credentials'}), 401
+    # Verify password (on the hash pool, see app.passwords)
+    try:
+        if not user or not verify_password(user['password_hash'], data['password']):
+            return jsonify({'message': 'Invalid credentials'}), 401
+        if needs_rehash(user['password_hash']):
+            _rehash_password(user, data['password'])
+    except PasswordHasherBusy:
+        return jsonify({'message': 'Server busy, please try again'}), 503
     
-    # Create access token
-    access_token = create_access_token(identity=str(user['_id']))
+    # Create access token; the public profile rides along so /profile needs no read
+    access_token = create_access_token(identity=str(user['_id']), additional_claims={'profile': profile_claims(user)})
     
     return jsonify({
         'access_token': access_token,
         'user_id': str(user['_id']),
-        'username': user['username']
+        'username': user['username'],
+        'user': user_profile(user)
     }), 200
 
 @auth_bp.route('/profile', methods=['GET'])
 @jwt_required()
 def profile():
+    """
+    The public profile from the token's claims. Tokens issued before the
+    profile last changed and tokens without a profile claim read it from
+    the database instead. ?fresh=true reads the full profile, with email.
+    """
     current_user_id = get_jwt_identity()
-    user = get_user_by_id(current_user_id)
+    claims = get_jwt()
+    fresh = request.args.get('fresh', 'false').lower() == 'true'
+    
+    if not fresh and 'profile' in claims:
+        # Shared across workers only with PROFILE_CHANGES_URL/RESPONSE_CACHE_URL (see app.user_cache)
+        stale, changed_profile = profile_changes.lookup(current_user_id, claims.get('iat', 0))
+        if not stale:
+            return jsonify(claims['profile']), 200
+        if changed_profile is not None:
+            return jsonify(changed_profile), 200
     
+    user = get_user_by_id(current_user_id, PROFILE_PROJECTION if fresh else PROFILE_CLAIMS_PROJECTION)
     if not user:
         return jsonify({'message': 'User not found'}), 404
     
-    # Remove sensitive fields
-    user_data = {
-        'id': str(user['_id']),
-        'username': user['username'],
-        'email': user['email'],
-        'user_type': user.get('user_type', 'user'),
-        'location': user.get('location'),
-        'created_at': user['created_at']
-    }
-    
-    return jsonify(user_data), 200
\ No newline at end of file
+    public_profile = profile_claims(user)
+    profile_changes.store(current_user_id, public_profile)
+    return jsonify(user_profile(user) if fresh else public_profile), 200
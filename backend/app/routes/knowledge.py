@@ -1,82 +1,186 @@
 from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from app.conditional import conditional
 from app.database import get_db
+from app.fields import KNOWLEDGE_FIELDS, FieldsError
+from app.indexes import BY_UPDATED_AT, NEWEST_FIRST
+from app.filters import FilterError, parse_knowledge_search, parse_updated_since
+from app.models.knowledge import build_knowledge_entry, knowledge_list_pipeline, knowledge_search_pipeline
+from app.pagination import (
+    PaginationError, apply_cursor, decode_offset_cursor, parse_limit, split_offset_page, split_page, wants_pagination
+)
+from app.response_cache import cached, invalidate
+from app.stats import record_inserts
+from app.streaming import StreamFormatError, export_documents, export_format, stream_documents, stream_format
+from app.user_cache import UNKNOWN_USERNAME, attach_usernames, iter_with_usernames, resolve_username
 from bson.objectid import ObjectId
-from datetime import datetime
 
 knowledge_bp = Blueprint('knowledge', __name__)
 
+# Needed on every page to build the next cursor, even when not requested
+SORT_KEYS = [field for field, _ in NEWEST_FIRST]
+
+def _pipeline(query, fields, limit=None):
+    return knowledge_list_pipeline(
+        query, NEWEST_FIRST, limit,
+        projection=KNOWLEDGE_FIELDS.projection(fields, required=SORT_KEYS)
+    )
+
+def _with_usernames(db, entries, fields):
+    """Fill author_username through the username cache, if it was asked for"""
+    if KNOWLEDGE_FIELDS.wants_username(fields):
+        attach_usernames(db, entries, 'author_id', 'author_username')
+    return entries
+
 @knowledge_bp.route('/', methods=['GET'])
+@conditional('knowledge_entries')
+@cached('knowledge')
 def get_knowledge():
     try:
         db = get_db()
-        entries = list(db.knowledge_entries.find())
+        fields = KNOWLEDGE_FIELDS.parse(request.args.get('fields'))
+        
+        def serialize(entry):
+            return KNOWLEDGE_FIELDS.trim(entry, fields)
         
-        # Convert ObjectId to string for JSON serialization
-        for entry in entries:
-            entry['_id'] = str(entry['_id'])
-            if 'author_id' in entry and entry['author_id']:
-                entry['author_id'] = str(entry['author_id'])
-            
-            # Format dates for JSON serialization
-            if 'created_at' in entry:
-                entry['created_at'] = entry['created_at'].isoformat()
-            if 'updated_at' in entry:
-                entry['updated_at'] = entry['updated_at'].isoformat()
-                
-            # Add author username if possible
-            if 'author_id' in entry and entry['author_id']:
-                author = db.users.find_one({'_id': ObjectId(entry['author_id'])})
-                entry['author_username'] = author['username'] if author else 'Unknown'
+        fmt = stream_format(request.args)
+        if fmt:
+            # Every match, read from the cursor and written out one batch at a time
+            batch_size = current_app.config['STREAM_BATCH_SIZE']
+            query = apply_cursor({}, NEWEST_FIRST, request.args.get('cursor'))
+            entries = db.knowledge_entries.aggregate(_pipeline(query, fields), batchSize=batch_size)
+            if KNOWLEDGE_FIELDS.wants_username(fields):
+                entries = iter_with_usernames(db, entries, 'author_id', 'author_username', batch_size)
+            return stream_documents(entries, serialize, fmt, batch_size)
         
-        return jsonify(entries), 200
+        if not wants_pagination(request.args):
+            # Legacy response: the whole collection as a bare list
+            entries = _with_usernames(db, list(db.knowledge_entries.aggregate(_pipeline({}, fields))), fields)
+            return jsonify([serialize(entry) for entry in entries]), 200
+        
+        limit = parse_limit(request.args.get('limit'))
+        query = apply_cursor({}, NEWEST_FIRST, request.args.get('cursor'))
+        entries = list(db.knowledge_entries.aggregate(_pipeline(query, fields, limit + 1)))
+        entries, next_cursor = split_page(entries, limit, NEWEST_FIRST)
+        _with_usernames(db, entries, fields)
+        
+        return jsonify({
+            'items': [serialize(entry) for entry in entries],
+            'next_cursor': next_cursor
+        }), 200
+    except (PaginationError, StreamFormatError, FieldsError) as e:
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
         current_app.logger.error(f"Error fetching knowledge entries: {str(e)}")
         return jsonify({'message': 'Error fetching knowledge entries', 'error': str(e)}), 500
 
+@knowledge_bp.route('/search', methods=['GET'])
+def search_knowledge():
+    try:
+        query = parse_knowledge_search(request.args)
+        fields = KNOWLEDGE_FIELDS.parse(request.args.get('fields'))
+        limit = parse_limit(request.args.get('limit'))
+        offset = decode_offset_cursor(request.args.get('cursor'))
+        
+        db = get_db()
+        entries = list(db.knowledge_entries.aggregate(knowledge_search_pipeline(
+            query, offset, limit + 1,
+            projection=KNOWLEDGE_FIELDS.projection(fields)
+        )))
+        entries, next_cursor = split_offset_page(entries, limit, offset)
+        _with_usernames(db, entries, fields)
+        
+        keep = fields | {'score'} if fields else None
+        return jsonify({
+            'items': [KNOWLEDGE_FIELDS.trim(entry, keep) for entry in entries],
+            'next_cursor': next_cursor
+        }), 200
+    except (PaginationError, FieldsError, FilterError) as e:
+        return jsonify({'message': str(e)}), 400
+    except Exception as e:
+        current_app.logger.error(f"Error searching knowledge entries: {str(e)}")
+        return jsonify({'message': 'Error searching knowledge entries', 'error': str(e)}), 500
+
+@knowledge_bp.route('/export', methods=['GET'])
+@jwt_required()
+def export_knowledge():
+    """
+    Every knowledge entry as an NDJSON or CSV attachment, oldest update
+    first. ?updated_since= limits it to recently changed entries.
+    """
+    try:
+        fmt = export_format(request.args)
+        fields = KNOWLEDGE_FIELDS.parse(request.args.get('fields'))
+        query = parse_updated_since(request.args)
+        gzip = request.args.get('gzip', 'false').lower() == 'true'
+        
+        def serialize(entry):
+            return KNOWLEDGE_FIELDS.trim(entry, fields)
+        
+        db = get_db()
+        batch_size = current_app.config['EXPORT_BATCH_SIZE']
+        entries = db.knowledge_entries.find(
+            query, KNOWLEDGE_FIELDS.projection(fields), sort=BY_UPDATED_AT, batch_size=batch_size
+        )
+        if KNOWLEDGE_FIELDS.wants_username(fields):
+            entries = iter_with_usernames(db, entries, 'author_id', 'author_username', batch_size)
+        return export_documents(
+            entries, serialize, fmt, 'knowledge_entries',
+            columns=KNOWLEDGE_FIELDS.column_names(fields), gzip=gzip, batch_size=batch_size
+        )
+    except (StreamFormatError, FieldsError, FilterError) as e:
+        return jsonify({'message': str(e)}), 400
+    except Exception as e:
+        current_app.logger.error(f"Error exporting knowledge entries: {str(e)}")
+        return jsonify({'message': 'Error exporting knowledge entries', 'error': str(e)}), 500
+
+@knowledge_bp.route('/<entry_id>', methods=['GET'])
+@conditional('knowledge_entries')
+@cached('knowledge')
+def get_knowledge_entry(entry_id):
+    if not ObjectId.is_valid(entry_id):
+        return jsonify({'message': 'Invalid knowledge entry id'}), 400
+    
+    try:
+        fields = KNOWLEDGE_FIELDS.parse(request.args.get('fields'))
+        db = get_db()
+        entries = list(db.knowledge_entries.aggregate(_pipeline({'_id': ObjectId(entry_id)}, fields, 1)))
+        _with_usernames(db, entries, fields)
+        
+        if not entries:
+            return jsonify({'message': 'Knowledge entry not found'}), 404
+        
+        return jsonify(KNOWLEDGE_FIELDS.trim(entries[0], fields)), 200
+    except FieldsError as e:
+        return jsonify({'message': str(e)}), 400
+    except Exception as e:
+        current_app.logger.error(f"Error fetching knowledge entry: {str(e)}")
+        return jsonify({'message': 'Error fetching knowledge entry', 'error': str(e)}), 500
+
 @knowledge_bp.route('/', methods=['POST'])
 @jwt_required()
 def create_knowledge():
     data = request.get_json()
     user_id = get_jwt_identity()
     
-    if not data or not data.get('title') or not data.get('content'):
-        return jsonify({'message': 'Missing required fields'}), 400
+    try:
+        entry = build_knowledge_entry(data, user_id)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
     
     try:
-        now = datetime.utcnow()
-        new_entry = {
-            'title': data['title'],
-            'content': data['content'],
-            'author_id': ObjectId(user_id) if user_id else None,
-            'language': data.get('language'),
-            'crop_type': data.get('crop_type'),
-            'season': data.get('season'),
-            'region': data.get('region'),
-            'created_at': now,
-            'updated_at': now
-        }
-        
         db = get_db()
-        result = db.knowledge_entries.insert_one(new_entry)
-        
-        # Get the newly created entry
-        entry = db.knowledge_entries.find_one({'_id': result.inserted_id})
-        
-        # Prepare response
-        entry['_id'] = str(entry['_id'])
-        if 'author_id' in entry and entry['author_id']:
-            entry['author_id'] = str(entry['author_id'])
-        if 'created_at' in entry:
-            entry['created_at'] = entry['created_at'].isoformat()
-        if 'updated_at' in entry:
-            entry['updated_at'] = entry['updated_at'].isoformat()
+        # insert_one sets entry['_id']; the response is built from the
+        # document we already have instead of reading it back
+        db.knowledge_entries.insert_one(entry)
+        record_inserts(db, 'knowledge_entries', [entry])
+        invalidate('knowledge')
         
         # Add author username
-        author = db.users.find_one({'_id': ObjectId(user_id)}) if user_id else None
-        entry['author_username'] = author['username'] if author else 'Unknown'
+        author_username = resolve_username(db, entry['author_id'])
+        entry['author_username'] = author_username or UNKNOWN_USERNAME
         
-        return jsonify(entry), 201
+        return jsonify(KNOWLEDGE_FIELDS.trim(entry, None)), 201
     except Exception as e:
         current_app.logger.error(f"Error creating knowledge entry: {str(e)}")
-        return jsonify({'message': 'Failed to create knowledge entry', 'error': str(e)}), 500
\ No newline at end of file
+        return jsonify({'message': 'Failed to create knowledge entry', 'error': str(e)}), 500
@@ -1,88 +1,216 @@
 from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from app.database import get_db
+from app.conditional import conditional
+from app.database import get_db, utcnow
+from app.fields import MARKET_FIELDS, FieldsError
+from app.filters import FilterError, parse_market_filters, parse_updated_since
+from app.indexes import BY_UPDATED_AT, NEWEST_FIRST
+from app.models.market import build_market_listing, market_list_pipeline
+from app.stats import record_inserts
+from app.response_cache import cached, invalidate
+from app.pagination import PaginationError, apply_cursor, parse_limit, split_page, wants_pagination
+from app.streaming import StreamFormatError, export_documents, export_format, stream_documents, stream_format
+from app.user_cache import UNKNOWN_USERNAME, attach_usernames, iter_with_usernames, resolve_username
 from bson.objectid import ObjectId
-from datetime import datetime
+from pymongo.errors import BulkWriteError
 
 market_bp = Blueprint('market', __name__)
 
+def _pipeline(query, sort, fields, limit=None):
+    # The sort keys are always fetched; the next cursor is built from them.
+    return market_list_pipeline(
+        query, sort, limit,
+        projection=MARKET_FIELDS.projection(fields, required=[field for field, _ in sort])
+    )
+
+def _with_usernames(db, listings, fields):
+    """Fill farmer_username through the username cache, if it was asked for"""
+    if MARKET_FIELDS.wants_username(fields):
+        attach_usernames(db, listings, 'farmer_id', 'farmer_username')
+    return listings
+
 @market_bp.route('/', methods=['GET'])
+@conditional('market_listings')
+@cached('market')
 def get_market_listings():
     try:
-        available_only = request.args.get('available_only', 'true').lower() == 'true'
+        query, sort = parse_market_filters(request.args)
+        fields = MARKET_FIELDS.parse(request.args.get('fields'))
+        
+        def serialize(listing):
+            return MARKET_FIELDS.trim(listing, fields)
         
         db = get_db()
-        query = {'is_available': True} if available_only else {}
-        listings = list(db.market_listings.find(query))
         
-        # Convert ObjectId to string for JSON serialization
-        for listing in listings:
-            listing['_id'] = str(listing['_id'])
-            if 'farmer_id' in listing and listing['farmer_id']:
-                listing['farmer_id'] = str(listing['farmer_id'])
-            
-            # Format dates for JSON serialization
-            if 'created_at' in listing:
-                listing['created_at'] = listing['created_at'].isoformat()
-            if 'updated_at' in listing:
-                listing['updated_at'] = listing['updated_at'].isoformat()
-                
-            # Add farmer username if possible
-            if 'farmer_id' in listing and listing['farmer_id']:
-                farmer = db.users.find_one({'_id': ObjectId(listing['farmer_id'])})
-                listing['farmer_username'] = farmer['username'] if farmer else 'Unknown'
+        fmt = stream_format(request.args)
+        if fmt:
+            # Every match, read from the cursor and written out one batch at a time
+            batch_size = current_app.config['STREAM_BATCH_SIZE']
+            query = apply_cursor(query, sort, request.args.get('cursor'))
+            listings = db.market_listings.aggregate(_pipeline(query, sort, fields), batchSize=batch_size)
+            if MARKET_FIELDS.wants_username(fields):
+                listings = iter_with_usernames(db, listings, 'farmer_id', 'farmer_username', batch_size)
+            return stream_documents(listings, serialize, fmt, batch_size)
+        
+        if not wants_pagination(request.args):
+            # Legacy response: every matching listing as a bare list
+            listings = _with_usernames(db, list(db.market_listings.aggregate(_pipeline(query, sort, fields))), fields)
+            return jsonify([serialize(listing) for listing in listings]), 200
         
-        return jsonify(listings), 200
+        limit = parse_limit(request.args.get('limit'))
+        query = apply_cursor(query, sort, request.args.get('cursor'))
+        listings = list(db.market_listings.aggregate(_pipeline(query, sort, fields, limit + 1)))
+        listings, next_cursor = split_page(listings, limit, sort)
+        _with_usernames(db, listings, fields)
+        
+        return jsonify({
+            'items': [serialize(listing) for listing in listings],
+            'next_cursor': next_cursor
+        }), 200
+    except (PaginationError, StreamFormatError, FieldsError, FilterError) as e:
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
         current_app.logger.error(f"Error fetching market listings: {str(e)}")
         return jsonify({'message': 'Error fetching market listings', 'error': str(e)}), 500
 
+@market_bp.route('/export', methods=['GET'])
+@jwt_required()
+def export_market_listings():
+    """
+    Every listing (available or not) as an NDJSON or CSV attachment, oldest
+    update first. ?updated_since= limits it to recently changed listings.
+    """
+    try:
+        fmt = export_format(request.args)
+        fields = MARKET_FIELDS.parse(request.args.get('fields'))
+        query = parse_updated_since(request.args)
+        gzip = request.args.get('gzip', 'false').lower() == 'true'
+        
+        def serialize(listing):
+            return MARKET_FIELDS.trim(listing, fields)
+        
+        db = get_db()
+        batch_size = current_app.config['EXPORT_BATCH_SIZE']
+        listings = db.market_listings.find(
+            query, MARKET_FIELDS.projection(fields), sort=BY_UPDATED_AT, batch_size=batch_size
+        )
+        if MARKET_FIELDS.wants_username(fields):
+            listings = iter_with_usernames(db, listings, 'farmer_id', 'farmer_username', batch_size)
+        return export_documents(
+            listings, serialize, fmt, 'market_listings',
+            columns=MARKET_FIELDS.column_names(fields), gzip=gzip, batch_size=batch_size
+        )
+    except (StreamFormatError, FieldsError, FilterError) as e:
+        return jsonify({'message': str(e)}), 400
+    except Exception as e:
+        current_app.logger.error(f"Error exporting market listings: {str(e)}")
+        return jsonify({'message': 'Error exporting market listings', 'error': str(e)}), 500
+
+@market_bp.route('/<listing_id>', methods=['GET'])
+@conditional('market_listings')
+@cached('market')
+def get_market_listing(listing_id):
+    if not ObjectId.is_valid(listing_id):
+        return jsonify({'message': 'Invalid market listing id'}), 400
+    
+    try:
+        fields = MARKET_FIELDS.parse(request.args.get('fields'))
+        db = get_db()
+        listings = list(db.market_listings.aggregate(_pipeline({'_id': ObjectId(listing_id)}, NEWEST_FIRST, fields, 1)))
+        _with_usernames(db, listings, fields)
+        
+        if not listings:
+            return jsonify({'message': 'Market listing not found'}), 404
+        
+        return jsonify(MARKET_FIELDS.trim(listings[0], fields)), 200
+    except FieldsError as e:
+        return jsonify({'message': str(e)}), 400
+    except Exception as e:
+        current_app.logger.error(f"Error fetching market listing: {str(e)}")
+        return jsonify({'message': 'Error fetching market listing', 'error': str(e)}), 500
+
 @market_bp.route('/', methods=['POST'])
 @jwt_required()
 def create_market_listing():
     data = request.get_json()
     user_id = get_jwt_identity()
     
-    if not data or not all(k in data for k in ['crop_name', 'quantity', 'unit', 'price_per_unit', 'location']):
-        return jsonify({'message': 'Missing required fields'}), 400
+    try:
+        listing = build_market_listing(data, user_id)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
     
     try:
-        now = datetime.utcnow()
-        new_listing = {
-            'crop_name': data['crop_name'],
-            'quantity': float(data['quantity']),
-            'unit': data['unit'],
-            'price_per_unit': float(data['price_per_unit']),
-            'location': data['location'],
-            'description': data.get('description', ''),
-            'farmer_id': ObjectId(user_id) if user_id else None,
-            'is_available': True,
-            'created_at': now,
-            'updated_at': now
-        }
-        
         db = get_db()
-        result = db.market_listings.insert_one(new_listing)
-        
-        # Get the newly created listing
-        listing = db.market_listings.find_one({'_id': result.inserted_id})
-        
-        # Prepare response
-        listing['_id'] = str(listing['_id'])
-        if 'farmer_id' in listing and listing['farmer_id']:
-            listing['farmer_id'] = str(listing['farmer_id'])
-        if 'created_at' in listing:
-            listing['created_at'] = listing['created_at'].isoformat()
-        if 'updated_at' in listing:
-            listing['updated_at'] = listing['updated_at'].isoformat()
+        # insert_one sets listing['_id']; the response is built from the
+        # document we already have instead of reading it back
+        db.market_listings.insert_one(listing)
+        record_inserts(db, 'market_listings', [listing])
+        invalidate('market')
         
         # Add farmer username
-        farmer = db.users.find_one({'_id': ObjectId(user_id)}) if user_id else None
-        listing['farmer_username'] = farmer['username'] if farmer else 'Unknown'
+        farmer_username = resolve_username(db, listing['farmer_id'])
+        listing['farmer_username'] = farmer_username or UNKNOWN_USERNAME
         
         return jsonify(listing), 201
-    except ValueError:
-        return jsonify({'message': 'Invalid data type for quantity or price_per_unit. Must be a number.'}), 400
     except Exception as e:
         current_app.logger.error(f"Error creating market listing: {str(e)}")
-        return jsonify({'message': 'Failed to create market listing', 'error': str(e)}), 500
\ No newline at end of file
+        return jsonify({'message': 'Failed to create market listing', 'error': str(e)}), 500
+
+@market_bp.route('/bulk', methods=['POST'])
+@jwt_required()
+def create_market_listings_bulk():
+    """
+    Create many listings at once. Valid items are written with one unordered
+    insert_many; the response has one result per submitted item, in order.
+    """
+    data = request.get_json()
+    items = data.get('listings') if isinstance(data, dict) else data
+    if not isinstance(items, list) or not items:
+        return jsonify({'message': 'Expected a non-empty list of listings'}), 400
+    
+    max_items = current_app.config['MARKET_BULK_MAX_LISTINGS']
+    if len(items) > max_items:
+        return jsonify({'message': f'At most {max_items} listings per request'}), 400
+    
+    user_id = get_jwt_identity()
+    now = utcnow()
+    results = [None] * len(items)
+    to_insert = []  # (index in items, document)
+    for index, item in enumerate(items):
+        try:
+            to_insert.append((index, build_market_listing(item, user_id, now)))
+        except ValueError as e:
+            results[index] = {'index': index, 'status': 'error', 'message': str(e)}
+    
+    try:
+        failed = {}
+        if to_insert:
+            db = get_db()
+            try:
+                db.market_listings.insert_many([listing for _, listing in to_insert], ordered=False)
+            except BulkWriteError as e:
+                # Unordered: everything not listed in writeErrors was inserted
+                failed = {error['index']: error.get('errmsg', 'Write failed') for error in e.details.get('writeErrors', [])}
+                # The documents were written but may not be durable; they are still reported as created
+                for error in e.details.get('writeConcernErrors', []):
+                    current_app.logger.error(f"Write concern error creating market listings in bulk: {error.get('errmsg')}")
+            record_inserts(db, 'market_listings',
+                           [listing for position, (_, listing) in enumerate(to_insert) if position not in failed])
+            invalidate('market')
+            
+            farmer_username = resolve_username(db, to_insert[0][1]['farmer_id']) or UNKNOWN_USERNAME
+        
+        for position, (index, listing) in enumerate(to_insert):
+            if position in failed:
+                results[index] = {'index': index, 'status': 'error', 'message': failed[position]}
+            else:
+                listing['farmer_username'] = farmer_username
+                results[index] = {'index': index, 'status': 'created', 'listing': listing}
+        
+        created = sum(1 for result in results if result['status'] == 'created')
+        status_code = 201 if created == len(items) else 207
+        return jsonify({'created': created, 'failed': len(items) - created, 'results': results}), status_code
+    except Exception as e:
+        current_app.logger.error(f"Error creating market listings in bulk: {str(e)}")
+        return jsonify({'message': 'Failed to create market listings', 'error': str(e)}), 500
@@ -0,0 +1,245 @@
+"""
+Collection gauges for /metrics without scanning the collections.
+
+- Totals come from estimated_document_count(), which reads collection
+  metadata instead of counting documents.
+- Per-crop and per-region breakdowns are tallies kept in the `stats`
+  collection, one small document per (collection, dimension, value): the
+  values are user input, so no single document grows with their number
+  and a value is data, never a field name. The write paths (POST routes,
+  bulk insert, import CLI) call record_inserts() with the documents they
+  inserted, which $incs one counter per value in a single bulk_write.
+- The same bulk_write bumps the collection's version document (a write
+  counter plus the time of the last write), which app.conditional turns
+  into ETag and Last-Modified headers.
+
+A scrape reads the totals, the STATS_MAX_LABELS largest values of each
+breakdown (on the tally_count index) and the breakdown's sum, which gives
+the "other" label for the rest; the result is kept for STATS_SCRAPE_TTL
+seconds. Everything lives in MongoDB, so every gunicorn worker reports the
+same numbers.
+
+The tallies only see writes made through this code. `flask stats rebuild`
+recounts them from the collections (a full scan, meant for the first
+deployment, after manual edits, or to move tallies from the older
+one-document-per-breakdown layout).
+"""
+
+import logging
+import threading
+import time
+
+import click
+from flask import current_app, has_app_context
+from flask.cli import with_appcontext
+from prometheus_client.core import GaugeMetricFamily
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+
+from app import metrics
+from app.database import get_db, utcnow
+
+STATS_COLLECTION = 'stats'
+
+# collection -> {dimension: document field}
+BREAKDOWNS = {
+    'market_listings': {'crop': 'crop_name', 'region': 'location'},
+    'knowledge_entries': {'crop': 'crop_type', 'region': 'region'},
+}
+
+TOTAL_HELP = {
+    'market_listings': 'Total number of market listings',
+    'knowledge_entries': 'Total number of knowledge entries',
+}
+
+UNKNOWN_VALUE = 'unknown'
+OTHER_VALUE = 'other'
+# Longer values are cut, which keeps tally _ids well under the index key limit
+MAX_VALUE_LENGTH = 100
+TOP_VALUES = [('count', DESCENDING), ('value', ASCENDING)]
+
+logger = logging.getLogger('dagri_talk.stats')
+
+
+def tally_id(collection, dimension):
+    return f'{collection}.{dimension}'
+
+
+def tally_value(value):
+    """A breakdown value as tallied: stripped and cut to MAX_VALUE_LENGTH"""
+    value = '' if value is None else str(value).strip()
+    return value[:MAX_VALUE_LENGTH] or UNKNOWN_VALUE
+
+
+def tally_update(tally, value, count):
+    """$inc the counter document of one value"""
+    return UpdateOne(
+        {'_id': f'{tally}:{value}'},
+        {'$inc': {'count': count}, '$setOnInsert': {'tally': tally, 'value': value}},
+        upsert=True
+    )
+
+
+def version_update(collection, now=None):
+    """Bump a collection's version document"""
+    return UpdateOne(
+        {'_id': collection},
+        {'$inc': {'version': 1}, '$max': {'updated_at': now or utcnow()}},
+        upsert=True
+    )
+
+
+def collection_version(db, collection):
+    """(version, updated_at) of a collection; (0, None) before its first write"""
+    doc = db[STATS_COLLECTION].find_one({'_id': collection}, {'version': 1, 'updated_at': 1})
+    if not doc:
+        return 0, None
+    return doc.get('version', 0), doc.get('updated_at')
+
+
+def record_inserts(db, collection, docs):
+    """
+    Count newly inserted documents into the breakdown tallies and bump the
+    collection's version. A failure is logged, not raised: the documents are
+    already written.
+    """
+    if not docs:
+        return
+    updates = [version_update(collection)]
+    for dimension, field in BREAKDOWNS[collection].items():
+        counts = {}
+        for doc in docs:
+            value = tally_value(doc.get(field))
+            counts[value] = counts.get(value, 0) + 1
+        tally = tally_id(collection, dimension)
+        updates.extend(tally_update(tally, value, count) for value, count in counts.items())
+    try:
+        db[STATS_COLLECTION].bulk_write(updates, ordered=False)
+    except Exception as e:
+        logger.error(f"Error updating {collection} stats: {str(e)}")
+
+
+def rebuild_tallies(db, collection):
+    """Recount a collection's breakdowns with $group (scans the collection)"""
+    for dimension, field in BREAKDOWNS[collection].items():
+        counts = {}
+        for group in db[collection].aggregate([{'$group': {'_id': f'${field}', 'count': {'$sum': 1}}}]):
+            value = tally_value(group['_id'])
+            counts[value] = counts.get(value, 0) + group['count']
+        tally = tally_id(collection, dimension)
+        # The tally's documents, and the older single document with a `counts` map
+        db[STATS_COLLECTION].delete_many({'$or': [{'tally': tally}, {'_id': tally}]})
+        if counts:
+            db[STATS_COLLECTION].bulk_write(
+                [tally_update(tally, value, count) for value, count in counts.items()], ordered=False
+            )
+    db[STATS_COLLECTION].bulk_write([version_update(collection)])
+
+
+def top_counts(top, total):
+    """The largest (label, count) pairs of a breakdown plus the rest of total as 'other'"""
+    rest = total - sum(count for _, count in top)
+    return top + [(OTHER_VALUE, rest)] if rest > 0 else top
+
+
+def read_tally(db, tally, limit):
+    """(the `limit` largest (value, count) pairs, the sum of all counts) of a breakdown"""
+    stats = db[STATS_COLLECTION]
+    top = [(doc['value'], doc['count'])
+           for doc in stats.find({'tally': tally}, {'value': 1, 'count': 1}).sort(TOP_VALUES).limit(limit)]
+    totals = list(stats.aggregate([
+        {'$match': {'tally': tally}},
+        {'$group': {'_id': None, 'count': {'$sum': '$count'}}},
+    ]))
+    return top, totals[0]['count'] if totals else 0
+
+
+class StatsCollector:
+    """Scrape-time collector for the collection totals and breakdowns"""
+
+    def __init__(self, get_db=get_db, ttl=30, max_labels=50, clock=time.monotonic):
+        self.get_db = get_db
+        self.ttl = ttl
+        self.max_labels = max_labels
+        self.clock = clock
+        self._cached = None
+        self._cached_at = None
+        self._lock = threading.Lock()
+
+    def configure(self, ttl, max_labels):
+        with self._lock:
+            self.ttl = ttl
+            self.max_labels = max_labels
+            self._cached = None
+
+    def describe(self):
+        # Keeps registration from calling collect(), i.e. from querying MongoDB
+        return self._families({}, {})
+
+    def _families(self, totals, tallies):
+        families = []
+        for collection, dimensions in BREAKDOWNS.items():
+            total = GaugeMetricFamily(f'dagri_talk_{collection}_total', TOTAL_HELP[collection])
+            if collection in totals:
+                total.add_metric([], totals[collection])
+            families.append(total)
+            for dimension in dimensions:
+                family = GaugeMetricFamily(
+                    f'dagri_talk_{collection}_by_{dimension}',
+                    f'{TOTAL_HELP[collection]} by {dimension}',
+                    labels=[dimension]
+                )
+                for value, count in top_counts(*tallies.get(tally_id(collection, dimension), ([], 0))):
+                    family.add_metric([value], count)
+                families.append(family)
+        return families
+
+    def read(self, db):
+        """(totals, tallies) from collection metadata and the tally documents"""
+        totals = {collection: db[collection].estimated_document_count() for collection in BREAKDOWNS}
+        tallies = {
+            tally_id(collection, dimension): read_tally(db, tally_id(collection, dimension), self.max_labels)
+            for collection, dimensions in BREAKDOWNS.items() for dimension in dimensions
+        }
+        return totals, tallies
+
+    def collect(self):
+        with self._lock:
+            now = self.clock()
+            if self._cached is None or now - self._cached_at >= self.ttl:
+                if not has_app_context():
+                    return []
+                try:
+                    self._cached = self._families(*self.read(self.get_db()))
+                    self._cached_at = now
+                except Exception as e:
+                    current_app.logger.error(f"Error reading collection stats: {str(e)}")
+                    if self._cached is None:
+                        return []
+            return self._cached
+
+
+stats_collector = StatsCollector()
+metrics.register_scrape_collector(stats_collector)
+
+
+@click.group('stats')
+def stats_cli():
+    """Manage the collection tallies behind /metrics."""
+
+
+@stats_cli.command('rebuild')
+@with_appcontext
+def rebuild_command():
+    """Recount the per-crop and per-region tallies from the collections."""
+    db = get_db()
+    for collection in BREAKDOWNS:
+        rebuild_tallies(db, collection)
+        click.echo(f"{collection}: rebuilt")
+
+
+def init_app(app):
+    """Configure the scrape-time collector and register the stats CLI"""
+    app.config.setdefault('STATS_SCRAPE_TTL', 30)
+    app.config.setdefault('STATS_MAX_LABELS', 50)
+    stats_collector.configure(app.config['STATS_SCRAPE_TTL'], app.config['STATS_MAX_LABELS'])
+    app.cli.add_command(stats_cli)
@@ -0,0 +1,156 @@
+"""
+Streaming list responses and exports.
+
+?stream=json yields a JSON array and ?stream=ndjson yields one document per
+line, both straight off the pymongo cursor in batches, so a worker only
+ever holds one batch of documents regardless of the result size. The
+/export endpoints do the same for NDJSON or CSV attachments, optionally
+gzipped on the fly.
+"""
+
+import csv
+import io
+import zlib
+from datetime import datetime
+
+from flask import Response, current_app, stream_with_context
+
+STREAM_MIMETYPES = {
+    'json': 'application/json',
+    'ndjson': 'application/x-ndjson',
+}
+
+EXPORT_MIMETYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+class StreamFormatError(ValueError):
+    """Raised for an unknown ?stream= value"""
+
+
+def stream_format(args):
+    """Return the requested stream format, or None for a buffered response"""
+    value = args.get('stream')
+    if not value:
+        return None
+    value = value.lower()
+    if value not in STREAM_MIMETYPES:
+        raise StreamFormatError(f"stream must be one of: {', '.join(STREAM_MIMETYPES)}")
+    return value
+
+
+def export_format(args):
+    """Return ?format= for an export, defaulting to NDJSON"""
+    value = (args.get('format') or 'ndjson').lower()
+    if value not in EXPORT_MIMETYPES:
+        raise StreamFormatError(f"format must be one of: {', '.join(EXPORT_MIMETYPES)}")
+    return value
+
+
+def _close(docs):
+    close = getattr(docs, 'close', None)
+    if close:
+        close()
+
+
+def _chunks(docs, serialize, fmt, batch_size):
+    json = current_app.json
+    separator = '\n' if fmt == 'ndjson' else ','
+    buffer = []
+    first = True
+
+    if fmt == 'json':
+        yield '['
+    try:
+        for doc in docs:
+            buffer.append(json.dumps(serialize(doc), separators=(',', ':')))
+            if len(buffer) >= batch_size:
+                yield ('' if first else separator) + separator.join(buffer)
+                buffer = []
+                first = False
+        if buffer:
+            yield ('' if first else separator) + separator.join(buffer)
+            first = False
+    except Exception as e:
+        # Headers are already sent; a truncated body is the only signal left
+        current_app.logger.error(f"Error while streaming response: {str(e)}")
+        return
+    finally:
+        _close(docs)
+    if fmt == 'json':
+        yield ']'
+    elif not first:
+        yield '\n'
+
+
+def stream_documents(docs, serialize, fmt, batch_size=None):
+    """
+    Build a streaming Response from an iterable of documents (normally a
+    pymongo cursor created with the same batch size).
+    """
+    batch_size = batch_size or current_app.config['STREAM_BATCH_SIZE']
+    return Response(
+        stream_with_context(_chunks(docs, serialize, fmt, batch_size)),
+        mimetype=STREAM_MIMETYPES[fmt]
+    )
+
+
+def _csv_row(doc):
+    # JSON output gets ISO dates from the app's JSON provider; CSV needs them as text
+    return {key: value.isoformat() if isinstance(value, datetime) else value for key, value in doc.items()}
+
+
+def _csv_chunks(docs, serialize, columns, batch_size):
+    """A header row, then one chunk of rows per batch"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, columns, extrasaction='ignore')
+    writer.writeheader()
+    rows = 0
+    try:
+        for doc in docs:
+            writer.writerow(_csv_row(serialize(doc)))
+            rows += 1
+            if rows >= batch_size:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+                rows = 0
+    except Exception as e:
+        current_app.logger.error(f"Error while streaming export: {str(e)}")
+    finally:
+        _close(docs)
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def _gzip_chunks(chunks, level=6):
+    """Compress a stream of str chunks into a single gzip member"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_documents(docs, serialize, fmt, filename, columns=None, gzip=False, batch_size=None):
+    """
+    Build a streaming attachment Response for an export. columns is the CSV
+    header (required for fmt='csv'); gzip=True sends filename.gz.
+    """
+    batch_size = batch_size or current_app.config['EXPORT_BATCH_SIZE']
+    if fmt == 'csv':
+        chunks = _csv_chunks(docs, serialize, columns, batch_size)
+    else:
+        chunks = _chunks(docs, serialize, fmt, batch_size)
+    filename = f"{filename}.{fmt}"
+    mimetype = EXPORT_MIMETYPES[fmt]
+    if gzip:
+        chunks = _gzip_chunks(chunks)
+        filename += '.gz'
+        mimetype = 'application/gzip'
+    response = Response(stream_with_context(chunks), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
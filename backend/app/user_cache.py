@@ -0,0 +1,316 @@
+"""
+Process-wide LRU + TTL cache of user_id -> username.
+
+Every username shown next to a knowledge entry or market listing is
+resolved through resolve_username()/attach_usernames(); misses are fetched
+with a single batched $in query. Call invalidate_username() whenever a
+username changes so this worker stops serving the old one; other workers
+pick it up when their entry expires (USERNAME_CACHE_TTL seconds).
+
+GET /api/auth/profile answers from the profile claims in the access token.
+invalidate_user() records that a user's profile changed, so tokens issued
+before the change fall back to the database (once per process; the fresh
+profile is kept until those tokens expire). The changed-at markers must be
+seen by every worker, so they are kept in Redis when PROFILE_CHANGES_URL
+(or else RESPONSE_CACHE_URL) is set. Without one they live in process
+memory, which is only correct with a single worker: the others keep
+answering from the old claims until the tokens expire.
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+from bson.objectid import ObjectId
+from prometheus_client import Counter, Gauge
+
+logger = logging.getLogger('dagri_talk.user_cache')
+
+CACHE_HITS = Counter(
+    'dagri_talk_username_cache_hits_total',
+    'Username lookups served from the in-process cache'
+)
+
+CACHE_MISSES = Counter(
+    'dagri_talk_username_cache_misses_total',
+    'Username lookups that had to query MongoDB'
+)
+
+CACHE_EVICTIONS = Counter(
+    'dagri_talk_username_cache_evictions_total',
+    'Usernames evicted from the cache to stay under its size limit'
+)
+
+CACHE_SIZE = Gauge(
+    'dagri_talk_username_cache_size',
+    'Usernames currently cached',
+    multiprocess_mode='livesum'
+)
+
+UNKNOWN_USERNAME = 'Unknown'
+
+
+class UsernameCache:
+    """Bounded, thread-safe LRU of user_id -> username with a per-entry TTL"""
+
+    def __init__(self, maxsize=10000, ttl=300, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def configure(self, maxsize, ttl):
+        with self._lock:
+            self.maxsize = maxsize
+            self.ttl = ttl
+            self._evict()
+
+    def get_many(self, user_ids):
+        """Return ({user_id: username or None}, [missing user_ids])"""
+        found, missing = {}, []
+        now = self.clock()
+        with self._lock:
+            for user_id in user_ids:
+                entry = self._entries.get(user_id)
+                if entry is not None and entry[1] > now:
+                    self._entries.move_to_end(user_id)
+                    found[user_id] = entry[0]
+                else:
+                    if entry is not None:
+                        del self._entries[user_id]
+                    missing.append(user_id)
+        if found:
+            CACHE_HITS.inc(len(found))
+        if missing:
+            CACHE_MISSES.inc(len(missing))
+        return found, missing
+
+    def put_many(self, usernames):
+        """Cache {user_id: username}; None records a user that does not exist"""
+        expires = self.clock() + self.ttl
+        with self._lock:
+            for user_id, username in usernames.items():
+                self._entries[user_id] = (username, expires)
+                self._entries.move_to_end(user_id)
+            self._evict()
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+            CACHE_SIZE.set(len(self._entries))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            CACHE_SIZE.set(0)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _evict(self):
+        evicted = 0
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            evicted += 1
+        if evicted:
+            CACHE_EVICTIONS.inc(evicted)
+        CACHE_SIZE.set(len(self._entries))
+
+
+class ProfileChanges:
+    """
+    Bounded map of user_id -> (changed_at, profile) for users whose profile
+    changed after some of their tokens were issued. Entries only need to
+    live as long as an access token.
+
+    With a Redis client the changed-at marker is shared: mark_changed()
+    sets one key per user that expires with the tokens, and lookup() reads
+    it. The fresh profile is still kept per process, valid for the marker
+    it was loaded under.
+    """
+
+    def __init__(self, maxsize=10000, ttl=900, clock=time.time, client=None,
+                 prefix='dagri_talk:profile_changed:'):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self.client = client
+        self.prefix = prefix
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def configure(self, maxsize, ttl, client=None):
+        with self._lock:
+            self.maxsize = maxsize
+            self.ttl = ttl
+            self.client = client
+
+    def _put(self, user_id, changed_at, profile):
+        with self._lock:
+            self._entries[user_id] = (changed_at, profile)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def _shared_changed_at(self, user_id):
+        raw = self.client.get(self.prefix + user_id)
+        return float(raw) if raw is not None else None
+
+    def mark_changed(self, user_id):
+        changed_at = self.clock()
+        if self.client is not None:
+            try:
+                self.client.set(self.prefix + user_id, repr(changed_at), ex=max(1, int(self.ttl)))
+            except Exception as e:
+                # The write itself succeeded; other workers serve the old claims until the tokens expire
+                logger.error(f"Error writing profile change marker: {str(e)}")
+        self._put(user_id, changed_at, None)
+
+    def lookup(self, user_id, issued_at):
+        """
+        (stale, profile): stale when the profile changed at or after
+        issued_at (epoch seconds); profile is the fresh one if already loaded.
+        """
+        if self.client is not None:
+            try:
+                changed_at = self._shared_changed_at(user_id)
+            except Exception as e:
+                # Unknown: read the database rather than trust the claims
+                logger.error(f"Error reading profile change marker: {str(e)}")
+                return True, None
+            if changed_at is None or changed_at < issued_at:
+                return False, None
+            with self._lock:
+                entry = self._entries.get(user_id)
+            if entry is not None and entry[0] == changed_at:
+                return True, entry[1]
+            return True, None
+
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return False, None
+            changed_at, profile = entry
+            if changed_at + self.ttl < self.clock():
+                del self._entries[user_id]
+                return False, None
+            if changed_at < issued_at:
+                return False, None
+            return True, profile
+
+    def store(self, user_id, profile):
+        """Keep the fresh profile loaded for a stale token"""
+        if self.client is not None:
+            try:
+                changed_at = self._shared_changed_at(user_id)
+            except Exception as e:
+                logger.error(f"Error reading profile change marker: {str(e)}")
+                return
+            if changed_at is not None:
+                self._put(user_id, changed_at, profile)
+            return
+
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None:
+                self._entries[user_id] = (entry[0], profile)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+username_cache = UsernameCache()
+profile_changes = ProfileChanges()
+
+
+def fetch_usernames(db, user_ids):
+    """One $in query for the given ids; ids with no user map to None"""
+    usernames = dict.fromkeys(user_ids)
+    for user in db.users.find({'_id': {'$in': list(user_ids)}}, {'username': 1}):
+        usernames[user['_id']] = user.get('username')
+    return usernames
+
+
+def resolve_usernames(db, user_ids):
+    """{user_id: username or None} for the given ObjectIds"""
+    found, missing = username_cache.get_many(set(user_ids))
+    if missing:
+        fetched = fetch_usernames(db, missing)
+        username_cache.put_many(fetched)
+        found.update(fetched)
+    return found
+
+
+def resolve_username(db, user_id):
+    """Username for one user id, or None"""
+    if not user_id:
+        return None
+    return resolve_usernames(db, [user_id])[user_id]
+
+
+def attach_usernames(db, docs, id_field, username_field):
+    """
+    Fill username_field on each document from id_field. Documents without
+    an id get no username; ids with no user get 'Unknown'.
+    """
+    usernames = resolve_usernames(db, [doc[id_field] for doc in docs if doc.get(id_field)])
+    return fill_usernames(docs, usernames, id_field, username_field)
+
+
+def fill_usernames(docs, usernames, id_field, username_field):
+    """The second half of attach_usernames, for callers that resolve ids themselves (asgi.py)"""
+    for doc in docs:
+        if doc.get(id_field):
+            doc[username_field] = usernames.get(doc[id_field]) or UNKNOWN_USERNAME
+    return docs
+
+
+def iter_with_usernames(db, docs, id_field, username_field, batch_size):
+    """attach_usernames for a cursor, one batch at a time (for streaming)"""
+    batch = []
+    for doc in docs:
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            yield from attach_usernames(db, batch, id_field, username_field)
+            batch = []
+    if batch:
+        yield from attach_usernames(db, batch, id_field, username_field)
+
+
+def invalidate_username(user_id):
+    """Hook for code that changes a username"""
+    username_cache.invalidate(user_id)
+
+
+def invalidate_user(user_id):
+    """Hook for code that changes any profile field (username, location, ...)"""
+    username_cache.invalidate(ObjectId(user_id))
+    # Keyed like the token identity
+    profile_changes.mark_changed(str(user_id))
+
+
+def _token_lifetime(app):
+    expires = app.config.get('JWT_ACCESS_TOKEN_EXPIRES', timedelta(minutes=15))
+    if not expires:
+        # Tokens never expire; remember changes for a day
+        return 86400
+    return expires.total_seconds() if isinstance(expires, timedelta) else expires
+
+
+def init_app(app):
+    """Size the caches from the app config"""
+    app.config.setdefault('USERNAME_CACHE_SIZE', 10000)
+    app.config.setdefault('USERNAME_CACHE_TTL', 300)
+    app.config.setdefault('PROFILE_CHANGES_URL', None)
+    username_cache.configure(app.config['USERNAME_CACHE_SIZE'], app.config['USERNAME_CACHE_TTL'])
+
+    client = None
+    url = app.config['PROFILE_CHANGES_URL'] or app.config.get('RESPONSE_CACHE_URL')
+    if url:
+        import redis
+        client = redis.Redis.from_url(url)
+    profile_changes.configure(app.config['USERNAME_CACHE_SIZE'], _token_lifetime(app), client)
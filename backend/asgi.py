@@ -0,0 +1,413 @@
+"""
+ASGI entry point.
+
+The read endpoints below run as async handlers on motor, so a worker keeps
+serving other requests while it waits on MongoDB. Everything else (writes,
+exports, ?stream= responses, health checks) is handed to the Flask app
+unchanged. Query parsing, pipelines, serialization, compression, the
+access log, the response cache and the username cache are the same code the
+Flask routes use; cache entries are keyed by the same ETags, so a shared
+(redis) cache serves both. The in-process single-flight of
+app.response_cache is not applied here: concurrent misses each run their
+query.
+
+    pip install -r requirements-asgi.txt
+    uvicorn asgi:app --host 0.0.0.0 --port 8000 --workers 4
+"""
+
+import os
+import re
+import time
+from contextlib import asynccontextmanager
+
+from a2wsgi import WSGIMiddleware
+from bson.objectid import ObjectId
+from flask_jwt_extended import decode_token, get_unverified_jwt_headers
+from flask_jwt_extended.exceptions import (
+    InvalidHeaderError, JWTExtendedException, NoAuthorizationError, RevokedTokenError, UserClaimsVerificationError
+)
+from flask_jwt_extended.internal_utils import (
+    custom_verification_for_token, verify_token_not_blocklisted, verify_token_type
+)
+from jwt import ExpiredSignatureError, PyJWTError
+from motor.motor_asyncio import AsyncIOMotorClient
+from starlette import responses
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.routing import Mount, Route
+
+from app import compression, create_app, database, log_pipeline
+from app.conditional import conditional_headers, make_etag, not_modified
+from app.fields import KNOWLEDGE_FIELDS, MARKET_FIELDS, FieldsError
+from app.filters import FilterError, parse_knowledge_search, parse_market_filters
+from app.indexes import NEWEST_FIRST
+from app.models.knowledge import knowledge_list_pipeline, knowledge_search_pipeline
+from app.models.market import market_list_pipeline
+from app.models.user import PROFILE_CLAIMS_PROJECTION, PROFILE_PROJECTION, profile_claims, user_profile
+from app.pagination import (
+    PaginationError, apply_cursor, decode_offset_cursor, parse_limit, split_offset_page, split_page, wants_pagination
+)
+from app.stats import STATS_COLLECTION
+from app.streaming import StreamFormatError
+from app.user_cache import fill_usernames, profile_changes, username_cache
+
+flask_app = create_app(os.getenv('FLASK_ENV', 'development'))
+flask_wsgi = WSGIMiddleware(flask_app)
+
+_motor = {}
+
+# Bodies up to this size are compressed on the event loop; larger ones, and
+# anything touching the response cache (a Redis round trip), in a thread
+INLINE_COMPRESS_SIZE = 16 * 1024
+
+
+class JSONResponse(responses.JSONResponse):
+    """Encoded by the Flask app's JSON provider, like the WSGI responses"""
+
+    def render(self, content):
+        return flask_app.json.encode(content)
+
+
+def in_app_context(func, *args):
+    """Call func(*args) inside the Flask app context (cache backends log through current_app)"""
+    with flask_app.app_context():
+        return func(*args)
+
+
+def get_async_db():
+    return _motor['client'][_motor['db_name']]
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # One motor client per worker process, created on its event loop
+    client = AsyncIOMotorClient(database.get_mongo_uri(flask_app), **database.client_options(flask_app))
+    _motor['client'] = client
+    _motor['db_name'] = client.get_default_database(database.DEFAULT_DB_NAME).name
+    try:
+        yield
+    finally:
+        client.close()
+        _motor.clear()
+
+
+async def attach_usernames(db, docs, id_field, username_field):
+    """Async app.user_cache.attach_usernames: cache first, then one $in query"""
+    found, missing = username_cache.get_many({doc[id_field] for doc in docs if doc.get(id_field)})
+    if missing:
+        fetched = dict.fromkeys(missing)
+        async for user in db.users.find({'_id': {'$in': missing}}, {'username': 1}):
+            fetched[user['_id']] = user.get('username')
+        username_cache.put_many(fetched)
+        found.update(fetched)
+    return fill_usernames(docs, found, id_field, username_field)
+
+
+async def collection_version(db, collection):
+    """Async app.stats.collection_version"""
+    doc = await db[STATS_COLLECTION].find_one({'_id': collection}, {'version': 1, 'updated_at': 1})
+    if not doc:
+        return 0, None
+    return doc.get('version', 0), doc.get('updated_at')
+
+
+class ReadEndpoint:
+    """
+    An async handler as an ASGI app. ?stream= requests go to Flask, which
+    owns the streaming responses; bad query parameters become 400s as in
+    the Flask routes. With a collection, the endpoint answers conditional
+    GETs like app.conditional.conditional() (same ETags) and, given a cache
+    namespace, serves its 200s from the response cache like
+    app.response_cache.cached(). Every response gets an access log line.
+    """
+
+    def __init__(self, handler, collection=None, namespace=None):
+        self.handler = handler
+        self.collection = collection
+        self.namespace = namespace
+
+    @classmethod
+    def conditional(cls, collection, namespace=None):
+        return lambda handler: cls(handler, collection, namespace)
+
+    async def __call__(self, scope, receive, send):
+        request = Request(scope, receive)
+        if 'stream' in request.query_params:
+            await flask_wsgi(scope, receive, send)
+            return
+        started = time.perf_counter()
+        response = await self.respond(request)
+        if flask_app.config['LOG_ACCESS']:
+            log_pipeline.log_access(request.method, request.url.path, response.status_code,
+                                    (time.perf_counter() - started) * 1000)
+        await response(scope, receive, send)
+
+    async def respond(self, request):
+        cache_entry = None
+        try:
+            validators = None
+            version = None
+            if self.collection:
+                try:
+                    version, updated_at = await collection_version(get_async_db(), self.collection)
+                except Exception as e:
+                    # Without a version, just serve the request unconditionally
+                    flask_app.logger.error(f"Error reading {self.collection} version: {str(e)}")
+            if version is not None:
+                etag = make_etag(self.collection, version, request.url.path, request.query_params.multi_items())
+                validators = conditional_headers(etag, updated_at)
+                if not_modified(request.headers.get('if-none-match'), request.headers.get('if-modified-since'),
+                                etag, updated_at):
+                    return Response(status_code=304, headers=validators)
+                response, cache_entry = await self.cached_response(request, etag)
+            else:
+                response = await self.handler(request)
+            if validators and response.status_code == 200:
+                response.headers.update(validators)
+        except (PaginationError, StreamFormatError, FieldsError, FilterError) as e:
+            response = JSONResponse({'message': str(e)}, status_code=400)
+        except Exception as e:
+            flask_app.logger.error(f"Error handling {request.url.path}: {str(e)}")
+            response = JSONResponse({'message': 'Internal server error', 'error': str(e)}, status_code=500)
+        return await compressed(request, response, cache_entry)
+
+    async def cached_response(self, request, etag):
+        """
+        The handler's response through the response cache, keyed by the
+        request's ETag, with the (cache, namespace, key, entry id) it is
+        stored under (or None)
+        """
+        cache = flask_app.extensions.get('response_cache')
+        if cache is None or self.namespace is None or not wants_pagination(request.query_params):
+            return await self.handler(request), None
+        entry = await run_in_threadpool(in_app_context, cache.lookup, self.namespace, etag)
+        if entry is not None:
+            status, headers, body, entry_id = entry
+            response = Response(body, status_code=status, headers=dict(headers), media_type=JSONResponse.media_type)
+            return response, (cache, self.namespace, etag, entry_id)
+
+        response = await self.handler(request)
+        if response.status_code != 200:
+            return response, None
+        entry_id = await run_in_threadpool(in_app_context, cache.store, self.namespace, etag, response.status_code,
+                                           response.headers.items(), response.body)
+        return response, (cache, self.namespace, etag, entry_id) if entry_id is not None else None
+
+
+async def compressed(request, response, cache_entry=None):
+    """
+    app.compression.compress_response for a buffered Starlette response,
+    reusing the response cache's compressed copy of cache_entry
+    """
+    config = flask_app.config
+    if not config['COMPRESS_ENABLED'] or not compression.compressible(
+            response.status_code, response.media_type, response.headers, config):
+        return response
+    response.headers.add_vary_header('Accept-Encoding')
+    encoding = compression.negotiate(request.headers.get('accept-encoding'), config['COMPRESS_ENCODINGS'])
+    if encoding is None or len(response.body) < config['COMPRESS_MIN_SIZE']:
+        return response
+    level = config['COMPRESS_BROTLI_LEVEL'] if encoding == 'br' else config['COMPRESS_GZIP_LEVEL']
+    if cache_entry is None and len(response.body) <= INLINE_COMPRESS_SIZE:
+        response.body = compression.compress(response.body, encoding, level)
+    else:
+        response.body = await run_in_threadpool(
+            in_app_context, compression.compressed_body, response.body, encoding, level, cache_entry
+        )
+    response.headers['Content-Length'] = str(len(response.body))
+    response.headers['Content-Encoding'] = encoding
+    etag = response.headers.get('ETag')
+    if etag and not etag.startswith('W/'):
+        response.headers['ETag'] = 'W/' + etag
+    return response
+
+
+async def _aggregate(collection, pipeline):
+    return [doc async for doc in collection.aggregate(pipeline)]
+
+
+async def _list(request, collection, fieldset, query, sort, pipeline_for, id_field):
+    """Shared body of the market and knowledge list endpoints"""
+    db = get_async_db()
+    fields = fieldset.parse(request.query_params.get('fields'))
+    projection = fieldset.projection(fields, required=[field for field, _ in sort])
+
+    async def with_usernames(docs):
+        if fieldset.wants_username(fields):
+            await attach_usernames(db, docs, id_field, fieldset.username_field)
+        return [fieldset.trim(doc, fields) for doc in docs]
+
+    if not wants_pagination(request.query_params):
+        docs = await _aggregate(db[collection], pipeline_for(query, sort, projection=projection))
+        return JSONResponse(await with_usernames(docs))
+
+    limit = parse_limit(request.query_params.get('limit'))
+    query = apply_cursor(query, sort, request.query_params.get('cursor'))
+    docs = await _aggregate(db[collection], pipeline_for(query, sort, limit + 1, projection))
+    docs, next_cursor = split_page(docs, limit, sort)
+    return JSONResponse({'items': await with_usernames(docs), 'next_cursor': next_cursor})
+
+
+async def _detail(collection, fieldset, doc_id, request, pipeline_for, id_field, label):
+    if not ObjectId.is_valid(doc_id):
+        return JSONResponse({'message': f'Invalid {label} id'}, status_code=400)
+    db = get_async_db()
+    fields = fieldset.parse(request.query_params.get('fields'))
+    pipeline = pipeline_for({'_id': ObjectId(doc_id)}, NEWEST_FIRST, 1, fieldset.projection(fields))
+    docs = await _aggregate(db[collection], pipeline)
+    if not docs:
+        return JSONResponse({'message': f'{label.capitalize()} not found'}, status_code=404)
+    if fieldset.wants_username(fields):
+        await attach_usernames(db, docs, id_field, fieldset.username_field)
+    return JSONResponse(fieldset.trim(docs[0], fields))
+
+
+@ReadEndpoint.conditional('market_listings', 'market')
+async def market_list(request):
+    query, sort = parse_market_filters(request.query_params)
+    return await _list(request, 'market_listings', MARKET_FIELDS, query, sort,
+                       market_list_pipeline, 'farmer_id')
+
+
+@ReadEndpoint.conditional('market_listings', 'market')
+async def market_detail(request):
+    return await _detail('market_listings', MARKET_FIELDS, request.path_params['listing_id'], request,
+                         market_list_pipeline, 'farmer_id', 'market listing')
+
+
+@ReadEndpoint.conditional('knowledge_entries', 'knowledge')
+async def knowledge_list(request):
+    return await _list(request, 'knowledge_entries', KNOWLEDGE_FIELDS, {}, NEWEST_FIRST,
+                       knowledge_list_pipeline, 'author_id')
+
+
+@ReadEndpoint
+async def knowledge_search(request):
+    query = parse_knowledge_search(request.query_params)
+    fields = KNOWLEDGE_FIELDS.parse(request.query_params.get('fields'))
+    limit = parse_limit(request.query_params.get('limit'))
+    offset = decode_offset_cursor(request.query_params.get('cursor'))
+
+    db = get_async_db()
+    entries = await _aggregate(db.knowledge_entries, knowledge_search_pipeline(
+        query, offset, limit + 1, projection=KNOWLEDGE_FIELDS.projection(fields)
+    ))
+    entries, next_cursor = split_offset_page(entries, limit, offset)
+    if KNOWLEDGE_FIELDS.wants_username(fields):
+        await attach_usernames(db, entries, 'author_id', 'author_username')
+
+    keep = fields | {'score'} if fields else None
+    return JSONResponse({
+        'items': [KNOWLEDGE_FIELDS.trim(entry, keep) for entry in entries],
+        'next_cursor': next_cursor
+    })
+
+
+@ReadEndpoint.conditional('knowledge_entries', 'knowledge')
+async def knowledge_detail(request):
+    return await _detail('knowledge_entries', KNOWLEDGE_FIELDS, request.path_params['entry_id'], request,
+                         knowledge_list_pipeline, 'author_id', 'knowledge entry')
+
+
+# Status and message of flask_jwt_extended's default error handlers; any
+# other token error is a 422 with the error's own message
+JWT_ERRORS = (
+    (NoAuthorizationError, 401, None),
+    (ExpiredSignatureError, 401, 'Token has expired'),
+    (RevokedTokenError, 401, 'Token has been revoked'),
+    (UserClaimsVerificationError, 400, 'User claims verification failed'),
+)
+
+
+def _header_token(request):
+    """The token in the JWT header, parsed as flask_jwt_extended parses it"""
+    name, header_type = flask_app.config['JWT_HEADER_NAME'], flask_app.config['JWT_HEADER_TYPE']
+    header = request.headers.get(name, '').strip().strip(',')
+    if not header:
+        raise NoAuthorizationError(f'Missing {name} Header')
+    if not header_type:
+        parts = header.split()
+        if len(parts) != 1:
+            raise InvalidHeaderError(f"Bad {name} header. Expected '{name}: <JWT>'")
+        return parts[0]
+    values = [value for value in re.split(r',\s*', header) if value.split()[:1] == [header_type]]
+    if len(values) != 1:
+        raise NoAuthorizationError(
+            f"Missing '{header_type}' type in '{name}' header. Expected '{name}: {header_type} <JWT>'"
+        )
+    parts = values[0].split()
+    if len(parts) != 2:
+        raise InvalidHeaderError(f"Bad {name} header. Expected '{name}: {header_type} <JWT>'")
+    return parts[1]
+
+
+def _access_claims(request):
+    """
+    Claims of the request's access token, verified by flask_jwt_extended
+    with the app's settings and loaders, as @jwt_required() would
+    """
+    token = _header_token(request)
+    with flask_app.app_context():
+        claims = decode_token(token)
+        jwt_header = get_unverified_jwt_headers(token)
+        verify_token_type(claims, refresh=False)
+        verify_token_not_blocklisted(jwt_header, claims)
+        custom_verification_for_token(jwt_header, claims)
+    return claims
+
+
+def _token_error(e):
+    key = flask_app.config['JWT_ERROR_MESSAGE_KEY']
+    for error, status, message in JWT_ERRORS:
+        if isinstance(e, error):
+            return JSONResponse({key: message or str(e)}, status_code=status)
+    return JSONResponse({key: str(e)}, status_code=422)
+
+
+@ReadEndpoint
+async def profile(request):
+    try:
+        claims = _access_claims(request)
+    except (JWTExtendedException, PyJWTError) as e:
+        return _token_error(e)
+
+    user_id = claims[flask_app.config['JWT_IDENTITY_CLAIM']]
+    fresh = request.query_params.get('fresh', 'false').lower() == 'true'
+    if not fresh and 'profile' in claims:
+        stale, changed_profile = await run_in_threadpool(profile_changes.lookup, user_id, claims.get('iat', 0))
+        if not stale:
+            return JSONResponse(claims['profile'])
+        if changed_profile is not None:
+            return JSONResponse(changed_profile)
+
+    projection = PROFILE_PROJECTION if fresh else PROFILE_CLAIMS_PROJECTION
+    user = await get_async_db().users.find_one({'_id': ObjectId(user_id)}, projection)
+    if not user:
+        return JSONResponse({'message': 'User not found'}, status_code=404)
+    public_profile = profile_claims(user)
+    await run_in_threadpool(profile_changes.store, user_id, public_profile)
+    return JSONResponse(user_profile(user) if fresh else public_profile)
+
+
+app = Starlette(
+    routes=[
+        Route('/api/market/', market_list, methods=['GET']),
+        # Before the {listing_id} routes, which would otherwise match it
+        Route('/api/market/export', flask_wsgi),
+        Route('/api/market/{listing_id}', market_detail, methods=['GET']),
+        Route('/api/knowledge/', knowledge_list, methods=['GET']),
+        Route('/api/knowledge/search', knowledge_search, methods=['GET']),
+        Route('/api/knowledge/export', flask_wsgi),
+        Route('/api/knowledge/{entry_id}', knowledge_detail, methods=['GET']),
+        Route('/api/auth/profile', profile, methods=['GET']),
+        Mount('/', app=flask_wsgi),
+    ],
+    # Same policy as the flask_cors setup in create_app
+    middleware=[Middleware(CORSMiddleware, allow_origins=['*'], allow_credentials=True,
+                           allow_methods=['*'], allow_headers=['*'])],
+    lifespan=lifespan,
+)
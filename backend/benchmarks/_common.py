@@ -0,0 +1,166 @@
+"""
+Shared helpers for the benchmark scripts.
+
+The benchmarks talk to a real MongoDB; point MONGO_URI_TEST at a throwaway
+database before running them, e.g.
+
+    MONGO_URI_TEST=mongodb://localhost:27017/dagri_talk_bench python -m benchmarks.bench_db_client
+"""
+
+import asyncio
+import os
+import statistics
+import subprocess
+import threading
+import time
+
+from pymongo import monitoring
+
+
+def make_app():
+    """Create the Flask app with the testing config"""
+    from app import create_app
+    return create_app('testing')
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def run_load(func, total_requests, concurrency=8):
+    """
+    Calls func() total_requests times from `concurrency` threads and
+    returns throughput and latency statistics in milliseconds.
+    """
+    latencies = []
+    lock = threading.Lock()
+    per_thread = max(1, total_requests // concurrency)
+
+    def worker():
+        local = []
+        for _ in range(per_thread):
+            start = time.perf_counter()
+            func()
+            local.append((time.perf_counter() - start) * 1000)
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    return {
+        'requests': len(latencies),
+        'rps': len(latencies) / elapsed if elapsed else 0.0,
+        'mean_ms': statistics.mean(latencies) if latencies else 0.0,
+        'p50_ms': percentile(latencies, 50),
+        'p99_ms': percentile(latencies, 99),
+    }
+
+
+def print_table(rows, columns):
+    """Print a list of dicts as an aligned text table"""
+    widths = {c: max(len(c), *(len(_fmt(r.get(c))) for r in rows)) for c in columns}
+    print('  '.join(c.ljust(widths[c]) for c in columns))
+    for row in rows:
+        print('  '.join(_fmt(row.get(c)).ljust(widths[c]) for c in columns))
+
+
+def _fmt(value):
+    if isinstance(value, float):
+        return f'{value:.2f}'
+    return '' if value is None else str(value)
+
+
+class CommandCounter(monitoring.CommandListener):
+    """pymongo command listener that counts round trips by command name"""
+
+    def __init__(self):
+        self.counts = {}
+        self.lock = threading.Lock()
+
+    def started(self, event):
+        with self.lock:
+            self.counts[event.command_name] = self.counts.get(event.command_name, 0) + 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+    def reset(self):
+        with self.lock:
+            self.counts = {}
+
+    @property
+    def total(self):
+        return sum(self.counts.values())
+
+
+def install_command_counter():
+    """Register a CommandCounter; must run before the first MongoClient is built"""
+    counter = CommandCounter()
+    monitoring.register(counter)
+    return counter
+
+
+def start_server(command, port, env=None, timeout=30):
+    """Start a server subprocess and wait until /api/health answers 200"""
+    import httpx
+    process = subprocess.Popen(command, env=dict(os.environ, **(env or {})),
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f'http://127.0.0.1:{port}/api/health').status_code == 200:
+                return process
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"Server did not start: {' '.join(command)}")
+
+
+async def http_load(base_url, path, requests, concurrency, method='GET', json=None):
+    """
+    Issue `requests` HTTP requests with at most `concurrency` in flight
+    (httpx, from requirements-asgi.txt); returns rps, p50/p99 and errors.
+    """
+    import httpx
+    latencies, errors = [], 0
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        async def one():
+            nonlocal errors
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    response = await client.request(method, path, json=json)
+                    if response.status_code != 200:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append((time.perf_counter() - start) * 1000)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(requests)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        'rps': requests / elapsed if elapsed else 0.0,
+        'p50_ms': percentile(latencies, 50),
+        'p99_ms': percentile(latencies, 99),
+        'errors': errors,
+    }
@@ -0,0 +1,69 @@
+"""Synthetic users, market listings and knowledge entries for benchmarks"""
+
+import random
+from datetime import datetime, timedelta
+
+CROPS = ['Cassava', 'Rice', 'Cocoa', 'Coffee', 'Rubber', 'Plantain', 'Palm Oil', 'Pepper']
+REGIONS = ['Bong County', 'Nimba County', 'Lofa County', 'Margibi County', 'Montserrado County']
+UNITS = ['kg', 'bag', 'bunch', 'tin']
+WORDS = ('soil seed harvest rain dry season plant weed pest yield market price storage '
+         'drying fermentation planting spacing mulch compost irrigation nursery').split()
+
+
+def _sentence(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words))
+
+
+def seed(db, listings=10000, entries=10000, users=500, batch_size=5000, seed_value=42):
+    """Replace the users, market_listings and knowledge_entries collections with synthetic data"""
+    rng = random.Random(seed_value)
+    for name in ('users', 'market_listings', 'knowledge_entries'):
+        db[name].delete_many({})
+
+    start = datetime(2024, 1, 1)
+    user_docs = [{
+        'username': f'farmer{i}',
+        'email': f'farmer{i}@example.com',
+        'password_hash': 'x',
+        'user_type': 'farmer',
+        'location': rng.choice(REGIONS),
+        'created_at': start
+    } for i in range(users)]
+    user_ids = db.users.insert_many(user_docs).inserted_ids
+
+    def listing(i):
+        created = start + timedelta(minutes=i)
+        return {
+            'crop_name': rng.choice(CROPS),
+            'quantity': float(rng.randint(1, 500)),
+            'unit': rng.choice(UNITS),
+            'price_per_unit': round(rng.uniform(10, 500), 2),
+            'location': rng.choice(REGIONS),
+            'description': _sentence(rng, 12),
+            'farmer_id': rng.choice(user_ids),
+            'is_available': rng.random() < 0.8,
+            'created_at': created,
+            'updated_at': created
+        }
+
+    def entry(i):
+        created = start + timedelta(minutes=i)
+        return {
+            'title': _sentence(rng, 5).capitalize(),
+            'content': _sentence(rng, 200),
+            'language': 'English',
+            'crop_type': rng.choice(CROPS),
+            'season': rng.choice(['Rainy Season', 'Dry Season']),
+            'region': rng.choice(REGIONS),
+            'author_id': rng.choice(user_ids),
+            'created_at': created,
+            'updated_at': created
+        }
+
+    for collection, count, factory in (('market_listings', listings, listing), ('knowledge_entries', entries, entry)):
+        for offset in range(0, count, batch_size):
+            db[collection].insert_many(
+                [factory(i) for i in range(offset, min(count, offset + batch_size))],
+                ordered=False
+            )
+    return user_ids
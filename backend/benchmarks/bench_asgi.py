@@ -0,0 +1,70 @@
+"""
+Throughput and tail latency of the read endpoints served by the current
+gunicorn setup (gunicorn_conf.py, sync workers, run:app) versus the ASGI
+entry point (uvicorn asgi:app), at increasing client concurrency. Both
+servers get the same number of worker processes.
+
+Needs requirements-asgi.txt:
+
+    python -m benchmarks.bench_asgi --workers 4 --concurrency 8 64 256
+"""
+
+import argparse
+import asyncio
+import sys
+
+from app.database import get_db
+from app.indexes import ensure_indexes
+from benchmarks import _seed
+from benchmarks._common import http_load, make_app, print_table, start_server
+
+PATHS = [
+    '/api/market/?limit=50',
+    '/api/knowledge/?limit=50',
+    '/api/knowledge/search?q=harvest',
+]
+
+SERVERS = {
+    'gunicorn sync': lambda workers, port: [
+        sys.executable, '-m', 'gunicorn', '-c', 'gunicorn_conf.py',
+        '-w', str(workers), '-b', f'127.0.0.1:{port}', 'run:app'
+    ],
+    'uvicorn asgi': lambda workers, port: [
+        sys.executable, '-m', 'uvicorn', 'asgi:app', '--workers', str(workers),
+        '--host', '127.0.0.1', '--port', str(port), '--log-level', 'warning', '--no-access-log'
+    ],
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[8, 64, 256])
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--size', type=int, default=10000)
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    app = make_app()
+    with app.app_context():
+        db = get_db()
+        _seed.seed(db, listings=args.size, entries=args.size)
+        ensure_indexes(db)
+
+    rows = []
+    for name, command in SERVERS.items():
+        process = start_server(command(args.workers, args.port), args.port, {'FLASK_ENV': 'testing'})
+        try:
+            for concurrency in args.concurrency:
+                for path in PATHS:
+                    stats = asyncio.run(http_load(f'http://127.0.0.1:{args.port}', path, args.requests, concurrency))
+                    rows.append({'server': name, 'concurrency': concurrency, 'path': path, **stats})
+        finally:
+            process.terminate()
+            process.wait()
+
+    print_table(rows, ['server', 'concurrency', 'path', 'rps', 'p50_ms', 'p99_ms', 'errors'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+Compression of typical market and knowledge list payloads (app.compression):
+compressed size and ratio, CPU time per response, and the time to deliver
+the response over a slow mobile link (CPU plus transfer at --kbps). The
+'cached' rows are hits served from app.response_cache, which reuse the
+compressed body instead of compressing again.
+
+Payloads are built in memory (no MongoDB needed), shaped like the seeded
+collections and encoded by the app's JSON provider.
+
+    python -m benchmarks.bench_compression --kbps 1000 --repeat 20
+"""
+
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from bson.objectid import ObjectId
+from flask import Flask
+
+from app import compression, json_provider
+from benchmarks._common import print_table
+from benchmarks._seed import CROPS, REGIONS, _sentence
+from benchmarks.bench_json import make_listings
+
+
+def make_entries(count, seed_value=42):
+    rng = random.Random(seed_value)
+    authors = [ObjectId() for _ in range(50)]
+    start = datetime(2024, 1, 1)
+    return [{
+        '_id': ObjectId(),
+        'title': _sentence(rng, 5).capitalize(),
+        'content': _sentence(rng, 200),
+        'language': 'English',
+        'crop_type': rng.choice(CROPS),
+        'season': rng.choice(['Rainy Season', 'Dry Season']),
+        'region': rng.choice(REGIONS),
+        'author_id': rng.choice(authors),
+        'author_username': f'elder{rng.randrange(50)}',
+        'created_at': start + timedelta(minutes=i),
+        'updated_at': start + timedelta(minutes=i),
+    } for i in range(count)]
+
+
+def payloads():
+    app = Flask(__name__)
+    json_provider.init_app(app)
+    return {
+        'market page (50)': app.json.encode({'items': make_listings(50), 'next_cursor': 'x' * 80}),
+        'market list (1000)': app.json.encode(make_listings(1000)),
+        'knowledge page (50)': app.json.encode({'items': make_entries(50), 'next_cursor': 'x' * 80}),
+        'knowledge list (1000)': app.json.encode(make_entries(1000)),
+    }
+
+
+def measure(name, body, encoding, level, repeat, kbps):
+    if encoding == 'identity':
+        compressed, cpu = body, 0.0
+    else:
+        started = time.process_time()
+        for _ in range(repeat):
+            compressed = compression.compress(body, encoding, level)
+        cpu = (time.process_time() - started) / repeat
+    transfer = len(compressed) * 8 / (kbps * 1000)
+    return {
+        'payload': name,
+        'encoding': encoding if encoding == 'identity' else f'{encoding}-{level}',
+        'kb': len(body) / 1000,
+        'compressed_kb': len(compressed) / 1000,
+        'ratio': len(body) / len(compressed),
+        'cpu_ms': cpu * 1000,
+        'fresh_ms': (cpu + transfer) * 1000,
+        'cached_ms': transfer * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--kbps', type=float, default=1000, help='link speed for the delivery estimate')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    settings = [('identity', None), ('gzip', 1), ('gzip', 6), ('gzip', 9)]
+    if compression.brotli is not None:
+        settings += [('br', 5), ('br', 11)]
+
+    rows = []
+    for name, body in payloads().items():
+        for encoding, level in settings:
+            rows.append(measure(name, body, encoding, level, args.repeat, args.kbps))
+
+    print_table(rows, ['payload', 'encoding', 'kb', 'compressed_kb', 'ratio', 'cpu_ms', 'fresh_ms', 'cached_ms'])
+
+
+if __name__ == '__main__':
+    main()
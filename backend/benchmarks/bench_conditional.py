@@ -0,0 +1,78 @@
+"""
+Cost of a client refresh of the list endpoints when nothing has changed:
+an unconditional GET versus a conditional one (If-None-Match or
+If-Modified-Since answered with 304 from app.conditional). Reports response
+bytes, server CPU time (process_time, in-process test client), latency and
+MongoDB round trips per refresh.
+
+    python -m benchmarks.bench_conditional --size 10000 --repeat 50
+"""
+
+import argparse
+import time
+
+from app.database import get_db
+from app.indexes import ensure_indexes
+from app.stats import rebuild_tallies
+from benchmarks import _seed
+from benchmarks._common import install_command_counter, make_app, print_table
+
+COUNTER = install_command_counter()
+
+PATHS = [
+    '/api/market/',
+    '/api/market/?limit=50',
+    '/api/knowledge/',
+    '/api/knowledge/?limit=50',
+]
+
+
+def measure(client, path, mode, headers, repeat):
+    COUNTER.reset()
+    size = 0
+    cpu = time.process_time()
+    wall = time.perf_counter()
+    for _ in range(repeat):
+        response = client.get(path, headers=headers)
+        size += len(response.get_data())
+    status = response.status_code
+    return {
+        'path': path,
+        'mode': mode,
+        'status': status,
+        'bytes': size / repeat,
+        'cpu_ms': (time.process_time() - cpu) / repeat * 1000,
+        'latency_ms': (time.perf_counter() - wall) / repeat * 1000,
+        'round_trips': COUNTER.total / repeat,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--size', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    app = make_app()
+    with app.app_context():
+        db = get_db()
+        _seed.seed(db, listings=args.size, entries=args.size)
+        ensure_indexes(db)
+        # Seeds the tallies and the version documents the ETags come from
+        for collection in ('market_listings', 'knowledge_entries'):
+            rebuild_tallies(db, collection)
+
+    client = app.test_client()
+    rows = []
+    for path in PATHS:
+        first = client.get(path)
+        rows.append(measure(client, path, 'unconditional', {}, args.repeat))
+        rows.append(measure(client, path, 'If-None-Match', {'If-None-Match': first.headers['ETag']}, args.repeat))
+        rows.append(measure(client, path, 'If-Modified-Since',
+                            {'If-Modified-Since': first.headers['Last-Modified']}, args.repeat))
+
+    print_table(rows, ['path', 'mode', 'status', 'bytes', 'cpu_ms', 'latency_ms', 'round_trips'])
+
+
+if __name__ == '__main__':
+    main()
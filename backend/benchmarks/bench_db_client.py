@@ -0,0 +1,57 @@
+"""
+Requests/sec for GET /api/health with a MongoClient built per request
+(the old app.database behaviour) versus the pooled per-process client.
+
+    python -m benchmarks.bench_db_client --requests 2000 --concurrency 16
+"""
+
+import argparse
+from unittest import mock
+
+import pymongo
+from flask import current_app, g
+
+from app import database
+from benchmarks._common import make_app, print_table, run_load
+
+
+def per_request_get_db():
+    """Old behaviour: a fresh client per app context, closed at teardown"""
+    if 'bench_client' not in g:
+        app = current_app._get_current_object()
+        g.bench_client = pymongo.MongoClient(database.get_mongo_uri(app), **database.client_options(app))
+    return g.bench_client.get_default_database(database.DEFAULT_DB_NAME)
+
+
+def close_per_request_client(e=None):
+    client = g.pop('bench_client', None)
+    if client is not None:
+        client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=16)
+    args = parser.parse_args()
+
+    rows = []
+
+    app = make_app()
+    app.teardown_appcontext(close_per_request_client)
+    client = app.test_client()
+    with mock.patch.object(database, 'get_db', per_request_get_db):
+        stats = run_load(lambda: client.get('/api/health'), args.requests, args.concurrency)
+    rows.append(dict(stats, mode='client per request'))
+
+    app = make_app()
+    database.warm_up(app)
+    client = app.test_client()
+    stats = run_load(lambda: client.get('/api/health'), args.requests, args.concurrency)
+    rows.append(dict(stats, mode='pooled client'))
+
+    print_table(rows, ['mode', 'requests', 'rps', 'mean_ms', 'p50_ms', 'p99_ms'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""
+Encoding a page of market listings to a JSON response body:
+
+    legacy   str()/isoformat() every document, then Flask's stdlib provider
+             (what the routes did before app.json_provider)
+    stdlib   MongoJSONProvider, raw documents
+    orjson   OrjsonProvider, raw documents (skipped if orjson is missing)
+
+Documents are built in memory (no MongoDB needed), shaped like the seeded
+listings.
+
+    python -m benchmarks.bench_json --sizes 1000,10000,100000 --repeat 5
+"""
+
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from bson.objectid import ObjectId
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from app import json_provider
+from app.json_provider import MongoJSONProvider, OrjsonProvider
+from benchmarks._common import print_table
+from benchmarks._seed import CROPS, REGIONS, UNITS, _sentence
+
+
+def make_listings(count, seed_value=42):
+    rng = random.Random(seed_value)
+    farmers = [ObjectId() for _ in range(50)]
+    start = datetime(2024, 1, 1)
+    return [{
+        '_id': ObjectId(),
+        'crop_name': rng.choice(CROPS),
+        'quantity': float(rng.randint(1, 500)),
+        'unit': rng.choice(UNITS),
+        'price_per_unit': round(rng.uniform(10, 500), 2),
+        'location': rng.choice(REGIONS),
+        'description': _sentence(rng, 12),
+        'farmer_id': rng.choice(farmers),
+        'farmer_username': f'farmer{rng.randrange(50)}',
+        'is_available': rng.random() < 0.8,
+        'created_at': start + timedelta(minutes=i),
+        'updated_at': start + timedelta(minutes=i),
+    } for i in range(count)]
+
+
+def legacy_serialize(listing):
+    listing['_id'] = str(listing['_id'])
+    if listing.get('farmer_id'):
+        listing['farmer_id'] = str(listing['farmer_id'])
+    if 'created_at' in listing:
+        listing['created_at'] = listing['created_at'].isoformat()
+    if 'updated_at' in listing:
+        listing['updated_at'] = listing['updated_at'].isoformat()
+    return listing
+
+
+def measure(app, docs, mode, convert, repeat):
+    cpu = wall = 0.0
+    size = 0
+    for _ in range(repeat):
+        # Fresh dicts each round, as if read off a cursor
+        batch = [dict(doc) for doc in docs]
+        with app.app_context():
+            started_cpu, started_wall = time.process_time(), time.perf_counter()
+            body = app.json.response({'items': [convert(doc) for doc in batch], 'next_cursor': None}).get_data()
+            cpu += time.process_time() - started_cpu
+            wall += time.perf_counter() - started_wall
+        size = len(body)
+    return {
+        'docs': len(docs),
+        'mode': mode,
+        'ms': wall / repeat * 1000,
+        'cpu_ms': cpu / repeat * 1000,
+        'docs_per_s': len(docs) * repeat / wall if wall else 0.0,
+        'mb': size / 1e6,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', default='1000,10000,100000')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    modes = [('legacy', DefaultJSONProvider, legacy_serialize), ('stdlib', MongoJSONProvider, lambda doc: doc)]
+    if json_provider.orjson is not None:
+        modes.append(('orjson', OrjsonProvider, lambda doc: doc))
+
+    rows = []
+    for size in (int(value) for value in args.sizes.split(',')):
+        docs = make_listings(size)
+        for mode, provider, convert in modes:
+            app = Flask(__name__)
+            app.json = provider(app)
+            rows.append(measure(app, docs, mode, convert, args.repeat))
+
+    print_table(rows, ['docs', 'mode', 'ms', 'cpu_ms', 'docs_per_s', 'mb'])
+
+
+if __name__ == '__main__':
+    main()
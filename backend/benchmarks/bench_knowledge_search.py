@@ -0,0 +1,49 @@
+"""
+Latency of GET /api/knowledge/search over the weighted text index at
+100k+ knowledge entries.
+
+    python -m benchmarks.bench_knowledge_search --size 150000
+"""
+
+import argparse
+from urllib.parse import urlencode
+
+from app.database import get_db
+from app.indexes import ensure_indexes
+from benchmarks import _seed
+from benchmarks._common import make_app, print_table, run_load
+
+QUERIES = {
+    'one term': {'q': 'harvest'},
+    'two terms': {'q': 'cassava planting'},
+    'phrase': {'q': '"dry season"'},
+    'term + region': {'q': 'compost', 'region': 'Bong County'},
+    'term + crop + season': {'q': 'pest', 'crop_type': 'Cocoa', 'season': 'Rainy Season'},
+    'summary fields': {'q': 'storage', 'fields': 'summary'},
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--size', type=int, default=150000)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=4)
+    args = parser.parse_args()
+
+    app = make_app()
+    client = app.test_client()
+    with app.app_context():
+        db = get_db()
+        _seed.seed(db, listings=0, entries=args.size)
+        ensure_indexes(db)
+
+    rows = []
+    for name, params in QUERIES.items():
+        url = '/api/knowledge/search?' + urlencode(params)
+        stats = run_load(lambda: client.get(url), args.requests, args.concurrency)
+        rows.append(dict(stats, query=name, hits=len(client.get(url).json['items'])))
+    print_table(rows, ['query', 'hits', 'rps', 'p50_ms', 'p99_ms'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+Latency and MongoDB round trips for the GET /api/market/ and
+GET /api/knowledge/ queries with per-document username lookups (the old N+1
+loop) versus one aggregation plus batched usernames from app.user_cache
+(cold: empty cache, warm: every username cached).
+
+    python -m benchmarks.bench_list_endpoints --sizes 10000 100000
+"""
+
+import argparse
+import time
+
+from bson.objectid import ObjectId
+
+from app.database import get_db
+from app.indexes import NEWEST_FIRST, ensure_indexes
+from app.models.knowledge import knowledge_list_pipeline
+from app.models.market import market_list_pipeline
+from app.user_cache import attach_usernames, username_cache
+from benchmarks import _seed
+from benchmarks._common import install_command_counter, make_app, print_table
+
+COUNTER = install_command_counter()
+
+
+def n_plus_one(collection, query, id_field, username_field):
+    """The list loop the routes used before the aggregation pipeline"""
+    db = get_db()
+    docs = list(db[collection].find(query).sort(NEWEST_FIRST))
+    for doc in docs:
+        if doc.get(id_field):
+            user = db.users.find_one({'_id': ObjectId(doc[id_field])})
+            doc[username_field] = user['username'] if user else 'Unknown'
+    return docs
+
+
+def batched(collection, pipeline, id_field, username_field):
+    db = get_db()
+    return attach_usernames(db, list(db[collection].aggregate(pipeline)), id_field, username_field)
+
+
+def measure(label, size, func, repeat, cold=False):
+    COUNTER.reset()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        if cold:
+            username_cache.clear()
+        func()
+    elapsed = (time.perf_counter() - start) / repeat
+    return {
+        'size': size,
+        'mode': label,
+        'latency_ms': elapsed * 1000,
+        'round_trips': COUNTER.total / repeat,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    app = make_app()
+    rows = []
+    with app.app_context():
+        db = get_db()
+        ensure_indexes(db)
+        for size in args.sizes:
+            _seed.seed(db, listings=size, entries=size)
+            market = ('market_listings', market_list_pipeline({'is_available': True}, NEWEST_FIRST),
+                      'farmer_id', 'farmer_username')
+            knowledge = ('knowledge_entries', knowledge_list_pipeline({}, NEWEST_FIRST),
+                         'author_id', 'author_username')
+            rows.append(measure('market N+1', size, lambda: n_plus_one(
+                'market_listings', {'is_available': True}, 'farmer_id', 'farmer_username'), args.repeat))
+            rows.append(measure('market cold cache', size, lambda: batched(*market), args.repeat, cold=True))
+            rows.append(measure('market warm cache', size, lambda: batched(*market), args.repeat))
+            rows.append(measure('knowledge N+1', size, lambda: n_plus_one(
+                'knowledge_entries', {}, 'author_id', 'author_username'), args.repeat))
+            rows.append(measure('knowledge cold cache', size, lambda: batched(*knowledge), args.repeat, cold=True))
+            rows.append(measure('knowledge warm cache', size, lambda: batched(*knowledge), args.repeat))
+
+    print_table(rows, ['size', 'mode', 'latency_ms', 'round_trips'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""
+Per-request cost of request logging, measured through the Flask test client
+on /api/test-cors (no database work):
+
+    none            no request logging at all (the floor)
+    print headers   the old before_request hook: print() of the method, path
+                    and every header to stdout
+    sync handlers   one access line per request written on the request thread
+                    to stdout and the rotating files (the old LOGGING_CONFIG)
+    queue pipeline  the same access line through app.log_pipeline
+
+stdout is redirected to a temporary file so the terminal is not the
+bottleneck; --sink-delay-ms adds a sleep to every sink write to stand in for
+a slow disk or a blocked log pipe.
+
+    python -m benchmarks.bench_logging --requests 5000 --sink-delay-ms 0 0.2
+"""
+
+import argparse
+import contextlib
+import logging
+import tempfile
+import time
+
+from app.config import TestingConfig
+from app.log_pipeline import build_sinks, pipeline
+from benchmarks._common import make_app, print_table, run_load
+
+MODES = ['none', 'print headers', 'sync handlers', 'queue pipeline']
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) benchmark',
+    'Accept': 'application/json',
+    'Accept-Language': 'en-US,en;q=0.9',
+    'Authorization': 'Bearer ' + 'x' * 300,
+}
+
+
+def slow_sinks(log_dir, delay):
+    sinks = build_sinks(log_dir)
+    if delay:
+        for sink in sinks:
+            emit = sink.emit
+
+            def slow_emit(record, emit=emit):
+                time.sleep(delay)
+                emit(record)
+            sink.emit = slow_emit
+    return sinks
+
+
+def build(mode, log_dir, delay):
+    """An app logging requests as `mode` does; returns (app, cleanup)"""
+    TestingConfig.LOG_PIPELINE = mode == 'queue pipeline'
+    TestingConfig.LOG_ACCESS = mode in ('sync handlers', 'queue pipeline')
+    root = logging.getLogger()
+    sinks = []
+
+    if mode == 'queue pipeline':
+        pipeline.start(slow_sinks(log_dir, delay), queue_size=TestingConfig.LOG_QUEUE_SIZE)
+    app = make_app()
+
+    if mode == 'sync handlers':
+        sinks = slow_sinks(log_dir, delay)
+        for sink in sinks:
+            root.addHandler(sink)
+        root.setLevel(logging.INFO)
+    elif mode == 'print headers':
+        from flask import request
+
+        @app.before_request
+        def log_request_info():
+            print(f"Received {request.method} request to {request.path}")
+            print(f"Headers: {dict(request.headers)}")
+            if delay:
+                time.sleep(delay)
+
+    def cleanup():
+        for sink in sinks:
+            root.removeHandler(sink)
+            sink.close()
+        pipeline.stop()
+
+    return app, cleanup
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--modes', nargs='+', default=MODES, choices=MODES)
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--concurrency', type=int, default=1)
+    parser.add_argument('--sink-delay-ms', type=float, nargs='+', default=[0, 0.2])
+    args = parser.parse_args()
+
+    rows = []
+    with tempfile.TemporaryDirectory() as log_dir, open(f'{log_dir}/stdout', 'w') as stdout:
+        for delay_ms in args.sink_delay_ms:
+            floor = None
+            for mode in args.modes:
+                app, cleanup = build(mode, log_dir, delay_ms / 1000)
+                client = app.test_client()
+                with contextlib.redirect_stdout(stdout):
+                    try:
+                        stats = run_load(lambda: client.get('/api/test-cors', headers=HEADERS),
+                                         args.requests, args.concurrency)
+                        dropped = pipeline.dropped
+                    finally:
+                        # Drains the queue, so still inside the redirect
+                        cleanup()
+                mean_us = stats['mean_ms'] * 1000
+                if mode == 'none':
+                    floor = mean_us
+                rows.append({'sink_delay_ms': delay_ms, 'mode': mode, 'mean_us': mean_us,
+                             'p99_us': stats['p99_ms'] * 1000,
+                             'overhead_us': mean_us - floor if floor is not None else None,
+                             'dropped': dropped})
+
+    print_table(rows, ['sink_delay_ms', 'mode', 'mean_us', 'p99_us', 'overhead_us', 'dropped'])
+
+
+if __name__ == '__main__':
+    main()
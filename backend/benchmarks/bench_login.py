@@ -0,0 +1,64 @@
+"""
+POST /api/auth/login throughput and latency for each password hash
+setting and hash pool size, with requests issued from --concurrency
+threads (as a gthread worker would).
+
+    python -m benchmarks.bench_login --settings scrypt:16384 scrypt:32768 pbkdf2:600000 --workers 1 2 4
+"""
+
+import argparse
+
+from app.database import get_db
+from app.indexes import ensure_indexes
+from app.passwords import PasswordHasher, hash_method
+from benchmarks._common import make_app, print_table, run_load
+
+PASSWORD = 'benchmark-password'
+
+
+def measure(app, algorithm, cost, workers, requests, concurrency):
+    method = hash_method(algorithm, cost)
+    app.extensions['password_hasher'] = PasswordHasher(method, workers=workers, max_pending=concurrency)
+    with app.app_context():
+        db = get_db()
+        db.users.delete_many({'username': 'bench-login'})
+        db.users.insert_one({
+            'username': 'bench-login',
+            'email': 'bench-login@example.com',
+            'password_hash': app.extensions['password_hasher'].hash(PASSWORD),
+        })
+
+    def login():
+        response = app.test_client().post('/api/auth/login', json={'username': 'bench-login', 'password': PASSWORD})
+        assert response.status_code == 200, response.status_code
+
+    stats = run_load(login, requests, concurrency)
+    app.extensions['password_hasher'].shutdown()
+    return {'method': method, 'workers': workers, **stats}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--settings', nargs='+', default=['scrypt:16384', 'scrypt:32768', 'pbkdf2:600000'],
+                        help='algorithm:cost pairs')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=8)
+    args = parser.parse_args()
+
+    app = make_app()
+    with app.app_context():
+        ensure_indexes(get_db())
+
+    rows = []
+    for setting in args.settings:
+        algorithm, _, cost = setting.partition(':')
+        for workers in args.workers:
+            rows.append(measure(app, algorithm, int(cost) if cost else None, workers,
+                                args.requests, args.concurrency))
+
+    print_table(rows, ['method', 'workers', 'requests', 'rps', 'mean_ms', 'p50_ms', 'p99_ms'])
+
+
+if __name__ == '__main__':
+    main()
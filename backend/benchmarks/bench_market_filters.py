@@ -0,0 +1,82 @@
+"""
+Client-side filtering of the full GET /api/market/ dump versus server-side
+filtered queries, at 100k listings.
+
+    python -m benchmarks.bench_market_filters --size 100000
+"""
+
+import argparse
+import json
+import time
+from urllib.parse import urlencode
+
+from app.database import get_db
+from app.indexes import ensure_indexes
+from benchmarks import _seed
+from benchmarks._common import make_app, print_table
+
+SCENARIOS = {
+    'crop': {'crop_name': 'Cassava'},
+    'crop + price range, by price': {'crop_name': 'Rice', 'min_price': '50', 'max_price': '150', 'sort': 'price'},
+    'location + unit': {'location': 'Bong County', 'unit': 'kg'},
+    'cheapest': {'max_price': '20', 'sort': 'price'},
+}
+
+
+def client_side(listings, params):
+    """What the browser had to do: filter and sort the whole dump"""
+    def keep(listing):
+        for name in ('crop_name', 'location', 'unit'):
+            if name in params and listing[name] != params[name]:
+                return False
+        if 'min_price' in params and listing['price_per_unit'] < float(params['min_price']):
+            return False
+        if 'max_price' in params and listing['price_per_unit'] > float(params['max_price']):
+            return False
+        return True
+
+    matches = [listing for listing in listings if keep(listing)]
+    if params.get('sort') == 'price':
+        matches.sort(key=lambda listing: (listing['price_per_unit'], listing['_id']))
+    return matches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--size', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    app = make_app()
+    client = app.test_client()
+    with app.app_context():
+        db = get_db()
+        ensure_indexes(db)
+        _seed.seed(db, listings=args.size, entries=0)
+
+    rows = []
+    for name, params in SCENARIOS.items():
+        for mode in ('client-side', 'server-side'):
+            elapsed, transferred, matches = 0.0, 0, 0
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                if mode == 'client-side':
+                    response = client.get('/api/market/?paginate=false')
+                    matches = len(client_side(json.loads(response.data), params))
+                else:
+                    response = client.get('/api/market/?' + urlencode(dict(params, paginate='false')))
+                    matches = len(json.loads(response.data))
+                elapsed += time.perf_counter() - start
+                transferred = len(response.data)
+            rows.append({
+                'scenario': name,
+                'mode': mode,
+                'latency_ms': elapsed / args.repeat * 1000,
+                'bytes': transferred,
+                'matches': matches,
+            })
+    print_table(rows, ['scenario', 'mode', 'latency_ms', 'bytes', 'matches'])
+
+
+if __name__ == '__main__':
+    main()
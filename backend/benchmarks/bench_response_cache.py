@@ -0,0 +1,76 @@
+"""
+Hot list reads with and without the response cache (app.response_cache):
+throughput, latency, MongoDB round trips per request and the cache hit ratio
+under concurrent load. Set RESPONSE_CACHE_BACKEND=redis and
+RESPONSE_CACHE_URL to measure the shared backend.
+
+    python -m benchmarks.bench_response_cache --size 10000 --requests 2000
+"""
+
+import argparse
+
+from app.database import get_db
+from app.indexes import ensure_indexes
+from app.response_cache import CACHE_REQUESTS
+from benchmarks import _seed
+from benchmarks._common import install_command_counter, make_app, print_table, run_load
+
+COUNTER = install_command_counter()
+
+PATHS = [
+    '/api/market/?limit=50',
+    '/api/knowledge/?limit=50',
+]
+
+
+def cache_results():
+    return {
+        (sample.labels['namespace'], sample.labels['result']): sample.value
+        for metric in CACHE_REQUESTS.collect() for sample in metric.samples if sample.name.endswith('_total')
+    }
+
+
+def hit_ratio(before, after, namespace):
+    delta = {result: after.get((namespace, result), 0) - before.get((namespace, result), 0)
+             for result in ('hit', 'miss', 'coalesced')}
+    total = sum(delta.values())
+    return (delta['hit'] + delta['coalesced']) / total if total else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--size', type=int, default=10000)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=8)
+    args = parser.parse_args()
+
+    app = make_app()
+    with app.app_context():
+        db = get_db()
+        _seed.seed(db, listings=args.size, entries=args.size)
+        ensure_indexes(db)
+    cache = app.extensions.pop('response_cache', None)
+
+    rows = []
+    for mode in ('uncached', 'cached'):
+        if mode == 'cached' and cache is not None:
+            app.extensions['response_cache'] = cache
+        client = app.test_client()
+        for path in PATHS:
+            namespace = path.split('/')[2]
+            before = cache_results()
+            COUNTER.reset()
+            stats = run_load(lambda: client.get(path), args.requests, args.concurrency)
+            stats.update({
+                'path': path,
+                'mode': mode,
+                'round_trips': COUNTER.total / stats['requests'],
+                'hit_ratio': hit_ratio(before, cache_results(), namespace),
+            })
+            rows.append(stats)
+
+    print_table(rows, ['path', 'mode', 'rps', 'mean_ms', 'p50_ms', 'p99_ms', 'round_trips', 'hit_ratio'])
+
+
+if __name__ == '__main__':
+    main()
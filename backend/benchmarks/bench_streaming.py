@@ -0,0 +1,63 @@
+"""
+Time-to-first-byte, total time and peak Python heap for the list endpoints
+in each response mode: buffered (?paginate=false), one keyset page,
+?stream=json and ?stream=ndjson.
+
+    python -m benchmarks.bench_streaming --size 100000
+"""
+
+import argparse
+import time
+import tracemalloc
+
+from app.database import get_db
+from app.indexes import ensure_indexes
+from benchmarks import _seed
+from benchmarks._common import make_app, print_table
+
+MODES = {
+    'buffered': 'paginate=false',
+    'page': 'limit=50',
+    'stream json': 'stream=json',
+    'stream ndjson': 'stream=ndjson',
+}
+
+
+def measure(client, path, query):
+    tracemalloc.start()
+    start = time.perf_counter()
+    response = client.get(f'{path}?{query}', buffered=False)
+    chunks = iter(response.response)
+    first = next(chunks, b'')
+    ttfb = time.perf_counter() - start
+    size = len(first)
+    for chunk in chunks:
+        size += len(chunk)
+    total = time.perf_counter() - start
+    response.close()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'ttfb_ms': ttfb * 1000, 'total_ms': total * 1000, 'bytes': size, 'peak_heap_mb': peak / 2 ** 20}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--size', type=int, default=100000)
+    args = parser.parse_args()
+
+    app = make_app()
+    client = app.test_client()
+    with app.app_context():
+        db = get_db()
+        ensure_indexes(db)
+        _seed.seed(db, listings=args.size, entries=args.size)
+
+    rows = []
+    for path in ('/api/market/', '/api/knowledge/'):
+        for mode, query in MODES.items():
+            rows.append(dict(measure(client, path, query), endpoint=path, mode=mode))
+    print_table(rows, ['endpoint', 'mode', 'ttfb_ms', 'total_ms', 'bytes', 'peak_heap_mb'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+gunicorn worker profile matrix: sync vs gthread vs gevent (selected through
+GUNICORN_WORKER_CLASS in gunicorn_conf.py) on the list endpoints and
+POST /api/auth/login, at increasing client concurrency. Every profile runs
+with the same number of worker processes.
+
+Needs httpx (requirements-asgi.txt):
+
+    python -m benchmarks.bench_workers --workers 4 --concurrency 16 128
+"""
+
+import argparse
+import asyncio
+import sys
+
+from app.database import get_db
+from app.indexes import ensure_indexes
+from benchmarks import _seed
+from benchmarks._common import http_load, make_app, print_table, start_server
+
+PROFILES = ['sync', 'gthread', 'gevent']
+PASSWORD = 'benchmark-password'
+
+REQUESTS = [
+    ('GET', '/api/market/?limit=50', None),
+    ('GET', '/api/knowledge/?limit=50', None),
+    ('POST', '/api/auth/login', {'username': 'bench-login', 'password': PASSWORD}),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--profiles', nargs='+', default=PROFILES, choices=PROFILES)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[16, 128])
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--size', type=int, default=10000)
+    parser.add_argument('--port', type=int, default=8766)
+    args = parser.parse_args()
+
+    app = make_app()
+    with app.app_context():
+        db = get_db()
+        _seed.seed(db, listings=args.size, entries=args.size)
+        ensure_indexes(db)
+        db.users.insert_one({
+            'username': 'bench-login',
+            'email': 'bench-login@example.com',
+            'password_hash': app.extensions['password_hasher'].hash(PASSWORD),
+        })
+
+    rows = []
+    for profile in args.profiles:
+        command = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn_conf.py', 'run:app']
+        env = {
+            'FLASK_ENV': 'testing',
+            'GUNICORN_WORKER_CLASS': profile,
+            'GUNICORN_WORKERS': str(args.workers),
+            'GUNICORN_BIND': f'127.0.0.1:{args.port}',
+        }
+        process = start_server(command, args.port, env)
+        try:
+            for concurrency in args.concurrency:
+                for method, path, body in REQUESTS:
+                    stats = asyncio.run(http_load(
+                        f'http://127.0.0.1:{args.port}', path, args.requests, concurrency, method, body
+                    ))
+                    rows.append({'profile': profile, 'concurrency': concurrency,
+                                 'request': f'{method} {path}', **stats})
+        finally:
+            process.terminate()
+            process.wait()
+
+    print_table(rows, ['profile', 'concurrency', 'request', 'rps', 'p50_ms', 'p99_ms', 'errors'])
+
+
+if __name__ == '__main__':
+    main()
@@ -1,13 +1,105 @@
+import glob
 import multiprocessing
+import os
+import tempfile
 
 # Gunicorn configuration file
 # https://docs.gunicorn.org/en/stable/settings.html
+#
+# GUNICORN_WORKER_CLASS picks the worker profile:
+#   sync     one request at a time per process (default)
+#   gthread  GUNICORN_THREADS requests per process on OS threads
+#   gevent   up to GUNICORN_WORKER_CONNECTIONS requests per process on greenlets
+# The MongoDB pool of each process is sized to match (see below).
 
-# The number of worker processes for handling requests
-workers = multiprocessing.cpu_count() * 2 + 1
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'sync')
+if worker_class not in ('sync', 'gthread', 'gevent'):
+    raise RuntimeError(f"Unsupported GUNICORN_WORKER_CLASS: {worker_class}")
+
+if worker_class == 'gevent':
+    # Patch before the app (and pymongo) is imported by preload_app
+    from gevent import monkey
+    monkey.patch_all()
+
+# The number of worker processes for handling requests. Cooperative
+# workers overlap I/O inside a process, so fewer processes are needed.
+if worker_class == 'sync':
+    _default_workers = multiprocessing.cpu_count() * 2 + 1
+else:
+    _default_workers = multiprocessing.cpu_count() + 1
+workers = int(os.environ.get('GUNICORN_WORKERS', _default_workers))
+threads = int(os.environ.get('GUNICORN_THREADS', 8)) if worker_class == 'gthread' else 1
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 1000))
 
 # The socket to bind to
-bind = "0.0.0.0:5000"
+bind = os.environ.get('GUNICORN_BIND', "0.0.0.0:5000")
 
 # The maximum number of seconds to wait for a request
-timeout = 120
\ No newline at end of file
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+
+# Import the app once in the master; workers fork with it loaded.
+# post_fork drops the inherited MongoDB client.
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'true').lower() == 'true'
+
+
+def worker_concurrency():
+    """Requests one worker process can have in flight"""
+    if worker_class == 'gevent':
+        return worker_connections
+    return threads
+
+
+# One pooled connection per concurrent request, capped for gevent where
+# worker_connections is mostly sockets idling on slow clients. An explicit
+# MONGO_MAX_POOL_SIZE still wins. Set before the app reads its config.
+os.environ.setdefault(
+    'MONGO_MAX_POOL_SIZE',
+    str(min(worker_concurrency(), int(os.environ.get('GUNICORN_MONGO_POOL_CAP', 100))))
+)
+
+# Prometheus multiprocess mode (app.metrics): workers write their metric
+# values to files here and /metrics merges them. Set up before the app, and
+# with it prometheus_client, is imported. on_starting clears an earlier
+# run's files.
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'dagri_talk_prometheus'))
+os.makedirs(os.environ['PROMETHEUS_MULTIPROC_DIR'], exist_ok=True)
+
+
+def on_starting(server):
+    """
+    Remove metric files left by an earlier run so they are not merged in.
+    Runs once per master start (not on HUP reloads) and only touches
+    prometheus_client's *.db files, never the directory itself.
+    """
+    for path in glob.glob(os.path.join(os.environ['PROMETHEUS_MULTIPROC_DIR'], '*.db')):
+        os.remove(path)
+
+
+def post_fork(server, worker):
+    """Never use a MongoDB client created before fork (preload_app)"""
+    if server.cfg.preload_app:
+        from app import database
+        database.reset_client(server.app.wsgi())
+
+
+def post_worker_init(worker):
+    """Open the worker's MongoDB pool before it accepts requests"""
+    from app import database
+    database.warm_up(worker.wsgi)
+
+
+def worker_exit(server, worker):
+    """Close the worker's MongoDB pool and password hash threads, flush its metrics and logs"""
+    from app import database, log_pipeline
+    if worker.wsgi is not None:
+        database.reset_client(worker.wsgi)
+        worker.wsgi.extensions['password_hasher'].shutdown()
+        if 'cloudwatch_metrics' in worker.wsgi.extensions:
+            worker.wsgi.extensions['cloudwatch_metrics'].stop()
+    log_pipeline.pipeline.stop()
+
+
+def child_exit(server, worker):
+    """Drop a dead worker's live* gauge values from /metrics"""
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -4,93 +4,18 @@ Comprehensive logging configuration for D'Agri Talk
 
 import os
 import logging
-import logging.config
 from datetime import datetime
 from flask import Flask, jsonify, redirect, url_for, request
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
 from app.config import config
 from app.extensions import jwt
+from app.log_pipeline import build_sinks, pipeline
 from app.monitoring import monitor
 
-# Logging configuration
-LOGGING_CONFIG = {
-    'version': 1,
-    'disable_existing_loggers': False,
-    'formatters': {
-        'detailed': {
-            'format': '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-        },
-        'json': {
-            'format': '{"timestamp": "%(asctime)s", "logger": "%(name)s", "level": "%(levelname)s", "message": "%(message)s", "module": "%(module)s", "function": "%(funcName)s", "line": %(lineno)d}'
-        },
-        'simple': {
-            'format': '%(levelname)s - %(message)s'
-        }
-    },
-    'handlers': {
-        'console': {
-            'class': 'logging.StreamHandler',
-            'level': 'INFO',
-            'formatter': 'json',
-            'stream': 'ext://sys.stdout'
-        },
-        'file': {
-            'class': 'logging.handlers.RotatingFileHandler',
-            'level': 'DEBUG',
-            'formatter': 'detailed',
-            'filename': 'logs/dagri_talk.log',
-            'maxBytes': 10485760,  # 10MB
-            'backupCount': 5
-        },
-        'error_file': {
-            'class': 'logging.handlers.RotatingFileHandler',
-            'level': 'ERROR',
-            'formatter': 'detailed',
-            'filename': 'logs/dagri_talk_errors.log',
-            'maxBytes': 10485760,  # 10MB
-            'backupCount': 5
-        },
-        'security_file': {
-            'class': 'logging.handlers.RotatingFileHandler',
-            'level': 'WARNING',
-            'formatter': 'json',
-            'filename': 'logs/dagri_talk_security.log',
-            'maxBytes': 10485760,  # 10MB
-            'backupCount': 10
-        }
-    },
-    'loggers': {
-        '': {  # Root logger
-            'handlers': ['console', 'file'],
-            'level': 'INFO',
-            'propagate': False
-        },
-        'dagri_talk': {
-            'handlers': ['console', 'file', 'error_file'],
-            'level': 'DEBUG',
-            'propagate': False
-        },
-        'dagri_talk.security': {
-            'handlers': ['console', 'security_file'],
-            'level': 'WARNING',
-            'propagate': False
-        },
-        'werkzeug': {
-            'handlers': ['file'],
-            'level': 'WARNING',
-            'propagate': False
-        }
-    }
-}
-
-def setup_logging():
-    """Setup logging configuration"""
-    # Create logs directory if it doesn't exist
-    os.makedirs('logs', exist_ok=True)
-    
-    # Apply logging configuration
-    logging.config.dictConfig(LOGGING_CONFIG)
+def setup_logging(log_dir='logs'):
+    """Setup logging: the queue pipeline of app.log_pipeline, with log files in log_dir"""
+    pipeline.start(build_sinks(log_dir))
     
     # Log startup message
     logger = logging.getLogger('dagri_talk')
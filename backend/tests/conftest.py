@@ -1,6 +1,7 @@
 import pytest
 from app import create_app
-from app.extensions import mongo
+from app.database import get_db
+from app.indexes import ensure_indexes
 from flask_jwt_extended import create_access_token
 from werkzeug.security import generate_password_hash
 from datetime import datetime
@@ -10,15 +11,18 @@ from bson.objectid import ObjectId
 def app():
     app = create_app('testing')
     with app.app_context():
+        db = get_db()
         # Clear the test database
-        mongo.db.users.delete_many({})
-        mongo.db.knowledge_entries.delete_many({})
-        mongo.db.market_listings.delete_many({})
+        db.users.delete_many({})
+        db.knowledge_entries.delete_many({})
+        db.market_listings.delete_many({})
+        # Registration relies on the unique indexes for duplicate checks
+        ensure_indexes(db)
         yield app
         # Clean up after tests
-        mongo.db.users.delete_many({})
-        mongo.db.knowledge_entries.delete_many({})
-        mongo.db.market_listings.delete_many({})
+        db.users.delete_many({})
+        db.knowledge_entries.delete_many({})
+        db.market_listings.delete_many({})
 
 @pytest.fixture
 def client(app):
@@ -35,7 +39,7 @@ def sample_user(app):
             'location': 'Monrovia',
             'created_at': datetime.utcnow()
         }
-        user_id = mongo.db.users.insert_one(user).inserted_id
+        user_id = get_db().users.insert_one(user).inserted_id
         user['_id'] = user_id
         return user
 
@@ -14,6 +14,28 @@ def test_user_registration(client):
     assert response.status_code == 201
     assert data['message'] == 'User registered successfully'
 
+def test_duplicate_email_is_rejected_case_insensitively(client, sample_user):
+    response = client.post('/api/auth/register',
+        json={
+            'username': 'otheruser',
+            'email': 'TEST@example.com',
+            'password': 'password123'
+        })
+    
+    assert response.status_code == 409
+    assert response.json['message'] == 'Email already exists'
+
+def test_duplicate_username_is_rejected(client, sample_user):
+    response = client.post('/api/auth/register',
+        json={
+            'username': 'testuser',
+            'email': 'other@example.com',
+            'password': 'password123'
+        })
+    
+    assert response.status_code == 409
+    assert response.json['message'] == 'Username already exists'
+
 def test_user_login(client, sample_user):
     response = client.post('/api/auth/login',
         json={
@@ -47,4 +69,10 @@ def test_get_market_listings(client):
     response = client.get('/api/market/')
     data = response.json
     assert response.status_code == 200
-    assert isinstance(data, list)
\ No newline at end of file
+    assert isinstance(data['items'], list)
+    assert 'next_cursor' in data
+
+def test_get_market_listings_unpaginated(client):
+    response = client.get('/api/market/?paginate=false')
+    assert response.status_code == 200
+    assert isinstance(response.json, list)
\ No newline at end of file
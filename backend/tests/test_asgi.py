@@ -0,0 +1,217 @@
+"""
+asgi.py against the Flask routes it mirrors: both apps read one in-memory
+database (mongomock behind pymongo, mongomock_motor behind motor), so the
+same request must give the same body.
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip('starlette')
+pytest.importorskip('a2wsgi')
+mongomock = pytest.importorskip('mongomock')
+mongomock_motor = pytest.importorskip('mongomock_motor')
+
+from flask_jwt_extended import create_access_token, create_refresh_token  # noqa: E402
+from starlette.testclient import TestClient  # noqa: E402
+
+import asgi  # noqa: E402
+from app import database  # noqa: E402
+from app.pagination import encode_cursor  # noqa: E402
+from app.response_cache import MemoryBackend, ResponseCache  # noqa: E402
+
+BSON_INVALID_CURSOR = 'W3siJG9pZCI6Inp6In1d'  # [{"$oid": "zz"}]
+
+
+@pytest.fixture
+def db(monkeypatch):
+    client = mongomock.MongoClient()
+    monkeypatch.setattr(database.pymongo, 'MongoClient', lambda *args, **kwargs: client)
+    monkeypatch.setitem(asgi.flask_app.extensions, 'mongo', {'client': None, 'pid': None, 'db_name': None})
+    monkeypatch.setattr(asgi, 'AsyncIOMotorClient',
+                        lambda *args, **kwargs: mongomock_motor.AsyncMongoMockClient(mock_mongo_client=client))
+    # Compare freshly computed bodies; caching is tested on its own below
+    monkeypatch.delitem(asgi.flask_app.extensions, 'response_cache')
+
+    with asgi.flask_app.app_context():
+        db = database.get_db()
+    farmer = db.users.insert_one({
+        'username': 'farmer1', 'email': 'farmer1@example.com', 'user_type': 'farmer', 'location': 'Bong'
+    }).inserted_id
+    start = datetime(2024, 1, 1)
+    db.market_listings.insert_many([{
+        'crop_name': 'Rice' if i % 2 else 'Cassava',
+        'quantity': float(i + 1),
+        'unit': 'kg',
+        'price_per_unit': float(100 - i * 7 % 50),
+        'location': 'Bong',
+        'description': 'Fresh harvest ' * 20,
+        'farmer_id': farmer,
+        'is_available': True,
+        'created_at': start + timedelta(hours=i),
+        'updated_at': start + timedelta(hours=i),
+    } for i in range(12)])
+    db.knowledge_entries.insert_many([{
+        'title': f'Entry {i}',
+        'content': 'Plant after the first rains. ' * 10,
+        'language': 'English',
+        'crop_type': 'Rice',
+        'author_id': farmer,
+        'created_at': start + timedelta(hours=i),
+        'updated_at': start + timedelta(hours=i),
+    } for i in range(5)])
+    db.farmer_id = farmer
+    return db
+
+
+@pytest.fixture
+def clients(db):
+    with TestClient(asgi.app) as asgi_client:
+        yield asgi_client, asgi.flask_app.test_client()
+
+
+@pytest.mark.parametrize('path', [
+    '/api/market/?limit=5',
+    '/api/market/?sort=price&limit=4',
+    '/api/market/?sort=price_desc&crop_name=Rice',
+    '/api/market/?fields=crop_name,farmer_username&limit=3',
+    '/api/market/?paginate=false',
+    '/api/knowledge/?limit=2',
+    '/api/knowledge/?fields=title',
+])
+def test_lists_match_the_flask_routes(clients, path):
+    asgi_client, flask_client = clients
+    # The test client asks for gzip by default, which weakens the ETag
+    asgi_response = asgi_client.get(path, headers={'Accept-Encoding': 'identity'})
+    flask_response = flask_client.get(path)
+
+    assert asgi_response.status_code == flask_response.status_code == 200
+    assert asgi_response.json() == flask_response.get_json()
+    assert asgi_response.headers['ETag'] == flask_response.headers['ETag']
+
+
+def test_details_match_the_flask_routes(clients, db):
+    asgi_client, flask_client = clients
+    listing_id = str(db.market_listings.find_one()['_id'])
+    entry_id = str(db.knowledge_entries.find_one()['_id'])
+
+    for path in [f'/api/market/{listing_id}', f'/api/market/{listing_id}?fields=crop_name',
+                 f'/api/knowledge/{entry_id}', f'/api/market/{"0" * 24}', '/api/market/not-an-id']:
+        asgi_response, flask_response = asgi_client.get(path), flask_client.get(path)
+        assert asgi_response.status_code == flask_response.status_code, path
+        assert asgi_response.json() == flask_response.get_json(), path
+
+
+def test_keyset_cursors_walk_the_same_pages(clients):
+    asgi_client, flask_client = clients
+
+    def walk(get):
+        ids, cursor = [], None
+        while True:
+            page = get('/api/market/?sort=price&limit=5' + (f'&cursor={cursor}' if cursor else ''))
+            ids += [item['_id'] for item in page['items']]
+            cursor = page['next_cursor']
+            if cursor is None:
+                return ids
+
+    asgi_ids = walk(lambda path: asgi_client.get(path).json())
+    assert asgi_ids == walk(lambda path: flask_client.get(path).get_json())
+    assert len(asgi_ids) == len(set(asgi_ids)) == 12
+
+
+@pytest.mark.parametrize('cursor', [
+    'not-a-cursor',
+    BSON_INVALID_CURSOR,
+    encode_cursor(['price_per_unit:1,_id:1', 10.0, 'x']),
+])
+def test_bad_cursor_is_a_400(clients, cursor):
+    asgi_client, flask_client = clients
+    asgi_response = asgi_client.get(f'/api/market/?cursor={cursor}')
+    flask_response = flask_client.get(f'/api/market/?cursor={cursor}')
+
+    assert asgi_response.status_code == flask_response.status_code == 400
+    assert asgi_response.json() == flask_response.get_json()
+
+
+def test_if_none_match_gets_a_304(clients):
+    asgi_client, _ = clients
+    first = asgi_client.get('/api/market/?limit=5')
+    second = asgi_client.get('/api/market/?limit=5', headers={'If-None-Match': first.headers['ETag']})
+
+    assert second.status_code == 304
+    assert second.content == b''
+    # The 200 was gzipped, so its ETag is the weak form of the same validator
+    assert second.headers['ETag'] == first.headers['ETag'].removeprefix('W/')
+
+
+def test_large_lists_are_compressed(clients):
+    asgi_client, flask_client = clients
+    response = asgi_client.get('/api/market/?paginate=false', headers={'Accept-Encoding': 'gzip'})
+
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.headers['ETag'].startswith('W/')
+    assert 'Accept-Encoding' in response.headers['Vary']
+    # The test client decodes the body
+    assert response.json() == flask_client.get('/api/market/?paginate=false').get_json()
+
+
+def test_cached_responses_skip_the_database(clients, monkeypatch):
+    asgi_client, flask_client = clients
+    monkeypatch.setitem(asgi.flask_app.extensions, 'response_cache', ResponseCache(MemoryBackend()))
+    calls = []
+    aggregate = asgi._aggregate
+
+    async def counting(collection, pipeline):
+        calls.append(collection.name)
+        return await aggregate(collection, pipeline)
+
+    monkeypatch.setattr(asgi, '_aggregate', counting)
+    first = asgi_client.get('/api/market/?limit=5')
+    second = asgi_client.get('/api/market/?limit=5')
+
+    assert calls == ['market_listings']
+    assert second.json() == first.json()
+    # Entries are keyed by the ETag, so the Flask route is served the same one
+    assert flask_client.get('/api/market/?limit=5').get_json() == first.json()
+
+
+def _bearer(token):
+    return {'Authorization': f'Bearer {token}'}
+
+
+def test_profile_matches_the_flask_route(clients, db):
+    asgi_client, flask_client = clients
+    with asgi.flask_app.app_context():
+        token = create_access_token(identity=str(db.farmer_id))
+
+    for path in ['/api/auth/profile', '/api/auth/profile?fresh=true']:
+        asgi_response = asgi_client.get(path, headers=_bearer(token))
+        flask_response = flask_client.get(path, headers=_bearer(token))
+        assert asgi_response.status_code == flask_response.status_code == 200
+        assert asgi_response.json() == flask_response.get_json()
+    assert 'email' not in asgi_client.get('/api/auth/profile', headers=_bearer(token)).json()
+
+
+def test_profile_rejects_missing_refresh_and_expired_tokens(clients, db):
+    asgi_client, flask_client = clients
+    with asgi.flask_app.app_context():
+        refresh = create_refresh_token(identity=str(db.farmer_id))
+        expired = create_access_token(identity=str(db.farmer_id), expires_delta=timedelta(seconds=-60))
+
+    for headers, status in [({}, 401), (_bearer(expired), 401), (_bearer(refresh), 422),
+                            (_bearer('not.a.token'), 422), ({'Authorization': 'Basic abc'}, 401)]:
+        asgi_response = asgi_client.get('/api/auth/profile', headers=headers)
+        flask_response = flask_client.get('/api/auth/profile', headers=headers)
+        assert asgi_response.status_code == flask_response.status_code == status, headers
+        assert asgi_response.json() == flask_response.get_json(), headers
+
+
+def test_other_routes_fall_back_to_flask(clients):
+    asgi_client, _ = clients
+    assert asgi_client.get('/api/test-cors').status_code == 200
+
+    stream = asgi_client.get('/api/market/?stream=ndjson&limit=3')
+    assert stream.status_code == 200
+    assert stream.headers['Content-Type'].startswith('application/x-ndjson')
+    assert len(stream.text.splitlines()) == 12
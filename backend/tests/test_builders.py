@@ -0,0 +1,59 @@
+from datetime import datetime
+
+import pytest
+from bson.objectid import ObjectId
+
+from app.models.knowledge import build_knowledge_entry
+from app.models.market import build_market_listing
+from app.models.user import PROFILE_CLAIMS_PROJECTION, profile_claims
+
+LISTING = {'crop_name': 'Rice', 'quantity': '10', 'unit': 'kg', 'price_per_unit': 2.5, 'location': 'Monrovia'}
+
+
+def test_market_listing_coerces_numbers():
+    now = datetime(2024, 1, 1)
+    farmer_id = str(ObjectId())
+    listing = build_market_listing(LISTING, farmer_id, now)
+
+    assert listing['quantity'] == 10.0
+    assert listing['farmer_id'] == ObjectId(farmer_id)
+    assert listing['created_at'] == listing['updated_at'] == now
+    assert listing['is_available'] is True
+
+
+def test_market_listing_requires_fields():
+    with pytest.raises(ValueError, match='Missing required fields'):
+        build_market_listing({'crop_name': 'Rice'}, None)
+
+
+def test_market_listing_rejects_non_numeric_price():
+    with pytest.raises(ValueError, match='Must be a number'):
+        build_market_listing({**LISTING, 'price_per_unit': 'cheap'}, None)
+
+
+def test_created_at_has_millisecond_precision():
+    listing = build_market_listing(LISTING, None)
+
+    assert listing['created_at'].microsecond % 1000 == 0
+
+
+def test_knowledge_entry_sets_text_language():
+    entry = build_knowledge_entry({'title': 'Rice', 'content': 'Plant early', 'language': 'Kpelle'}, None)
+
+    assert entry['text_language'] == 'none'
+    assert entry['author_id'] is None
+
+
+def test_knowledge_entry_requires_title_and_content():
+    with pytest.raises(ValueError, match='Missing required fields'):
+        build_knowledge_entry({'title': 'Rice'}, None)
+
+
+def test_profile_claims_leave_out_email():
+    user = {'_id': ObjectId(), 'username': 'farmer1', 'email': 'farmer1@example.com', 'user_type': 'farmer',
+            'location': 'Bong County', 'created_at': datetime(2024, 1, 1)}
+
+    claims = profile_claims(user)
+
+    assert claims == {'id': str(user['_id']), 'username': 'farmer1', 'user_type': 'farmer', 'location': 'Bong County'}
+    assert 'email' not in PROFILE_CLAIMS_PROJECTION
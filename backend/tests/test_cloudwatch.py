@@ -0,0 +1,69 @@
+import threading
+
+from app.cloudwatch import MetricAggregator
+
+
+class StubCloudWatch:
+    def __init__(self, fail=False):
+        self.calls = []
+        self.fail = fail
+        self.called = threading.Event()
+
+    def put_metric_data(self, Namespace, MetricData):
+        self.calls.append((Namespace, MetricData))
+        self.called.set()
+        if self.fail:
+            raise RuntimeError('throttled')
+
+
+def test_values_are_aggregated_into_statistic_sets():
+    stub = StubCloudWatch()
+    metrics = MetricAggregator(stub, 'Test', clock=lambda: 0)
+    env = (('Environment', 'testing'),)
+
+    for duration in (0.2, 0.1, 0.3):
+        metrics.record('RequestDuration', duration, 'Seconds', env)
+    metrics.record('RequestCount', 1, 'Count', (('StatusCode', '200'),) + env)
+
+    assert metrics.flush() == 1
+    namespace, data = stub.calls[0]
+    assert namespace == 'Test'
+    by_name = {metric['MetricName']: metric for metric in data}
+    assert by_name['RequestDuration']['StatisticValues'] == {
+        'SampleCount': 3, 'Sum': 0.2 + 0.1 + 0.3, 'Minimum': 0.1, 'Maximum': 0.3
+    }
+    assert by_name['RequestCount']['Dimensions'] == [
+        {'Name': 'StatusCode', 'Value': '200'}, {'Name': 'Environment', 'Value': 'testing'}
+    ]
+    # Nothing pending after a flush
+    assert metrics.flush() == 0
+
+
+def test_series_are_capped_and_batched():
+    stub = StubCloudWatch()
+    metrics = MetricAggregator(stub, 'Test', max_series=1500)
+
+    for i in range(2000):
+        metrics.record('RequestCount', 1, 'Count', (('StatusCode', str(i)),))
+
+    assert metrics.dropped == 500
+    assert metrics.flush() == 2
+    assert [len(data) for _, data in stub.calls] == [1000, 500]
+
+
+def test_background_flush_and_flush_on_stop():
+    stub = StubCloudWatch()
+    metrics = MetricAggregator(stub, 'Test', interval=0.01).start()
+    metrics.record('RequestCount', 1, 'Count')
+    assert stub.called.wait(5)
+
+    metrics.record('RequestCount', 1, 'Count')
+    metrics.stop()
+    assert sum(metric['StatisticValues']['SampleCount'] for _, data in stub.calls for metric in data) == 2
+
+
+def test_failed_put_does_not_raise():
+    metrics = MetricAggregator(StubCloudWatch(fail=True), 'Test')
+    metrics.record('RequestCount', 1, 'Count')
+
+    assert metrics.flush() == 0
@@ -0,0 +1,114 @@
+import gzip
+import json
+
+import pytest
+from flask import Flask, Response, jsonify
+
+from app import compression, response_cache
+from app import conditional as conditional_module
+from app.conditional import conditional
+from app.response_cache import cached
+
+ITEMS = [{'crop_name': 'Cassava', 'location': 'Bong County', 'n': i} for i in range(200)]
+
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.setattr(conditional_module, 'get_db', lambda: None)
+    monkeypatch.setattr(conditional_module, 'collection_version', lambda db, collection: (3, None))
+
+    app = Flask(__name__)
+    app.config['COMPRESS_ENCODINGS'] = ('gzip',)
+    response_cache.init_app(app)
+    compression.init_app(app)
+
+    @app.route('/items')
+    @conditional('market_listings')
+    @cached('items')
+    def items():
+        return jsonify(ITEMS), 200
+
+    @app.route('/small')
+    def small():
+        return jsonify({'message': 'ok'}), 200
+
+    @app.route('/archive')
+    def archive():
+        return Response(gzip.compress(b'x' * 5000), mimetype='application/gzip')
+
+    @app.route('/stream')
+    def stream():
+        return Response((json.dumps(item) + '\n' for item in ITEMS), mimetype='application/x-ndjson')
+
+    return app
+
+
+def test_negotiation_follows_quality_values():
+    assert compression.negotiate('gzip, deflate', ('br', 'gzip')) == 'gzip'
+    assert compression.negotiate('gzip;q=0.5, br', ('br', 'gzip')) == 'br'
+    assert compression.negotiate('gzip;q=0', ('gzip',)) is None
+    assert compression.negotiate(None, ('gzip',)) is None
+    assert compression.negotiate('gzip', ()) is None
+
+
+def test_large_json_is_gzipped_with_a_weak_etag(app):
+    response = app.test_client().get('/items', headers={'Accept-Encoding': 'gzip'})
+
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert int(response.headers['Content-Length']) == len(response.data)
+    assert json.loads(gzip.decompress(response.data)) == ITEMS
+    assert response.headers['ETag'].startswith('W/')
+
+
+def test_weak_etag_still_gets_a_304(app):
+    client = app.test_client()
+    etag = client.get('/items', headers={'Accept-Encoding': 'gzip'}).headers['ETag']
+    response = client.get('/items', headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+
+    assert response.status_code == 304
+
+
+def test_small_identity_and_precompressed_bodies_are_left_alone(app):
+    client = app.test_client()
+    small = client.get('/small', headers={'Accept-Encoding': 'gzip'})
+    identity = client.get('/items')
+    archive = client.get('/archive', headers={'Accept-Encoding': 'gzip'})
+
+    assert 'Content-Encoding' not in small.headers
+    assert 'Content-Encoding' not in identity.headers and identity.get_json() == ITEMS
+    assert 'Content-Encoding' not in archive.headers
+
+
+def test_streamed_response_is_compressed_incrementally(app):
+    response = app.test_client().get('/stream', headers={'Accept-Encoding': 'gzip'})
+
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Content-Length' not in response.headers
+    lines = gzip.decompress(response.data).decode('utf-8').splitlines()
+    assert [json.loads(line) for line in lines] == ITEMS
+
+
+def test_cache_hits_reuse_the_compressed_body(app, monkeypatch):
+    calls = []
+    compress = compression.compress
+
+    def counting_compress(body, encoding, level):
+        calls.append(encoding)
+        return compress(body, encoding, level)
+
+    monkeypatch.setattr(compression, 'compress', counting_compress)
+    client = app.test_client()
+    bodies = [client.get('/items', headers={'Accept-Encoding': 'gzip'}).data for _ in range(3)]
+
+    assert calls == ['gzip']
+    assert bodies[0] == bodies[1] == bodies[2]
+
+
+@pytest.mark.skipif(compression.brotli is None, reason='Brotli not installed')
+def test_brotli_is_preferred_when_available(app):
+    app.config['COMPRESS_ENCODINGS'] = ('br', 'gzip')
+    response = app.test_client().get('/items', headers={'Accept-Encoding': 'gzip, br'})
+
+    assert response.headers['Content-Encoding'] == 'br'
+    assert json.loads(compression.brotli.decompress(response.data)) == ITEMS
@@ -0,0 +1,112 @@
+from datetime import datetime, timedelta
+
+import pytest
+from flask import Flask, jsonify
+from werkzeug.datastructures import MultiDict
+
+from app import conditional as conditional_module
+from app.conditional import conditional, conditional_headers, make_etag, not_modified
+
+UPDATED_AT = datetime(2024, 5, 1, 12, 30, 15)
+
+
+@pytest.fixture
+def client(monkeypatch):
+    versions = {'market_listings': (3, UPDATED_AT)}
+    calls = []
+    monkeypatch.setattr(conditional_module, 'get_db', lambda: None)
+    monkeypatch.setattr(conditional_module, 'collection_version', lambda db, collection: versions[collection])
+
+    app = Flask(__name__)
+
+    @app.route('/items')
+    @conditional('market_listings')
+    def items():
+        calls.append(1)
+        return jsonify([1, 2, 3]), 200
+
+    client = app.test_client()
+    client.versions, client.calls = versions, calls
+    return client
+
+
+def test_etag_depends_on_version_path_and_normalized_query():
+    args = MultiDict([('limit', '10'), ('crop', 'Rice')])
+    etag = make_etag('market_listings', 3, '/api/market/', args.items(multi=True))
+
+    assert etag == make_etag('market_listings', 3, '/api/market/', [('crop', 'Rice'), ('limit', '10')])
+    assert etag != make_etag('market_listings', 4, '/api/market/', args.items(multi=True))
+    assert etag != make_etag('market_listings', 3, '/api/market/', [('limit', '20'), ('crop', 'Rice')])
+
+
+def test_etag_does_not_confuse_encoded_separators_with_parameters():
+    two_params = make_etag('market_listings', 3, '/api/market/', [('crop', 'maize'), ('sort', 'price')])
+    # ?crop=maize%26sort%3Dprice
+    one_param = make_etag('market_listings', 3, '/api/market/', [('crop', 'maize&sort=price')])
+    assert two_params != one_param
+
+
+def test_matching_if_none_match_returns_empty_304_without_running_the_view(client):
+    first = client.get('/items?b=2&a=1')
+    assert first.status_code == 200
+    assert first.headers['Cache-Control'] == 'no-cache'
+    assert first.headers['Last-Modified'] == 'Wed, 01 May 2024 12:30:15 GMT'
+
+    again = client.get('/items?a=1&b=2', headers={'If-None-Match': first.headers['ETag']})
+    assert again.status_code == 304
+    assert again.data == b''
+    assert again.headers['ETag'] == first.headers['ETag']
+    assert len(client.calls) == 1
+
+
+def test_new_version_invalidates_the_etag(client):
+    etag = client.get('/items').headers['ETag']
+    client.versions['market_listings'] = (4, datetime(2024, 5, 1, 12, 31))
+
+    response = client.get('/items', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+
+def test_if_modified_since(client):
+    assert client.get('/items', headers={'If-Modified-Since': 'Wed, 01 May 2024 12:30:15 GMT'}).status_code == 304
+    assert client.get('/items', headers={'If-Modified-Since': 'Wed, 01 May 2024 12:30:14 GMT'}).status_code == 200
+
+
+def test_write_in_the_same_second_is_not_hidden_by_if_modified_since(client, monkeypatch):
+    now = [datetime(2024, 5, 1, 12, 30, 16, 500000)]
+    monkeypatch.setattr(conditional_module, 'utcnow', lambda: now[0])
+    client.versions['market_listings'] = (3, datetime(2024, 5, 1, 12, 30, 15, 200000))
+
+    first = client.get('/items')
+    # Rounded up, so the write at 12:30:15.2 is not older than its Last-Modified
+    assert first.headers['Last-Modified'] == 'Wed, 01 May 2024 12:30:16 GMT'
+
+    # Another write while 12:30:16 is still running: no Last-Modified yet
+    client.versions['market_listings'] = (4, datetime(2024, 5, 1, 12, 30, 16, 700000))
+    now[0] = datetime(2024, 5, 1, 12, 30, 16, 900000)
+    since = {'If-Modified-Since': first.headers['Last-Modified']}
+    second = client.get('/items', headers=since)
+    assert second.status_code == 200
+    assert 'Last-Modified' not in second.headers
+
+    now[0] += timedelta(seconds=1)
+    third = client.get('/items', headers=since)
+    assert third.status_code == 200
+    assert third.headers['Last-Modified'] == 'Wed, 01 May 2024 12:30:17 GMT'
+    assert client.get('/items', headers={'If-Modified-Since': third.headers['Last-Modified']}).status_code == 304
+
+
+def test_raw_header_helpers_round_last_modified(monkeypatch):
+    monkeypatch.setattr(conditional_module, 'utcnow', lambda: datetime(2024, 5, 1, 12, 30, 15, 900000))
+    written = datetime(2024, 5, 1, 12, 30, 15, 200000)
+
+    assert 'Last-Modified' not in conditional_headers('3-abc', written)
+    assert not not_modified(None, 'Wed, 01 May 2024 12:30:15 GMT', '3-abc', written)
+    assert not_modified(None, 'Wed, 01 May 2024 12:30:15 GMT', '3-abc', UPDATED_AT)
+
+
+def test_not_modified_for_raw_headers():
+    assert not_modified('"3-abc"', None, '3-abc', None)
+    assert not not_modified('"2-abc"', None, '3-abc', None)
+    assert not not_modified(None, None, '3-abc', UPDATED_AT)
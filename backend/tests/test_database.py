@@ -0,0 +1,27 @@
+from app import create_app
+from app import database
+
+
+def test_client_is_shared_across_app_contexts():
+    app = create_app('testing')
+    with app.app_context():
+        first = database.get_db_client()
+    with app.app_context():
+        assert database.get_db_client() is first
+        assert database.get_db().name == 'dagri_talk_test'
+
+
+def test_client_is_rebuilt_after_fork(monkeypatch):
+    app = create_app('testing')
+    with app.app_context():
+        parent = database.get_db_client()
+        monkeypatch.setattr(database.os, 'getpid', lambda: -1)
+        assert database.get_db_client() is not parent
+
+
+def test_pool_options_come_from_config():
+    app = create_app('testing')
+    app.config['MONGO_MAX_POOL_SIZE'] = 7
+    options = database.client_options(app)
+    assert options['maxPoolSize'] == 7
+    assert 'tlsCAFile' not in options
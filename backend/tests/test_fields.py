@@ -0,0 +1,28 @@
+import pytest
+
+from app.fields import KNOWLEDGE_FIELDS, MARKET_FIELDS, FieldsError
+
+
+def test_no_fields_means_everything():
+    assert KNOWLEDGE_FIELDS.parse(None) is None
+    assert KNOWLEDGE_FIELDS.projection(None) is None
+
+
+def test_summary_preset_skips_content():
+    fields = KNOWLEDGE_FIELDS.parse('summary')
+    assert 'content' not in fields
+    assert 'title' in fields
+
+
+def test_projection_keeps_cursor_keys_and_user_id():
+    fields = MARKET_FIELDS.parse('crop_name,farmer_username')
+    projection = MARKET_FIELDS.projection(fields, required=['created_at', '_id'])
+
+    assert projection == {'_id': 1, 'created_at': 1, 'crop_name': 1, 'farmer_id': 1}
+    doc = {'_id': 'x', 'created_at': 'y', 'crop_name': 'Rice', 'farmer_id': 'z', 'farmer_username': 'ana'}
+    assert MARKET_FIELDS.trim(doc, fields) == {'_id': 'x', 'crop_name': 'Rice', 'farmer_username': 'ana'}
+
+
+def test_unknown_fields_are_rejected():
+    with pytest.raises(FieldsError):
+        MARKET_FIELDS.parse('crop_name,password_hash')
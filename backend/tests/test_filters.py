@@ -0,0 +1,72 @@
+from datetime import datetime
+
+import pytest
+
+from app.filters import MARKET_SORTS, FilterError, parse_knowledge_search, parse_market_filters, parse_updated_since
+from app.models.knowledge import text_search_language
+
+
+def test_defaults_to_available_newest_first():
+    query, sort = parse_market_filters({})
+    assert query == {'is_available': True}
+    assert sort == MARKET_SORTS['newest']
+
+
+def test_filters_compile_to_a_single_query():
+    query, sort = parse_market_filters({
+        'available_only': 'false',
+        'crop_name': ' Cassava ',
+        'location': 'Bong County',
+        'unit': 'kg',
+        'min_price': '10',
+        'max_price': '25.5',
+        'sort': 'price',
+    })
+    assert query == {
+        'crop_name': 'Cassava',
+        'location': 'Bong County',
+        'unit': 'kg',
+        'price_per_unit': {'$gte': 10.0, '$lte': 25.5},
+    }
+    assert sort == [('price_per_unit', 1), ('_id', 1)]
+
+
+@pytest.mark.parametrize('args', [
+    {'min_price': 'cheap'},
+    {'min_price': '-1'},
+    {'min_price': '20', 'max_price': '10'},
+    {'sort': 'oldest'},
+])
+def test_invalid_filters_are_rejected(args):
+    with pytest.raises(FilterError):
+        parse_market_filters(args)
+
+
+def test_knowledge_search_language_drives_stemming():
+    query = parse_knowledge_search({'q': 'cassava planting', 'region': 'Bong County', 'language': 'French'})
+    assert query == {
+        '$text': {'$search': 'cassava planting', '$language': 'french'},
+        'region': 'Bong County',
+        'language': 'French',
+    }
+
+
+def test_knowledge_search_requires_q():
+    with pytest.raises(FilterError):
+        parse_knowledge_search({'q': '   '})
+
+
+def test_unsupported_languages_are_indexed_without_stemming():
+    assert text_search_language('English') == 'english'
+    assert text_search_language(None) == 'english'
+    assert text_search_language('Kpelle') == 'none'
+
+
+def test_updated_since_is_normalized_to_naive_utc():
+    assert parse_updated_since({}) == {}
+    assert parse_updated_since({'updated_since': '2024-03-01'}) == {'updated_at': {'$gte': datetime(2024, 3, 1)}}
+    assert parse_updated_since({'updated_since': '2024-03-01T02:00:00+02:00'}) == {
+        'updated_at': {'$gte': datetime(2024, 3, 1)}
+    }
+    with pytest.raises(FilterError):
+        parse_updated_since({'updated_since': 'last week'})
@@ -0,0 +1,88 @@
+import json
+
+from bson.objectid import ObjectId
+from pymongo.errors import BulkWriteError
+
+from app.importer import import_file, iter_records, load_checkpoint, save_checkpoint
+
+
+class InsertResult:
+    def __init__(self, ids):
+        self.inserted_ids = ids
+
+
+class FakeCollection:
+    def __init__(self, fail_positions=(), name='fake'):
+        self.name = name
+        self.batches = []
+        self.fail_positions = set(fail_positions)
+        self.bulk_writes = []
+
+    def bulk_write(self, requests, ordered=True):
+        self.bulk_writes.append(requests)
+
+    def insert_many(self, docs, ordered=True):
+        assert ordered is False
+        self.batches.append(docs)
+        if self.fail_positions:
+            errors = [{'index': i, 'errmsg': 'duplicate key'} for i in sorted(self.fail_positions) if i < len(docs)]
+            raise BulkWriteError({'writeErrors': errors, 'nInserted': len(docs) - len(errors)})
+        return InsertResult([ObjectId() for _ in docs])
+
+
+class FakeDB(dict):
+    def __missing__(self, name):
+        self[name] = FakeCollection(name=name)
+        return self[name]
+
+
+def write_ndjson(path, records):
+    path.write_text('\n'.join(r if isinstance(r, str) else json.dumps(r) for r in records) + '\n')
+    return str(path)
+
+
+def listing(i):
+    return {'crop_name': f'Crop {i}', 'quantity': 1, 'unit': 'kg', 'price_per_unit': 2, 'location': 'Gbarnga'}
+
+
+def test_csv_empty_cells_count_as_missing(tmp_path):
+    path = tmp_path / 'entries.csv'
+    path.write_text('title,content,region\nRice,Plant early,\n')
+
+    assert list(iter_records(str(path), 'csv')) == [(1, {'title': 'Rice', 'content': 'Plant early'})]
+
+
+def test_imports_in_batches_and_reports_invalid_records(tmp_path):
+    path = write_ndjson(tmp_path / 'listings.ndjson', [listing(1), '{not json', listing(3), {'crop_name': 'x'}, listing(5)])
+    db = FakeDB()
+    reported = []
+
+    stats = import_file(db, 'market', path, batch_size=2, on_batch=lambda s, errors: reported.extend(errors))
+
+    assert [len(batch) for batch in db['market_listings'].batches] == [1, 1, 1]
+    assert stats['records'] == 5 and stats['inserted'] == 3 and stats['failed'] == 2
+    assert reported == [(2, 'Invalid JSON'), (4, 'Missing required fields')]
+
+
+def test_write_errors_map_back_to_record_numbers(tmp_path):
+    path = write_ndjson(tmp_path / 'listings.ndjson', [listing(i) for i in range(1, 4)])
+    db = FakeDB()
+    db['market_listings'] = FakeCollection(fail_positions=[1])
+    reported = []
+
+    stats = import_file(db, 'market', path, on_batch=lambda s, errors: reported.extend(errors))
+
+    assert stats['inserted'] == 2
+    assert reported == [(2, 'duplicate key')]
+
+
+def test_resume_skips_checkpointed_records(tmp_path):
+    path = write_ndjson(tmp_path / 'listings.ndjson', [listing(i) for i in range(1, 6)])
+    checkpoint = str(tmp_path / 'listings.checkpoint.json')
+    save_checkpoint(checkpoint, {'records': 3})
+    db = FakeDB()
+
+    stats = import_file(db, 'market', path, skip=load_checkpoint(checkpoint)['records'])
+
+    assert [doc['crop_name'] for doc in db['market_listings'].batches[0]] == ['Crop 4', 'Crop 5']
+    assert stats['records'] == 5
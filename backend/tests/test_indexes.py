@@ -0,0 +1,81 @@
+from app import create_app
+from app import indexes
+
+
+class FakeCursor:
+    def __init__(self, plan):
+        self.plan = plan
+
+    def sort(self, spec):
+        return self
+
+    def limit(self, n):
+        return self
+
+    def explain(self):
+        return {'queryPlanner': {'winningPlan': self.plan}}
+
+
+class FakeDB(dict):
+    def __getitem__(self, name):
+        plan = self.get(name)
+        collection = type('Collection', (), {})()
+        collection.find = lambda *args, **kwargs: FakeCursor(plan)
+        return collection
+
+
+def test_query_shapes_target_registered_collections():
+    for shape in indexes.QUERY_SHAPES:
+        assert shape['collection'] in indexes.INDEXES
+
+
+def test_check_query_plans_reports_collscan():
+    ixscan = {'stage': 'FETCH', 'inputStage': {'stage': 'IXSCAN'}}
+    collscan = {'stage': 'SORT', 'inputStage': {'stage': 'COLLSCAN'}}
+    db = FakeDB(users=ixscan, market_listings=ixscan, knowledge_entries=collscan)
+
+    failures = dict(indexes.check_query_plans(db))
+
+    assert 'knowledge.list' in failures
+    assert not any(name.startswith(('auth.', 'market.')) for name in failures)
+
+
+def test_indexes_cli_is_registered():
+    app = create_app('testing')
+    result = app.test_cli_runner().invoke(args=['indexes', '--help'])
+    assert result.exit_code == 0
+    assert 'check' in result.output
+
+
+class IndexedCollection:
+    def __init__(self, existing, fail=False):
+        self.existing = set(existing)
+        self.fail = fail
+
+    def create_indexes(self, models):
+        if self.fail:
+            raise indexes.OperationFailure('E11000 duplicate key')
+        names = [model.document['name'] for model in models]
+        self.existing.update(names)
+        return names
+
+    def index_information(self):
+        return {name: {} for name in self.existing}
+
+    def drop_index(self, name):
+        self.existing.remove(name)
+
+
+def test_retired_indexes_are_dropped_only_after_replacements_exist():
+    app = create_app('testing')
+    users = IndexedCollection(['_id_', 'email_unique'])
+    failing = IndexedCollection(['_id_', 'email_unique'], fail=True)
+
+    with app.app_context():
+        indexes.ensure_indexes({'users': users, 'market_listings': IndexedCollection([]),
+                                'knowledge_entries': IndexedCollection([]), 'stats': IndexedCollection([])})
+        indexes.ensure_indexes({'users': failing, 'market_listings': IndexedCollection([]),
+                                'knowledge_entries': IndexedCollection([]), 'stats': IndexedCollection([])})
+
+    assert 'email_unique_ci' in users.existing and 'email_unique' not in users.existing
+    assert 'email_unique' in failing.existing
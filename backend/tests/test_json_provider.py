@@ -0,0 +1,55 @@
+import json
+from datetime import datetime, timezone
+
+import pytest
+from bson.objectid import ObjectId
+from flask import Flask, jsonify
+
+from app import json_provider
+from app.json_provider import MongoJSONProvider, OrjsonProvider
+
+OID = ObjectId('65f1c0ffee0000000000abcd')
+CREATED_AT = datetime(2024, 5, 1, 12, 30, 15, 123000)
+
+PROVIDERS = [MongoJSONProvider]
+if json_provider.orjson is not None:
+    PROVIDERS.append(OrjsonProvider)
+
+
+@pytest.fixture(params=PROVIDERS, ids=lambda provider: provider.__name__)
+def app(request):
+    app = Flask(__name__)
+    app.json = request.param(app)
+    return app
+
+
+def test_documents_encode_without_conversion(app):
+    doc = {'_id': OID, 'farmer_id': OID, 'crop_name': 'Cassava', 'created_at': CREATED_AT,
+           'updated_at': CREATED_AT.replace(tzinfo=timezone.utc)}
+    with app.app_context():
+        body = jsonify({'items': [doc]}).get_json()
+
+    assert body == {'items': [{
+        '_id': str(OID), 'farmer_id': str(OID), 'crop_name': 'Cassava',
+        'created_at': CREATED_AT.isoformat(), 'updated_at': '2024-05-01T12:30:15.123000+00:00',
+    }]}
+
+
+def test_dumps_accepts_stdlib_arguments(app):
+    # app.streaming passes separators; the output is always compact
+    text = app.json.dumps({'b': 1, 'a': [OID]}, separators=(',', ':'))
+    assert text == '{"a":["65f1c0ffee0000000000abcd"],"b":1}'
+    assert app.json.loads(text) == {'a': [str(OID)], 'b': 1}
+    assert json.loads(app.json.encode({'name': 'Lofa Kpelle'})) == {'name': 'Lofa Kpelle'}
+
+
+def test_unsupported_types_still_fail(app):
+    with pytest.raises(TypeError):
+        app.json.dumps({'value': object()})
+
+
+def test_init_app_prefers_orjson():
+    app = Flask(__name__)
+    json_provider.init_app(app)
+    expected = OrjsonProvider if json_provider.orjson is not None else MongoJSONProvider
+    assert type(app.json) is expected
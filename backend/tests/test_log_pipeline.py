@@ -0,0 +1,98 @@
+import logging
+import queue
+
+from app import create_app
+from app.log_pipeline import (
+    ACCESS_LOGGER, BoundedQueueHandler, LoggerNameFilter, PathFilter, ReportingQueueListener, log_access, pipeline
+)
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+def make_record(name='dagri_talk', level=logging.INFO, msg='hello', **extra):
+    record = logging.LogRecord(name, level, __file__, 1, msg, None, None)
+    record.__dict__.update(extra)
+    return record
+
+
+def test_full_queue_drops_and_counts_instead_of_blocking():
+    handler = BoundedQueueHandler(queue.Queue(2))
+
+    for i in range(5):
+        handler.handle(make_record(msg=f'record {i}'))
+
+    assert handler.queue.qsize() == 2
+    assert handler.dropped == 3
+
+
+def test_listener_reports_drops_once():
+    log_queue = queue.Queue(1)
+    handler = BoundedQueueHandler(log_queue)
+    sink = ListHandler()
+    listener = ReportingQueueListener(log_queue, handler, sink)
+
+    handler.handle(make_record(msg='kept'))
+    handler.handle(make_record(msg='dropped'))
+    listener.start()
+    listener.stop()
+
+    messages = [record.getMessage() for record in sink.records]
+    assert messages == ['kept', 'Log queue full: 1 records dropped so far']
+
+
+def test_path_filter_drops_excluded_paths_only():
+    path_filter = PathFilter(['/api/health', '/metrics'])
+
+    assert not path_filter.filter(make_record(path='/api/health'))
+    assert not path_filter.filter(make_record(path='/metrics'))
+    assert path_filter.filter(make_record(path='/api/market/'))
+    assert path_filter.filter(make_record())
+
+
+def test_logger_name_filter():
+    security_only = LoggerNameFilter(only=['dagri_talk.security'])
+    no_werkzeug = LoggerNameFilter(exclude=['werkzeug'])
+
+    assert security_only.filter(make_record('dagri_talk.security'))
+    assert not security_only.filter(make_record('dagri_talk'))
+    assert not no_werkzeug.filter(make_record('werkzeug'))
+    assert no_werkzeug.filter(make_record('werkzeugish'))
+
+
+def test_access_log_goes_through_the_pipeline():
+    app = create_app('testing')
+    capture = ListHandler()
+    access_logger = logging.getLogger(ACCESS_LOGGER)
+    access_logger.addHandler(capture)
+    try:
+        response = app.test_client().get('/api/test-cors')
+    finally:
+        access_logger.removeHandler(capture)
+
+    assert response.status_code == 200
+    assert pipeline.started
+    assert pipeline.handler in logging.getLogger().handlers
+    record, = capture.records
+    assert (record.method, record.path, record.status_code) == ('GET', '/api/test-cors', 200)
+    assert 'Headers' not in record.getMessage()
+
+
+def test_log_access_outside_a_request():
+    capture = ListHandler()
+    access_logger = logging.getLogger(ACCESS_LOGGER)
+    access_logger.addHandler(capture)
+    try:
+        log_access('GET', '/api/market/', 304, 1.25)
+    finally:
+        access_logger.removeHandler(capture)
+
+    record, = capture.records
+    assert record.getMessage() == 'GET /api/market/ 304 1.2ms'
+    assert (record.path, record.status_code, record.duration_ms) == ('/api/market/', 304, 1.25)
@@ -0,0 +1,105 @@
+import pytest
+from flask_jwt_extended import create_access_token
+from pymongo.errors import BulkWriteError
+
+from app import create_app
+from app.routes import market as market_routes
+from app.stats import read_tally
+
+mongomock = pytest.importorskip('mongomock')
+
+
+def listing(crop_name='Rice', **overrides):
+    item = {'crop_name': crop_name, 'quantity': 10, 'unit': 'kg', 'price_per_unit': 25, 'location': 'Bong'}
+    item.update(overrides)
+    return item
+
+
+@pytest.fixture
+def db(monkeypatch):
+    db = mongomock.MongoClient().dagri_talk_test
+    monkeypatch.setattr(market_routes, 'get_db', lambda: db)
+    return db
+
+
+@pytest.fixture
+def app(db):
+    app = create_app('testing')
+    app.config['MARKET_BULK_MAX_LISTINGS'] = 5
+    return app
+
+
+@pytest.fixture
+def post(app, db):
+    farmer_id = db.users.insert_one({'username': 'farmer1'}).inserted_id
+    with app.app_context():
+        token = create_access_token(identity=str(farmer_id))
+    client = app.test_client()
+
+    def post(items):
+        return client.post('/api/market/bulk', json={'listings': items},
+                           headers={'Authorization': f'Bearer {token}'})
+    return post
+
+
+def crop_counts(db):
+    top, _ = read_tally(db, 'market_listings.crop', 10)
+    return dict(top)
+
+
+def test_all_valid_items_are_created(post, db):
+    response = post([listing('Rice'), listing('Cassava')])
+
+    assert response.status_code == 201
+    body = response.get_json()
+    assert (body['created'], body['failed']) == (2, 0)
+    assert [result['status'] for result in body['results']] == ['created', 'created']
+    assert body['results'][0]['listing']['farmer_username'] == 'farmer1'
+    assert db.market_listings.count_documents({}) == 2
+    assert crop_counts(db) == {'Rice': 1, 'Cassava': 1}
+
+
+def test_invalid_items_are_reported_in_submission_order(post, db):
+    response = post([listing('Rice'), {'crop_name': 'Yam'}, listing('Cassava', price_per_unit='cheap'),
+                     listing('Pepper')])
+
+    assert response.status_code == 207
+    results = response.get_json()['results']
+    assert [result['index'] for result in results] == [0, 1, 2, 3]
+    assert [result['status'] for result in results] == ['created', 'error', 'error', 'created']
+    assert results[1]['message'] == 'Missing required fields'
+    assert results[3]['listing']['crop_name'] == 'Pepper'
+    assert crop_counts(db) == {'Rice': 1, 'Pepper': 1}
+
+
+def test_too_many_items_are_rejected(post, db):
+    response = post([listing() for _ in range(6)])
+
+    assert response.status_code == 400
+    assert response.get_json()['message'] == 'At most 5 listings per request'
+    assert db.market_listings.count_documents({}) == 0
+
+
+def test_write_errors_map_back_to_the_submitted_index(post, db, monkeypatch, caplog):
+    insert_many = db.market_listings.insert_many
+
+    def failing_insert_many(documents, ordered=True):
+        # Positions 0 and 2 of the documents sent (submitted items 1 and 3) fail
+        insert_many([doc for position, doc in enumerate(documents) if position not in (0, 2)])
+        raise BulkWriteError({
+            'writeErrors': [{'index': 0, 'code': 11000, 'errmsg': 'E11000 duplicate key'},
+                            {'index': 2, 'code': 121, 'errmsg': 'Document failed validation'}],
+            'writeConcernErrors': [{'code': 64, 'errmsg': 'waiting for replication timed out'}],
+        })
+
+    monkeypatch.setattr(db.market_listings, 'insert_many', failing_insert_many)
+    response = post([{'crop_name': 'Yam'}, listing('Rice'), listing('Cassava'), listing('Pepper'),
+                     listing('Okra')])
+
+    assert response.status_code == 207
+    results = response.get_json()['results']
+    assert [result['status'] for result in results] == ['error', 'error', 'created', 'error', 'created']
+    assert results[1]['message'] == 'E11000 duplicate key'
+    assert results[3]['message'] == 'Document failed validation'
+    assert crop_counts(db) == {'Cassava': 1, 'Okra': 1}
+    assert 'waiting for replication timed out' in caplog.text
@@ -0,0 +1,40 @@
+import importlib.util
+import os
+import subprocess
+import sys
+import textwrap
+
+# prometheus_client picks multiprocess mode when it is imported, so this runs
+# in a fresh interpreter with PROMETHEUS_MULTIPROC_DIR set.
+SCRIPT = textwrap.dedent('''
+    import os
+    from prometheus_client import Counter, generate_latest
+    from prometheus_client import multiprocess
+    from app import metrics
+
+    REQUESTS = Counter('test_requests_total', 'Requests')
+
+    for increments in (2, 3):
+        pid = os.fork()
+        if pid == 0:
+            for _ in range(increments):
+                REQUESTS.inc()
+            os._exit(0)
+        os.waitpid(pid, 0)
+        multiprocess.mark_process_dead(pid)
+
+    print(generate_latest(metrics.scrape_registry()).decode())
+''')
+
+
+def test_metrics_are_merged_across_worker_processes(tmp_path):
+    env = dict(os.environ, PROMETHEUS_MULTIPROC_DIR=str(tmp_path))
+    backend = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run([sys.executable, '-c', SCRIPT], cwd=backend, env=env,
+                            capture_output=True, text=True, timeout=60)
+
+    assert result.returncode == 0, result.stderr
+    assert 'test_requests_total 5.0' in result.stdout
+    # Host metrics come from the scrape-time collector (when psutil is installed)
+    if importlib.util.find_spec('psutil'):
+        assert 'dagri_talk_system_memory_percent' in result.stdout
@@ -0,0 +1,81 @@
+from datetime import datetime
+
+import pytest
+from bson.objectid import ObjectId
+
+from app.indexes import NEWEST_FIRST
+from app.pagination import (
+    MAX_LIMIT, MAX_OFFSET, PaginationError, apply_cursor, decode_cursor, decode_offset_cursor, encode_cursor,
+    parse_limit, sort_id, split_offset_page, split_page
+)
+
+PRICE_ASC = [('price_per_unit', 1), ('_id', 1)]
+
+
+def test_cursor_round_trips_datetime_and_object_id():
+    values = [datetime(2024, 5, 1, 12, 30), ObjectId()]
+    assert decode_cursor(encode_cursor(values)) == values
+
+
+@pytest.mark.parametrize('cursor', [
+    'not-a-cursor',
+    'W3siJG9pZCI6Inp6In1d',  # [{"$oid": "zz"}]: bson raises InvalidId
+    encode_cursor({'sort': 'price_per_unit:1'}),
+])
+def test_invalid_cursor_is_rejected(cursor):
+    with pytest.raises(PaginationError):
+        decode_cursor(cursor)
+
+
+def test_limit_is_capped():
+    assert parse_limit(None) == 50
+    assert parse_limit('10') == 10
+    assert parse_limit('100000') == MAX_LIMIT
+    with pytest.raises(PaginationError):
+        parse_limit('0')
+
+
+def test_split_page_returns_cursor_for_last_item():
+    docs = [{'_id': ObjectId(), 'created_at': datetime(2024, 1, day)} for day in (3, 2, 1)]
+
+    page, next_cursor = split_page(docs, 2, NEWEST_FIRST)
+
+    assert page == docs[:2]
+    assert decode_cursor(next_cursor, length=3) == [sort_id(NEWEST_FIRST), docs[1]['created_at'], docs[1]['_id']]
+    assert split_page(docs, 3, NEWEST_FIRST) == (docs, None)
+
+
+def test_apply_cursor_ranges_on_the_sort_index():
+    created_at, last_id = datetime(2024, 1, 2), ObjectId()
+    cursor = encode_cursor([sort_id(NEWEST_FIRST), created_at, last_id])
+    query = apply_cursor({'is_available': True}, NEWEST_FIRST, cursor)
+
+    assert query == {'$and': [
+        {'is_available': True},
+        {
+            'created_at': {'$lte': created_at},
+            '$or': [{'created_at': {'$lt': created_at}}, {'_id': {'$lt': last_id}}]
+        }
+    ]}
+
+
+def test_cursor_from_another_sort_is_rejected():
+    docs = [{'_id': ObjectId(), 'price_per_unit': price} for price in (1, 2, 3)]
+    _, next_cursor = split_page(docs, 2, PRICE_ASC)
+
+    assert apply_cursor({}, PRICE_ASC, next_cursor)
+    with pytest.raises(PaginationError):
+        apply_cursor({}, NEWEST_FIRST, next_cursor)
+    with pytest.raises(PaginationError):
+        # Cursors issued before the sort was recorded
+        apply_cursor({}, NEWEST_FIRST, encode_cursor([datetime(2024, 1, 2), ObjectId()]))
+
+
+def test_offset_cursor_stops_at_max_offset():
+    docs = list(range(11))
+    page, next_cursor = split_offset_page(docs, 10, 0)
+    assert page == docs[:10]
+    assert decode_offset_cursor(next_cursor) == 10
+    assert split_offset_page(docs, 10, MAX_OFFSET) == (docs[:10], None)
+    with pytest.raises(PaginationError):
+        decode_offset_cursor(encode_cursor([datetime(2024, 1, 1), ObjectId()]))
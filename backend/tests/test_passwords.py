@@ -0,0 +1,47 @@
+import threading
+
+import pytest
+from werkzeug.security import generate_password_hash
+
+from app.passwords import PasswordHasher, PasswordHasherBusy, hash_method
+
+
+def test_hash_method_from_algorithm_and_cost():
+    assert hash_method('scrypt') == 'scrypt:32768:8:1'
+    assert hash_method('pbkdf2', 1000) == 'pbkdf2:sha256:1000'
+    with pytest.raises(ValueError):
+        hash_method('md5')
+
+
+def test_hashes_verify_and_old_parameters_need_rehash():
+    hasher = PasswordHasher('pbkdf2:sha256:1000')
+    hashed = hasher.hash('secret')
+
+    assert hashed.startswith('pbkdf2:sha256:1000$')
+    assert hasher.verify(hashed, 'secret')
+    assert not hasher.verify(hashed, 'wrong')
+    assert not hasher.needs_rehash(hashed)
+
+    old = generate_password_hash('secret', 'pbkdf2:sha256:2000')
+    assert hasher.verify(old, 'secret')
+    assert hasher.needs_rehash(old)
+
+
+def test_full_pool_raises_busy():
+    hasher = PasswordHasher('pbkdf2:sha256:1000', workers=1, max_pending=0, timeout=0.05)
+    started, release = threading.Event(), threading.Event()
+
+    def slow():
+        started.set()
+        release.wait()
+
+    thread = threading.Thread(target=hasher._run, args=(slow,))
+    thread.start()
+    started.wait()
+    try:
+        with pytest.raises(PasswordHasherBusy):
+            hasher.hash('secret')
+    finally:
+        release.set()
+        thread.join()
+    hasher.shutdown()
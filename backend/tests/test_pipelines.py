@@ -0,0 +1,28 @@
+from app.indexes import NEWEST_FIRST
+from app.models.knowledge import knowledge_list_pipeline, knowledge_search_pipeline
+from app.models.market import market_list_pipeline
+
+
+def test_market_pipeline_limits_before_projecting():
+    pipeline = market_list_pipeline({'is_available': True}, NEWEST_FIRST, 51, {'_id': 1, 'crop_name': 1})
+
+    assert pipeline == [
+        {'$match': {'is_available': True}},
+        {'$sort': {'created_at': -1, '_id': -1}},
+        {'$limit': 51},
+        {'$project': {'_id': 1, 'crop_name': 1}},
+    ]
+
+
+def test_knowledge_pipeline_sorts_newest_first():
+    pipeline = knowledge_list_pipeline({}, NEWEST_FIRST)
+
+    assert pipeline == [{'$match': {}}, {'$sort': {'created_at': -1, '_id': -1}}]
+
+
+def test_search_pipeline_ranks_by_text_score():
+    pipeline = knowledge_search_pipeline({'$text': {'$search': 'rice'}}, 20, 11)
+
+    assert pipeline[1] == {'$sort': {'score': {'$meta': 'textScore'}, '_id': -1}}
+    assert pipeline[2:4] == [{'$skip': 20}, {'$limit': 11}]
+    assert pipeline[-1] == {'$addFields': {'score': {'$meta': 'textScore'}}}
@@ -0,0 +1,309 @@
+import os
+import threading
+
+import pytest
+from flask import Flask, jsonify, request
+
+from app import conditional as conditional_module
+from app import response_cache
+from app.conditional import conditional
+from app.response_cache import MemoryBackend, RedisBackend, ResponseCache, cache_key, cached, invalidate
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.config['RESPONSE_CACHE_BACKEND'] = 'memory'
+    response_cache.init_app(app)
+    app.calls = []
+
+    @app.route('/items')
+    @cached('items')
+    def items():
+        app.calls.append(dict(request.args))
+        return jsonify({'items': [1, 2, 3], 'args': dict(request.args)}), 200
+
+    @app.route('/items', methods=['POST'])
+    def add_item():
+        invalidate('items')
+        return jsonify({'message': 'ok'}), 201
+
+    @app.route('/broken')
+    @cached('items')
+    def broken():
+        app.calls.append('broken')
+        return jsonify({'message': 'Internal server error'}), 500
+
+    return app
+
+
+def test_cache_key_ignores_query_order():
+    assert cache_key('/api/market/', [('b', '2'), ('a', '1')]) == cache_key('/api/market/', [('a', '1'), ('b', '2')])
+    assert cache_key('/api/market/', [('a', '1')]) != cache_key('/api/knowledge/', [('a', '1')])
+
+
+def test_cache_key_does_not_confuse_encoded_separators_with_parameters():
+    # ?crop=maize&sort=price_asc versus ?crop=maize%26sort%3Dprice_asc
+    two_params = cache_key('/api/market/', [('crop', 'maize'), ('sort', 'price_asc')])
+    one_param = cache_key('/api/market/', [('crop', 'maize&sort=price_asc')])
+    assert two_params != one_param
+
+
+def test_encoded_separators_do_not_share_an_entry(app):
+    client = app.test_client()
+    client.get('/items?crop=maize&sort=price_asc')
+    poisoned = client.get('/items?crop=maize%26sort%3Dprice_asc')
+
+    assert poisoned.get_json()['args'] == {'crop': 'maize&sort=price_asc'}
+    assert len(app.calls) == 2
+
+
+def test_memory_backend_expires_evicts_and_invalidates():
+    clock = FakeClock()
+    backend = MemoryBackend(maxsize=2, clock=clock)
+    backend.set('market', 'a', b'1', ttl=10)
+    backend.set('knowledge', 'b', b'2', ttl=10)
+    assert backend.get('market', 'a') == b'1'
+
+    # 'a' was used last, so 'b' is the least recently used entry
+    backend.set('market', 'c', b'3', ttl=10)
+    assert backend.get('knowledge', 'b') is None
+    assert backend.get('market', 'a') == b'1'
+
+    backend.invalidate('market')
+    assert backend.get('market', 'a') is None
+
+    backend.set('market', 'a', b'4', ttl=10)
+    clock.now += 10
+    assert backend.get('market', 'a') is None
+
+
+def test_memory_backend_is_bounded_by_total_bytes():
+    backend = MemoryBackend(maxsize=100, max_bytes=10, clock=FakeClock())
+    backend.set('market', 'a', b'aaaa', ttl=10)
+    backend.set('market', 'b', b'bbbb', ttl=10)
+    backend.set('market', 'c', b'cccc', ttl=10)
+    assert backend.get('market', 'a') is None
+    assert backend.size_bytes == 8
+
+    # Larger than the whole cache: never stored, nothing evicted for it
+    backend.set('market', 'd', b'd' * 11, ttl=10)
+    assert backend.get('market', 'd') is None
+    assert backend.get('market', 'b') == b'bbbb'
+
+    backend.invalidate('market')
+    assert len(backend) == 0 and backend.size_bytes == 0
+
+
+def test_oversized_and_unpaginated_responses_are_not_cached(app):
+    app.extensions['response_cache'].max_entry_bytes = 10
+    client = app.test_client()
+    client.get('/items')
+    client.get('/items')
+    assert len(app.calls) == 2
+
+    app.extensions['response_cache'].max_entry_bytes = 1024 * 1024
+    client.get('/items?paginate=false')
+    client.get('/items?paginate=false')
+    assert len(app.calls) == 4
+
+
+def test_hit_is_served_without_running_the_view(app):
+    client = app.test_client()
+    first = client.get('/items?b=2&a=1')
+    second = client.get('/items?a=1&b=2')
+
+    assert first.status_code == second.status_code == 200
+    assert second.get_json() == first.get_json()
+    assert second.headers['Content-Type'] == 'application/json'
+    assert len(app.calls) == 1
+
+
+def test_write_invalidates_namespace(app):
+    client = app.test_client()
+    client.get('/items')
+    client.post('/items')
+    client.get('/items')
+
+    assert len(app.calls) == 2
+
+
+def test_errors_and_streams_are_not_cached(app):
+    client = app.test_client()
+    client.get('/broken')
+    client.get('/broken')
+    client.get('/items?stream=ndjson')
+    client.get('/items?stream=ndjson')
+
+    assert app.calls.count('broken') == 2
+    assert len(app.calls) == 4
+
+
+def test_concurrent_misses_run_the_view_once(app):
+    cache = ResponseCache(MemoryBackend(), ttl=30, wait=5)
+    started, release = threading.Event(), threading.Event()
+    calls, results = [], []
+
+    def compute():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return app.response_class(b'{"ok":true}', mimetype='application/json')
+
+    def fetch():
+        with app.app_context():
+            results.append(cache.get_or_compute('items', '/items?', compute).get_data())
+
+    leader = threading.Thread(target=fetch)
+    leader.start()
+    started.wait(5)
+    followers = [threading.Thread(target=fetch) for _ in range(4)]
+    for thread in followers:
+        thread.start()
+    release.set()
+    for thread in [leader] + followers:
+        thread.join(5)
+
+    assert len(calls) == 1
+    assert results == [b'{"ok":true}'] * 5
+
+
+def test_response_computed_across_an_invalidation_is_not_stored(app):
+    cache = ResponseCache(MemoryBackend(), ttl=30)
+
+    def compute():
+        # A write lands while the view is reading
+        cache.invalidate('items')
+        return app.response_class(b'stale')
+
+    with app.app_context():
+        cache.get_or_compute('items', '/items?', compute)
+        assert cache.backend.get('items', '/items?') is None
+
+
+def test_entries_stored_by_parts_are_served_to_flask_views(app):
+    # The ASGI read endpoints store their responses by parts, under the same keys
+    cache = app.extensions['response_cache']
+    with app.app_context():
+        assert cache.lookup('items', '/items?') is None
+        entry_id = cache.store('items', '/items?', 200,
+                               [('content-type', 'application/json'), ('content-length', '9')], b'[1, 2, 3]')
+        assert cache.lookup('items', '/items?') == (200, [['content-type', 'application/json']], b'[1, 2, 3]', entry_id)
+
+    response = app.test_client().get('/items')
+    assert response.get_json() == [1, 2, 3]
+    assert app.calls == []
+
+
+def test_none_backend_disables_caching():
+    app = Flask(__name__)
+    app.config['RESPONSE_CACHE_BACKEND'] = 'none'
+    response_cache.init_app(app)
+    calls = []
+
+    @app.route('/items')
+    @cached('items')
+    def items():
+        calls.append(1)
+        return jsonify([]), 200
+
+    client = app.test_client()
+    client.get('/items')
+    client.get('/items')
+    assert len(calls) == 2
+
+
+def test_redis_backend_entries_expire_and_invalidate():
+    fakeredis = pytest.importorskip('fakeredis')
+    client = fakeredis.FakeRedis()
+    backend = RedisBackend(client=client, prefix='test:')
+    for i in range(1001):
+        backend.set('items', f'/items?page={i}', b'body', ttl=30)
+    assert backend.get('items', '/items?page=1000') == b'body'
+
+    # Each entry carries its own TTL, so Redis expires them one by one
+    entry_keys = client.keys('test:items:0:*')
+    assert len(entry_keys) == 1001
+    assert all(0 < client.pttl(key) <= 30000 for key in entry_keys)
+
+    backend.invalidate('items')
+    assert backend.get('items', '/items?page=1000') is None
+    backend.set('items', '/items?page=1000', b'new', ttl=30)
+    assert backend.get('items', '/items?page=1000') == b'new'
+
+    # Another process sees the invalidation through the shared generation
+    other = RedisBackend(client=client, prefix='test:')
+    assert other.get('items', '/items?page=1000') == b'new'
+    other.invalidate('items')
+    assert backend.get('items', '/items?page=1000') is None
+
+
+@pytest.mark.skipif(not os.environ.get('REDIS_URL_TEST'), reason='REDIS_URL_TEST not set')
+def test_redis_backend_round_trip():
+    backend = RedisBackend(os.environ['REDIS_URL_TEST'], prefix='dagri_talk:test:response_cache:')
+    backend.invalidate('items')
+    backend.set('items', '/items?', b'body', ttl=10)
+    assert backend.get('items', '/items?') == b'body'
+
+    backend.invalidate('items')
+    assert backend.get('items', '/items?') is None
+
+
+def _worker(monkeypatch, store):
+    """An app instance with its own memory cache over a shared 'database'"""
+    monkeypatch.setattr(conditional_module, 'get_db', lambda: None)
+    monkeypatch.setattr(conditional_module, 'collection_version', lambda db, collection: store['version'])
+
+    app = Flask(__name__)
+    response_cache.init_app(app)
+
+    @app.route('/items')
+    @conditional('market_listings')
+    @cached('items')
+    def items():
+        return jsonify(store['items']), 200
+
+    @app.route('/items', methods=['POST'])
+    def add_item():
+        store['items'].append(len(store['items']))
+        version, _ = store['version']
+        store['version'] = (version + 1, None)
+        invalidate('items')
+        return jsonify({'message': 'ok'}), 201
+
+    return app.test_client()
+
+
+def test_write_in_another_worker_is_never_served_under_the_new_etag(monkeypatch):
+    store = {'version': (1, None), 'items': [0]}
+    worker_a, worker_b = _worker(monkeypatch, store), _worker(monkeypatch, store)
+    old = worker_b.get('/items')
+
+    worker_a.post('/items')
+    new = worker_b.get('/items', headers={'If-None-Match': old.headers['ETag']})
+
+    assert new.status_code == 200
+    assert new.get_json() == [0, 1]
+    assert new.headers['ETag'] != old.headers['ETag']
+
+
+def test_unknown_version_is_not_cached(monkeypatch):
+    store = {'version': (1, None), 'items': [0]}
+    client = _worker(monkeypatch, store)
+
+    def broken(db, collection):
+        raise RuntimeError('stats unavailable')
+
+    monkeypatch.setattr(conditional_module, 'collection_version', broken)
+    client.get('/items')
+    store['items'].append(1)
+
+    assert client.get('/items').get_json() == [0, 1]
@@ -0,0 +1,118 @@
+import pytest
+from flask import Flask
+
+from app.stats import (
+    MAX_VALUE_LENGTH, StatsCollector, read_tally, rebuild_tallies, record_inserts, tally_value, top_counts
+)
+
+
+class FakeCollection:
+    def __init__(self):
+        self.bulk_writes = []
+
+    def bulk_write(self, requests, ordered=True):
+        self.bulk_writes.append(requests)
+
+
+class FakeDB(dict):
+    def __missing__(self, name):
+        self[name] = FakeCollection()
+        return self[name]
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_tally_values_are_stripped_and_bounded():
+    assert tally_value(None) == tally_value('') == tally_value('  ') == 'unknown'
+    assert tally_value(' Bong County ') == 'Bong County'
+    assert tally_value('x' * 1000) == 'x' * MAX_VALUE_LENGTH
+
+
+def test_record_inserts_bumps_the_version_and_each_breakdown_once():
+    db = FakeDB()
+    listings = [
+        {'crop_name': 'Rice', 'location': 'Gbarnga'},
+        {'crop_name': 'Rice', 'location': 'Monrovia'},
+        {'crop_name': 'Cassava', 'location': 'Gbarnga'},
+    ]
+
+    record_inserts(db, 'market_listings', listings)
+
+    updates, = db['stats'].bulk_writes
+    docs = {update._filter['_id']: update._doc['$inc'] for update in updates}
+    assert docs.pop('market_listings') == {'version': 1}
+    assert docs == {
+        'market_listings.crop:Rice': {'count': 2},
+        'market_listings.crop:Cassava': {'count': 1},
+        'market_listings.region:Gbarnga': {'count': 2},
+        'market_listings.region:Monrovia': {'count': 1},
+    }
+    record_inserts(db, 'market_listings', [])
+    assert len(db['stats'].bulk_writes) == 1
+
+
+def test_top_counts_folds_the_long_tail_into_other():
+    assert top_counts([('Rice', 5), ('Cassava', 3)], 10) == [('Rice', 5), ('Cassava', 3), ('other', 2)]
+    assert top_counts([('Rice', 5), ('Cassava', 3)], 8) == [('Rice', 5), ('Cassava', 3)]
+
+
+def test_unusual_values_are_tallied_as_data():
+    mongomock = pytest.importorskip('mongomock')
+    db = mongomock.MongoClient().db
+    listings = [{'crop_name': value, 'location': 'Bong'} for value in ('St. Paul', '$rice', 'a.b.c', '$rice')]
+
+    record_inserts(db, 'market_listings', listings)
+
+    assert read_tally(db, 'market_listings.crop', 10) == ([('$rice', 2), ('St. Paul', 1), ('a.b.c', 1)], 4)
+    assert read_tally(db, 'market_listings.crop', 1) == ([('$rice', 2)], 4)
+
+
+def test_rebuild_replaces_the_tallies_and_the_older_layout():
+    mongomock = pytest.importorskip('mongomock')
+    db = mongomock.MongoClient().db
+    db.market_listings.insert_many([{'crop_name': 'Rice', 'location': 'Bong'}, {'crop_name': 'Rice'}])
+    db.stats.insert_one({'_id': 'market_listings.crop', 'counts': {'Rice': 9}})
+    record_inserts(db, 'market_listings', [{'crop_name': 'Cassava'}])
+
+    rebuild_tallies(db, 'market_listings')
+
+    assert db.stats.find_one({'_id': 'market_listings.crop'}) is None
+    assert read_tally(db, 'market_listings.crop', 10) == ([('Rice', 2)], 2)
+    assert read_tally(db, 'market_listings.region', 10) == ([('Bong', 1), ('unknown', 1)], 2)
+
+
+def test_collector_reads_metadata_and_tallies_and_caches_them():
+    mongomock = pytest.importorskip('mongomock')
+    db = mongomock.MongoClient().db
+    db.market_listings.insert_many([{'crop_name': crop} for crop in ('Rice', 'Rice', 'Cassava', 'Cocoa')])
+    db.knowledge_entries.insert_many([{} for _ in range(7)])
+    record_inserts(db, 'market_listings', list(db.market_listings.find()))
+    reads = []
+    clock = Clock()
+    collector = StatsCollector(get_db=lambda: reads.append(1) or db, ttl=30, max_labels=2, clock=clock)
+
+    with Flask(__name__).app_context():
+        families = {family.name: family for family in collector.collect()}
+        collector.collect()
+        clock.now = 31
+        collector.collect()
+
+    assert families['dagri_talk_market_listings_total'].samples[0].value == 4
+    assert families['dagri_talk_knowledge_entries_total'].samples[0].value == 7
+    assert {s.labels['crop']: s.value for s in families['dagri_talk_market_listings_by_crop'].samples} == {
+        'Rice': 2, 'Cassava': 1, 'other': 1
+    }
+    # One read per TTL
+    assert len(reads) == 2
+
+
+def test_collector_does_not_query_on_registration():
+    collector = StatsCollector(get_db=lambda: (_ for _ in ()).throw(AssertionError('queried')))
+
+    assert 'dagri_talk_market_listings_by_region' in {family.name for family in collector.describe()}
@@ -0,0 +1,77 @@
+import csv
+import gzip
+import io
+import json
+from datetime import datetime
+
+import pytest
+
+from app import create_app
+from app.streaming import StreamFormatError, export_documents, export_format, stream_documents, stream_format
+
+
+@pytest.fixture
+def stream_app():
+    return create_app('testing')
+
+
+def _body(app, docs, fmt, batch_size):
+    with app.test_request_context():
+        response = stream_documents(iter(docs), lambda doc: doc, fmt, batch_size)
+        return response.get_data(as_text=True)
+
+
+def test_json_stream_is_a_valid_array(stream_app):
+    docs = [{'n': i} for i in range(5)]
+    assert json.loads(_body(stream_app, docs, 'json', 2)) == docs
+    assert json.loads(_body(stream_app, [], 'json', 2)) == []
+
+
+def test_ndjson_stream_has_one_document_per_line(stream_app):
+    docs = [{'n': i} for i in range(3)]
+    lines = _body(stream_app, docs, 'ndjson', 2).splitlines()
+    assert [json.loads(line) for line in lines] == docs
+
+
+def test_unknown_stream_format_is_rejected():
+    assert stream_format({}) is None
+    assert stream_format({'stream': 'NDJSON'}) == 'ndjson'
+    with pytest.raises(StreamFormatError):
+        stream_format({'stream': 'xml'})
+
+
+def test_csv_export_has_header_and_every_row(stream_app):
+    docs = [{'n': i, 'name': f'crop, {i}', 'internal': 'x'} for i in range(5)]
+    with stream_app.test_request_context():
+        response = export_documents(iter(docs), lambda doc: doc, 'csv', 'crops', columns=['n', 'name'], batch_size=2)
+        body = response.get_data(as_text=True)
+
+    assert response.headers['Content-Disposition'] == 'attachment; filename="crops.csv"'
+    rows = list(csv.DictReader(io.StringIO(body)))
+    assert rows == [{'n': str(i), 'name': f'crop, {i}'} for i in range(5)]
+
+
+def test_gzip_export_decompresses_to_ndjson(stream_app):
+    docs = [{'n': i} for i in range(3)]
+    with stream_app.test_request_context():
+        response = export_documents(iter(docs), lambda doc: doc, 'ndjson', 'crops', gzip=True, batch_size=2)
+        body = gzip.decompress(response.get_data()).decode('utf-8')
+
+    assert response.mimetype == 'application/gzip'
+    assert [json.loads(line) for line in body.splitlines()] == docs
+
+
+def test_export_format_defaults_to_ndjson():
+    assert export_format({}) == 'ndjson'
+    assert export_format({'format': 'CSV'}) == 'csv'
+    with pytest.raises(StreamFormatError):
+        export_format({'format': 'json'})
+
+
+def test_csv_export_writes_iso_dates(stream_app):
+    docs = [{'n': 1, 'created_at': datetime(2024, 5, 1, 12, 30)}]
+    with stream_app.test_request_context():
+        response = export_documents(iter(docs), lambda doc: doc, 'csv', 'crops', columns=['n', 'created_at'])
+        body = response.get_data(as_text=True)
+
+    assert list(csv.DictReader(io.StringIO(body))) == [{'n': '1', 'created_at': '2024-05-01T12:30:00'}]
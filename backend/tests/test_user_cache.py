@@ -0,0 +1,124 @@
+import pytest
+from bson.objectid import ObjectId
+
+from app.user_cache import CACHE_EVICTIONS, ProfileChanges, UsernameCache, attach_usernames, username_cache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeUsers:
+    def __init__(self, users):
+        self.users = users
+        self.queries = 0
+
+    def find(self, query, projection=None):
+        self.queries += 1
+        return [{'_id': _id, 'username': self.users[_id]} for _id in query['_id']['$in'] if _id in self.users]
+
+
+class FakeDB:
+    def __init__(self, users):
+        self.users = FakeUsers(users)
+
+
+def test_entries_expire_after_ttl():
+    clock = Clock()
+    cache = UsernameCache(maxsize=10, ttl=60, clock=clock)
+    cache.put_many({'a': 'ana'})
+
+    assert cache.get_many(['a']) == ({'a': 'ana'}, [])
+    clock.now = 61
+    assert cache.get_many(['a']) == ({}, ['a'])
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = UsernameCache(maxsize=2, ttl=60)
+    before = CACHE_EVICTIONS._value.get()
+    cache.put_many({'a': 'ana', 'b': 'ben'})
+    cache.get_many(['a'])
+    cache.put_many({'c': 'cy'})
+
+    assert cache.get_many(['a', 'b', 'c']) == ({'a': 'ana', 'c': 'cy'}, ['b'])
+    assert CACHE_EVICTIONS._value.get() == before + 1
+
+
+def test_attach_usernames_batches_misses_and_caches_them():
+    username_cache.clear()
+    ana, gone = ObjectId(), ObjectId()
+    db = FakeDB({ana: 'ana'})
+    docs = [{'author_id': ana}, {'author_id': gone}, {'author_id': None}]
+
+    attach_usernames(db, docs, 'author_id', 'author_username')
+    attach_usernames(db, [{'author_id': ana}], 'author_id', 'author_username')
+
+    assert [doc.get('author_username') for doc in docs] == ['ana', 'Unknown', None]
+    assert db.users.queries == 1
+
+
+def test_invalidate_forces_a_fresh_lookup():
+    username_cache.clear()
+    ana = ObjectId()
+    db = FakeDB({ana: 'ana'})
+    attach_usernames(db, [{'author_id': ana}], 'author_id', 'author_username')
+
+    db.users.users[ana] = 'ana_k'
+    username_cache.invalidate(ana)
+    docs = attach_usernames(db, [{'author_id': ana}], 'author_id', 'author_username')
+
+    assert docs[0]['author_username'] == 'ana_k'
+
+
+def test_profile_is_stale_only_for_tokens_issued_before_the_change():
+    clock = Clock()
+    changes = ProfileChanges(maxsize=10, ttl=900, clock=clock)
+    clock.now = 1000
+    changes.mark_changed('u1')
+
+    assert changes.lookup('u1', issued_at=999) == (True, None)
+    assert changes.lookup('u1', issued_at=1001) == (False, None)
+    assert changes.lookup('u2', issued_at=0) == (False, None)
+
+    changes.store('u1', {'username': 'new'})
+    assert changes.lookup('u1', issued_at=999) == (True, {'username': 'new'})
+
+    clock.now = 2000
+    assert changes.lookup('u1', issued_at=999) == (False, None)
+
+
+def test_in_memory_changes_are_not_seen_by_other_workers():
+    clock = Clock()
+    worker_a, worker_b = ProfileChanges(clock=clock), ProfileChanges(clock=clock)
+    clock.now = 1000
+    worker_a.mark_changed('u1')
+
+    assert worker_a.lookup('u1', issued_at=999) == (True, None)
+    # The limitation PROFILE_CHANGES_URL exists for
+    assert worker_b.lookup('u1', issued_at=999) == (False, None)
+
+
+def test_shared_changes_are_seen_by_every_worker():
+    fakeredis = pytest.importorskip('fakeredis')
+    client = fakeredis.FakeRedis()
+    clock = Clock()
+    worker_a = ProfileChanges(ttl=900, clock=clock, client=client)
+    worker_b = ProfileChanges(ttl=900, clock=clock, client=client)
+    clock.now = 1000
+    worker_a.mark_changed('u1')
+
+    assert worker_b.lookup('u1', issued_at=999) == (True, None)
+    assert worker_b.lookup('u1', issued_at=1001) == (False, None)
+    assert 0 < client.ttl('dagri_talk:profile_changed:u1') <= 900
+
+    worker_b.store('u1', {'username': 'new'})
+    assert worker_b.lookup('u1', issued_at=999) == (True, {'username': 'new'})
+
+    # A later change makes the profile worker_b loaded stale again
+    clock.now = 1100
+    worker_a.mark_changed('u1')
+    assert worker_b.lookup('u1', issued_at=999) == (True, None)
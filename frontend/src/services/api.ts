@@ -16,6 +16,31 @@ api.interceptors.request.use((config) => {
   return config;
 });
 
+// List endpoints return one keyset page: { items, next_cursor }
+interface Page<T> {
+  items: T[];
+  next_cursor: string | null;
+}
+
+// Largest page the API serves (MAX_LIMIT in backend/app/pagination.py)
+const PAGE_LIMIT = 200;
+
+// Every item of a list endpoint, following next_cursor until the last page
+const getAllPages = async <T>(path: string): Promise<{data: T[]}> => {
+  const items: T[] = [];
+  let cursor: string | null = null;
+  do {
+    const params: { limit: number; cursor?: string } = { limit: PAGE_LIMIT };
+    if (cursor) {
+      params.cursor = cursor;
+    }
+    const response = await api.get<Page<T>>(path, { params });
+    items.push(...response.data.items);
+    cursor = response.data.next_cursor;
+  } while (cursor);
+  return { data: items };
+};
+
 export const authAPI = {
   register: (userData: any) => api.post('/auth/register', userData),
   login: (credentials: any) => api.post('/auth/login', credentials),
@@ -23,13 +48,13 @@ export const authAPI = {
 };
 
 export const knowledgeAPI = {
-  getAll: (): Promise<{data: KnowledgeEntry[]}> => api.get('/knowledge/'),
+  getAll: (): Promise<{data: KnowledgeEntry[]}> => getAllPages<KnowledgeEntry>('/knowledge/'),
   create: (data: any) => api.post('/knowledge/', data),
   getById: (id: number) => api.get(`/knowledge/${id}`),
 };
 
 export const marketAPI = {
-  getAll: (): Promise<{data: MarketListing[]}> => api.get('/market/'),
+  getAll: (): Promise<{data: MarketListing[]}> => getAllPages<MarketListing>('/market/'),
   create: (data: any) => api.post('/market/', data),
 };
 